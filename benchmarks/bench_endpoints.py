@@ -0,0 +1,216 @@
+"""
+Load and latency benchmark of the API endpoints, run in-process.
+
+The real FastAPI application from main.py is driven through httpx's ASGI
+transport, with Keycloak, the gateway, Redis, MongoDB and S3 replaced by the
+in-memory stand-ins of benchmarks.standins. Each scenario is run at every
+requested concurrency (and payload size, for scenarios that send or return a
+file) and reports requests per second, p50/p95/p99 latency and the peak RSS
+of the process so far.
+
+    python -m benchmarks.bench_endpoints --requests 2000 --concurrency 1,16 \
+        --payload-sizes 1024,1048576 --output results.json
+
+With --baseline, the run is compared to an earlier --output file and the
+command exits with status 1 when a scenario's throughput drops, or its p95
+latency grows, by more than --tolerance. Results are only comparable between
+runs on the same machine.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import sys
+import time
+
+from benchmarks.standins import installed, build_app
+
+SCENARIOS = ("create", "get", "list", "update", "content", "export", "delete")
+# Scenarios whose cost depends on the size of the stored or uploaded file
+PAYLOAD_SCENARIOS = ("create", "content")
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(latencies: list, fraction: float) -> float:
+    if not latencies:
+        return 0.0
+    index = min(int(round(fraction * (len(latencies) - 1))), len(latencies) - 1)
+    return latencies[index]
+
+
+async def create_objects(client, count: int, payload: bytes) -> list:
+    uuids = []
+    for index in range(count):
+        response = await client.post("/storage/v1/", data={"name": f"Object {index}"},
+                                     files={"file": (f"object-{index}.bin", payload, "application/octet-stream")})
+        response.raise_for_status()
+        uuids.append(response.json()["uuid"])
+    return uuids
+
+
+def make_request(scenario: str, index: int, uuids: list, payload: bytes):
+    """Return the (method, url, kwargs) of the ``index``-th request of a scenario"""
+    if scenario == "create":
+        return "POST", "/storage/v1/", {
+            "data": {"name": f"Bench {index}"},
+            "files": {"file": (f"bench-{index}.bin", payload, "application/octet-stream")}}
+    uuid = uuids[index % len(uuids)]
+    if scenario == "get":
+        return "GET", f"/storage/v1/{uuid}", {}
+    if scenario == "list":
+        return "GET", "/storage/v1/", {"params": {"limit": 100}}
+    if scenario == "update":
+        return "PUT", f"/storage/v1/{uuid}", {"json": {"name": f"Renamed {index}", "description": "bench"}}
+    if scenario == "content":
+        return "GET", f"/storage/v1/{uuid}/content", {}
+    if scenario == "export":
+        return "GET", "/storage/v1/export", {}
+    if scenario == "delete":
+        # Each request deletes a different object, created for this scenario
+        return "DELETE", f"/storage/v1/{uuids[index]}", {}
+    raise ValueError(f"Unknown scenario {scenario}")
+
+
+async def run_scenario(client, scenario: str, requests: int, concurrency: int, uuids: list, payload: bytes) -> dict:
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            method, url, kwargs = make_request(scenario, index, uuids, payload)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 6),
+        "rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1e3, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1e3, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1e3, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+async def run_suite(args) -> dict:
+    import httpx
+
+    results = {}
+    with installed():
+        app = build_app()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     headers={"Authorization": "Bearer bench"}) as client:
+            for payload_size in args.payload_sizes:
+                payload = b"x" * payload_size
+                seeded = await create_objects(client, args.objects, payload)
+                for scenario in args.scenarios:
+                    if scenario not in PAYLOAD_SCENARIOS and payload_size != args.payload_sizes[0]:
+                        continue
+                    for concurrency in args.concurrency:
+                        uuids = seeded
+                        if scenario == "delete":
+                            uuids = await create_objects(client, args.requests, payload)
+                        name = f"{scenario}/c{concurrency}"
+                        if scenario in PAYLOAD_SCENARIOS:
+                            name += f"/{payload_size}B"
+                        requests = min(args.requests, args.export_requests) if scenario == "export" else args.requests
+                        results[name] = await run_scenario(client, scenario, requests, concurrency, uuids, payload)
+                        print(format_result(name, results[name]), file=sys.stderr)
+    return results
+
+
+def format_result(name: str, result: dict) -> str:
+    return (f"{name:<28} {result['rps']:>10.1f} req/s  p50 {result['p50_ms']:>8.2f} ms  "
+            f"p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  "
+            f"rss {result['peak_rss_mb']:>7.1f} MiB  errors {result['errors']}")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return a description of every scenario that regressed against the baseline"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if before["rps"] and result["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['rps']:.1f} req/s, baseline {before['rps']:.1f} req/s")
+        if before["p95_ms"] and result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.2f} ms, baseline {before['p95_ms']:.2f} ms")
+    return regressions
+
+
+def integer_list(value: str) -> list:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--export-requests", type=int, default=20,
+                        help="requests for the export scenario, which returns every object")
+    parser.add_argument("--concurrency", type=integer_list, default=[1, 16],
+                        help="comma-separated numbers of concurrent clients")
+    parser.add_argument("--payload-sizes", type=integer_list, default=[1024],
+                        help="comma-separated file sizes in bytes")
+    parser.add_argument("--objects", type=int, default=1000, help="objects stored before the scenarios run")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenarios to run")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed relative regression before failing (default: 0.15)")
+    args = parser.parse_args()
+    args.scenarios = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run_suite(args))
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "payload_sizes": args.payload_sizes,
+            "objects": args.objects,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
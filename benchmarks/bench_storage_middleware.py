@@ -0,0 +1,106 @@
+"""
+Microbenchmark of the storage middleware overhead.
+
+Compares a bare ASGI app, the pure ASGI StorageConnectionMiddleware and an
+equivalent BaseHTTPMiddleware on a streamed response, reporting the mean time
+per request. Authentication helpers are patched out so only the middleware
+plumbing is measured.
+
+    python -m benchmarks.bench_storage_middleware --requests 20000 --chunks 16
+"""
+import argparse
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middlewares.storage_middleware import StorageConnectionMiddleware, resolve_stores
+from repositories import LazyBucketRepositories
+
+
+class BaseHTTPStorageMiddleware(BaseHTTPMiddleware):
+    """The previous BaseHTTPMiddleware shape, kept here as the baseline"""
+
+    async def dispatch(self, request, call_next):
+        request.state.stores = LazyBucketRepositories(lambda: resolve_stores("token", "licence"))
+        return await call_next(request)
+
+
+def make_app(chunks: int, chunk_size: int):
+    payload = b"x" * chunk_size
+
+    async def app(scope, receive, send):
+        await receive()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for _ in range(chunks):
+            await send({"type": "http.response.body", "body": payload, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    return app
+
+
+def make_scope():
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "path": "/storage/v1/bench/content",
+        "raw_path": b"/storage/v1/bench/content",
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": [(b"authorization", b"Bearer token")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("testserver", 80),
+        "state": {"licence_uuid": "licence"},
+    }
+
+
+async def measure(app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(make_scope(), receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--chunks", type=int, default=8)
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    inner = make_app(args.chunks, args.chunk_size)
+    variants = {
+        "bare": inner,
+        "pure_asgi": StorageConnectionMiddleware(inner),
+        "base_http": BaseHTTPStorageMiddleware(inner),
+    }
+
+    results = {}
+    with patch("middlewares.storage_middleware.is_unprotected_path", return_value=False), \
+            patch("middlewares.storage_middleware.extract_token", return_value="token"):
+        for name, app in variants.items():
+            asyncio.run(measure(app, min(args.requests, 100)))
+            results[name] = asyncio.run(measure(app, args.requests))
+
+    if args.json:
+        print(json.dumps({name: {"mean_us": mean * 1e6} for name, mean in results.items()}))
+        return
+    for name, mean in results.items():
+        overhead = (mean - results["bare"]) * 1e6
+        print(f"{name:<10} {mean * 1e6:9.2f} us/request  (+{overhead:.2f} us over bare)")
+
+
+if __name__ == "__main__":
+    main()
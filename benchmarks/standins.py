@@ -0,0 +1,563 @@
+"""
+In-process stand-ins for the services the API talks to, for benchmarks.
+
+Redis, MongoDB (through the motor client), S3 (through the boto3 client), the
+API gateway and the common_api authentication middlewares are replaced by
+in-memory fakes that implement just what this service calls. Everything above
+them (routers, services, repositories, caches, StorageConnectionMiddleware)
+is the real code, so a benchmark measures the application and not the
+network. The fakes favour simplicity over speed; compare runs against each
+other, not against production numbers.
+
+    with installed() as backends:
+        app = build_app()
+"""
+import copy
+import fnmatch
+import hashlib
+import io
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager, ExitStack
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from botocore.exceptions import ClientError
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from starlette.requests import Request
+
+BENCH_LICENCE = "bench-licence"
+BENCH_USER = "bench-user"
+BENCH_MONGO_URI = "mongodb://standin:27017/bench"
+BENCH_CREDENTIAL = {"s3": {
+    "endpoint": "http://s3.standin:9000",
+    "access_key": "bench",
+    "secret_key": "bench",
+    "bucket_name": "bench",
+}}
+
+
+class InMemoryRedis:
+    """The subset of the redis-py client used by the credential, cleanup and object caches"""
+
+    def __init__(self):
+        self._data = {}
+        self._expiry = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key):
+        expires_at = self._expiry.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+        return key in self._data
+
+    def get(self, key):
+        with self._lock:
+            return self._data[key] if self._alive(key) else None
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._alive(key):
+                return None
+            self._data[key] = value.encode() if isinstance(value, str) else value
+            self._expiry.pop(key, None)
+            if ex is not None:
+                self._expiry[key] = time.monotonic() + ex
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            deleted = sum(1 for key in keys if self._alive(key))
+            for key in keys:
+                self._data.pop(key, None)
+                self._expiry.pop(key, None)
+            return deleted
+
+    def ttl(self, key):
+        with self._lock:
+            if not self._alive(key):
+                return -2
+            expires_at = self._expiry.get(key)
+            return -1 if expires_at is None else max(int(expires_at - time.monotonic()), 0)
+
+    def pipeline(self):
+        return InMemoryPipeline(self)
+
+    def publish(self, channel, message):
+        return 0
+
+    def lock(self, name, timeout=None, blocking=True):
+        return InMemoryLock(self, name, timeout)
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            members = self._data.setdefault(key, {})
+            added = sum(1 for member in mapping if member not in members)
+            members.update(mapping)
+            return added
+
+    def zrem(self, key, *members):
+        with self._lock:
+            stored = self._data.get(key, {})
+            return sum(1 for member in members if stored.pop(member, None) is not None)
+
+
+class InMemoryPipeline:
+    def __init__(self, redis: InMemoryRedis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        calls, self.calls = self.calls, []
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+class InMemoryLock:
+    def __init__(self, redis: InMemoryRedis, name: str, timeout: float = None):
+        self.redis = redis
+        self.name = name
+        self.timeout = timeout
+
+    def acquire(self, blocking=True):
+        return bool(self.redis.set(self.name, b"1", ex=self.timeout, nx=True))
+
+    def release(self):
+        self.redis.delete(self.name)
+
+
+def get_field(document, path):
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def matches(document, query) -> bool:
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(document, branch) for branch in condition):
+                return False
+            continue
+        value = get_field(document, field)
+        if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+            for operator, operand in condition.items():
+                if not OPERATORS[operator](value, operand):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+OPERATORS = {
+    "$gt": lambda value, operand: value is not None and value > operand,
+    "$gte": lambda value, operand: value is not None and value >= operand,
+    "$lt": lambda value, operand: value is not None and value < operand,
+    "$lte": lambda value, operand: value is not None and value <= operand,
+    "$ne": lambda value, operand: value != operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+    "$regex": lambda value, operand: isinstance(value, str) and re.search(operand, value) is not None,
+}
+
+
+def project(document, projection):
+    if not projection:
+        return copy.deepcopy(document)
+    result = {"_id": document["_id"]}
+    for field in projection:
+        top = field.split(".")[0]
+        if top in document:
+            result[top] = copy.deepcopy(document[top])
+    return result
+
+
+def apply_update(document, update, inserting=False):
+    for field, value in update.get("$set", {}).items():
+        document[field] = value
+    for field in update.get("$unset", {}):
+        document.pop(field, None)
+    for field, amount in update.get("$inc", {}).items():
+        document[field] = (document.get(field) or 0) + amount
+    for field in update.get("$currentDate", {}):
+        document[field] = datetime.now(timezone.utc).replace(tzinfo=None)
+    if inserting:
+        for field, value in update.get("$setOnInsert", {}).items():
+            document[field] = value
+
+
+class InMemoryCursor:
+    """A motor-like cursor: chainable sort/limit/batch_size, then to_list or async iteration"""
+
+    def __init__(self, collection, query, projection):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self._sort = None
+        self._limit = None
+
+    def sort(self, field, direction=1):
+        self._sort = (field, direction)
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def _results(self):
+        documents = self.collection.select(self.query)
+        if self._sort:
+            field, direction = self._sort
+            documents.sort(key=lambda document: document.get(field), reverse=direction < 0)
+        if self._limit:
+            documents = documents[:self._limit]
+        return [project(document, self.projection) for document in documents]
+
+    async def to_list(self, length=None):
+        return self._results()
+
+    async def __aiter__(self):
+        for document in self._results():
+            yield document
+
+    async def close(self):
+        pass
+
+
+class InMemoryCollection:
+    def __init__(self):
+        self.documents = {}
+        self._lock = threading.Lock()
+
+    def select(self, query):
+        with self._lock:
+            if set(query) == {"_id"} and not isinstance(query["_id"], dict):
+                document = self.documents.get(query["_id"])
+                return [document] if document is not None else []
+            return [document for document in self.documents.values() if matches(document, query)]
+
+    async def create_indexes(self, indexes):
+        return [index.document["name"] for index in indexes]
+
+    async def insert_one(self, document):
+        with self._lock:
+            if document["_id"] in self.documents:
+                raise DuplicateKeyError(f"duplicate key: {document['_id']}")
+            self.documents[document["_id"]] = copy.deepcopy(document)
+        return type("InsertOneResult", (), {"inserted_id": document["_id"]})()
+
+    async def insert_many(self, documents, ordered=True):
+        errors = []
+        for index, document in enumerate(documents):
+            try:
+                await self.insert_one(document)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    async def find_one(self, query, projection=None):
+        documents = self.select(query)
+        return project(documents[0], projection) if documents else None
+
+    def find(self, query, projection=None):
+        return InMemoryCursor(self, query, projection)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE):
+        with self._lock:
+            document = next((document for document in self.documents.values() if matches(document, query)), None)
+            inserting = document is None
+            if inserting:
+                if not upsert:
+                    return None
+                document = {field: value for field, value in query.items() if not isinstance(value, dict)}
+                self.documents[document["_id"]] = document
+            before = copy.deepcopy(document)
+            apply_update(document, update, inserting)
+        if return_document == ReturnDocument.AFTER:
+            return project(document, projection)
+        return None if inserting else project(before, projection)
+
+    async def update_one(self, query, update):
+        updated = await self.find_one_and_update(query, update)
+        modified = 1 if updated is not None else 0
+        return type("UpdateResult", (), {"modified_count": modified, "matched_count": modified})()
+
+    async def find_one_and_delete(self, query, projection=None):
+        with self._lock:
+            document = next((document for document in self.documents.values() if matches(document, query)), None)
+            if document is None:
+                return None
+            del self.documents[document["_id"]]
+        return project(document, projection)
+
+    async def delete_one(self, query):
+        deleted = await self.find_one_and_delete(query)
+        return type("DeleteResult", (), {"deleted_count": 0 if deleted is None else 1})()
+
+    async def delete_many(self, query):
+        with self._lock:
+            doomed = [key for key, document in self.documents.items() if matches(document, query)]
+            for key in doomed:
+                del self.documents[key]
+        return type("DeleteResult", (), {"deleted_count": len(doomed)})()
+
+
+class InMemoryDatabase:
+    def __init__(self, name):
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name):
+        return self._collections.setdefault(name, InMemoryCollection())
+
+
+class InMemoryMongoClient:
+    """Stands in for AsyncIOMotorClient; every client for a URI shares the same databases"""
+
+    databases = {}
+
+    def __init__(self, uri, *args, **kwargs):
+        self.uri = uri
+
+    def __getitem__(self, name):
+        return self.databases.setdefault(name, InMemoryDatabase(name))
+
+    def close(self):
+        pass
+
+
+def client_error(code, operation):
+    return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+
+class InMemoryBody(io.BytesIO):
+    pass
+
+
+class InMemoryS3Client:
+    """The subset of the boto3 S3 client used by StorageRepositoryS3, backed by dicts"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.uploads = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, bucket, operation):
+        if bucket not in self.buckets:
+            raise client_error("NoSuchBucket", operation)
+        return self.buckets[bucket]
+
+    def _object(self, bucket, key, operation):
+        stored = self._bucket(bucket, operation).get(key)
+        if stored is None:
+            raise client_error("NoSuchKey", operation)
+        return stored
+
+    def head_bucket(self, Bucket):
+        self._bucket(Bucket, "HeadBucket")
+        return {}
+
+    def create_bucket(self, Bucket):
+        with self._lock:
+            if Bucket in self.buckets:
+                raise client_error("BucketAlreadyOwnedByYou", "CreateBucket")
+            self.buckets[Bucket] = {}
+        return {}
+
+    def put_object(self, Bucket, Key, Body=b"", ContentType=None, **kwargs):
+        body = Body if isinstance(Body, bytes) else Body.read()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        with self._lock:
+            self._bucket(Bucket, "PutObject")[Key] = {
+                "Body": body, "ContentType": ContentType, "ETag": etag, "LastModified": datetime.now(timezone.utc)}
+        return {"ETag": etag}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Config=None):
+        self.put_object(Bucket, Key, Fileobj.read(), **(ExtraArgs or {}))
+
+    def download_fileobj(self, Bucket, Key, Fileobj):
+        Fileobj.write(self._object(Bucket, Key, "GetObject")["Body"])
+
+    def get_object(self, Bucket, Key, Range=None):
+        stored = self._object(Bucket, Key, "GetObject")
+        body = stored["Body"]
+        response = {"ContentType": stored["ContentType"], "ETag": stored["ETag"]}
+        if Range:
+            start, _, end = Range.replace("bytes=", "").partition("-")
+            start = int(start or 0)
+            end = min(int(end) if end else len(body) - 1, len(body) - 1)
+            if start >= len(body):
+                raise client_error("InvalidRange", "GetObject")
+            response["ContentRange"] = f"bytes {start}-{end}/{len(body)}"
+            body = body[start:end + 1]
+        response.update({"Body": InMemoryBody(body), "ContentLength": len(body)})
+        return response
+
+    def head_object(self, Bucket, Key):
+        stored = self._object(Bucket, Key, "HeadObject")
+        return {"ContentLength": len(stored["Body"]), "ETag": stored["ETag"], "ContentType": stored["ContentType"]}
+
+    def delete_object(self, Bucket, Key):
+        with self._lock:
+            self._bucket(Bucket, "DeleteObject").pop(Key, None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete):
+        with self._lock:
+            bucket = self._bucket(Bucket, "DeleteObjects")
+            for item in Delete["Objects"]:
+                bucket.pop(item["Key"], None)
+        return {"Errors": []}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._bucket(Bucket, "CreateMultipartUpload")
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {"parts": {}, "ContentType": kwargs.get("ContentType")}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self._lock:
+            self.uploads[UploadId]["parts"][PartNumber] = Body
+        return {"ETag": f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        with self._lock:
+            upload = self.uploads.pop(UploadId)
+        body = b"".join(upload["parts"][part["PartNumber"]] for part in MultipartUpload["Parts"])
+        return self.put_object(Bucket, Key, body, ContentType=upload["ContentType"])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        with self._lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+    def generate_presigned_url(self, operation, Params=None, ExpiresIn=3600):
+        params = Params or {}
+        return f"http://s3.standin/{params.get('Bucket')}/{params.get('Key')}?operation={operation}&expires={ExpiresIn}"
+
+    def get_paginator(self, operation):
+        return InMemoryListPaginator(self)
+
+
+class InMemoryListPaginator:
+    def __init__(self, client: InMemoryS3Client):
+        self.client = client
+
+    def paginate(self, Bucket, PaginationConfig=None, StartAfter=None, Prefix=None):
+        page_size = (PaginationConfig or {}).get("PageSize", 1000)
+        bucket = self.client._bucket(Bucket, "ListObjectsV2")
+        keys = sorted(key for key in bucket if (StartAfter is None or key > StartAfter)
+                      and (Prefix is None or fnmatch.fnmatch(key, f"{Prefix}*")))
+        for start in range(0, len(keys), page_size):
+            yield {"Contents": [{"Key": key, "LastModified": bucket[key]["LastModified"], "Size": len(bucket[key]["Body"])}
+                                for key in keys[start:start + page_size]]}
+
+
+class StandInAuthMiddleware:
+    """Replaces the common_api token, licence, database and CORS middlewares.
+
+    Sets the request state those middlewares would set after a successful
+    Keycloak introspection and licence check, with repositories for the
+    stand-in tenant database.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            from repositories import get_repositories
+
+            request = Request(scope)
+            request.state.token_info = {"user_uuid": BENCH_USER}
+            request.state.licence_uuid = BENCH_LICENCE
+            request.state.repos = get_repositories(BENCH_MONGO_URI)
+        await self.app(scope, receive, send)
+
+
+def allow_all(permissions):
+    def decorator(function):
+        return function
+    return decorator
+
+
+class Backends:
+    def __init__(self):
+        self.redis = InMemoryRedis()
+        self.s3 = InMemoryS3Client()
+        self.mongo = InMemoryMongoClient
+
+
+@contextmanager
+def installed():
+    """Patch every external dependency with a stand-in for the duration of the block.
+
+    Must be entered before ``routers`` (or ``main``) is imported, because the
+    permission decorator is applied at import time.
+    """
+    import common_api.decorators.v0.check_permission as check_permission
+
+    backends = Backends()
+    InMemoryMongoClient.databases = {}
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(check_permission, "check_permissions", allow_all))
+
+        import repositories.object_cache as object_cache
+        import repositories.storage_repository_mongo_async as mongo_async
+        import repositories.storage_repository_s3 as s3
+        import repositories.storage_repository_s3_pool as s3_pool
+        import services.cleanup_service as cleanup_service
+        import services.credential_service as credential_service
+
+        async def fetch_credential(token, licence):
+            return BENCH_CREDENTIAL
+
+        stack.enter_context(patch.object(credential_service, "r", backends.redis))
+        stack.enter_context(patch.object(cleanup_service, "r", backends.redis))
+        stack.enter_context(patch.object(object_cache.object_cache, "redis", backends.redis))
+        stack.enter_context(patch.object(credential_service, "fetch_credential", fetch_credential))
+        stack.enter_context(patch.object(s3, "get_client", lambda credentials: backends.s3))
+        stack.enter_context(patch.object(mongo_async, "AsyncIOMotorClient", InMemoryMongoClient))
+
+        mongo_async.close_async_clients()
+        credential_service.local_credentials.clear()
+        object_cache.object_cache.clear()
+        s3.known_buckets.clear()
+        s3_pool.s3_repository_pool.clear()
+        try:
+            yield backends
+        finally:
+            mongo_async.close_async_clients()
+            s3_pool.s3_repository_pool.clear()
+
+
+def build_app():
+    """Return the application from ``main`` with the common_api middlewares swapped for the stand-in."""
+    from starlette.middleware import Middleware
+
+    from main import app
+
+    kept = [middleware for middleware in app.user_middleware
+            if not getattr(middleware.cls, "__module__", "").startswith("common_api")]
+    app.user_middleware = [Middleware(StandInAuthMiddleware)] + kept
+    app.middleware_stack = None
+    return app
@@ -1 +1 @@
-from  .config import LOG_LEVEL, API_NAME, API_TAG_NAME, URL_API_GATEWAY, KEYCLOAK_HOST, KEYCLOAK_REALM, KEYCLOAK_CLIENT_ID, KEYCLOAK_CLIENT_SECRET, REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD, UNPROTECTED_PATHS, UNLICENSED_PATHS
\ No newline at end of file
+from  .config import LOG_LEVEL, API_NAME, API_TAG_NAME, URL_API_GATEWAY, KEYCLOAK_HOST, KEYCLOAK_REALM, KEYCLOAK_CLIENT_ID, KEYCLOAK_CLIENT_SECRET, REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD, UNPROTECTED_PATHS, UNLICENSED_PATHS, S3_POOL_MAX_SIZE, S3_POOL_IDLE_TTL, S3_MAX_POOL_CONNECTIONS, S3_BUCKET_CACHE_TTL, S3_BUCKET_CACHE_MAX_SIZE, S3_TRANSFER_MAX_WORKERS, S3_TRANSFER_PER_TENANT_LIMIT, S3_MULTIPART_PART_SIZE, S3_MULTIPART_CONCURRENCY, LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT, MONGO_EXPLAIN_QUERIES, MONGO_INDEX_RETRY_BACKOFF, MONGO_INDEX_RETRY_MAX_BACKOFF, CREDENTIAL_CACHE_TTL, CREDENTIAL_LOCAL_TTL, CREDENTIAL_LOCAL_MAX_SIZE, CREDENTIAL_INVALIDATION_CHANNEL, GATEWAY_MAX_CONNECTIONS, GATEWAY_MAX_KEEPALIVE_CONNECTIONS, GATEWAY_TIMEOUT, GATEWAY_CONNECT_TIMEOUT, GATEWAY_RETRIES, GATEWAY_RETRY_BACKOFF, GATEWAY_ATTEMPT_TIMEOUT, GATEWAY_FETCH_BUDGET, CREDENTIAL_REFRESH_AHEAD, CREDENTIAL_LOCK_TTL, CREDENTIAL_LOCK_WAIT, PRESIGNED_UPLOAD_TTL, PRESIGNED_DOWNLOAD_TTL, BATCH_MAX_ITEMS, BATCH_UPLOAD_CONCURRENCY, CLEANUP_QUEUE_KEY, CLEANUP_DEAD_LETTER_KEY, CLEANUP_BATCH_SIZE, CLEANUP_POLL_INTERVAL, CLEANUP_VISIBILITY_TIMEOUT, CLEANUP_MAX_ATTEMPTS, CLEANUP_RETRY_BACKOFF, CLEANUP_RETRY_MAX_BACKOFF, CLEANUP_CREDENTIAL_WAIT, STORAGE_DEDUP, OBJECT_CACHE_ENABLED, OBJECT_CACHE_TTL, OBJECT_CACHE_NEGATIVE_TTL, OBJECT_CACHE_LOCAL_TTL, OBJECT_CACHE_LOCAL_MAX_SIZE, OBJECT_CACHE_TOMBSTONE_TTL, EXPORT_BATCH_SIZE, EXPORT_GZIP_LEVEL, METRICS_TENANT_CLASSES, METRICS_DEFAULT_TENANT_CLASS, SERVER_TIMING_ENABLED
\ No newline at end of file
@@ -1,3 +1,4 @@
+import json
 import os
 
 # API Configuration
@@ -20,5 +21,95 @@ REDIS_PORT = int(os.environ.get('REDIS_PORT', '6379'))
 REDIS_DB = int(os.environ.get('REDIS_DB', '0'))
 REDIS_PASSWORD = os.environ.get('REDIS_PASSWORD', 'test-password')
 
-UNPROTECTED_PATHS = ['/favicon.ico', '/docs', '/storage/openapi.json']
+UNPROTECTED_PATHS = ['/favicon.ico', '/docs', '/storage/openapi.json', '/storage/stats', '/storage/metrics']
 UNLICENSED_PATHS = []
+
+# S3 client pool
+S3_POOL_MAX_SIZE = int(os.environ.get('S3_POOL_MAX_SIZE', '256'))
+S3_POOL_IDLE_TTL = int(os.environ.get('S3_POOL_IDLE_TTL', '900'))
+S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', '20'))
+S3_BUCKET_CACHE_TTL = int(os.environ.get('S3_BUCKET_CACHE_TTL', '3600'))
+S3_BUCKET_CACHE_MAX_SIZE = int(os.environ.get('S3_BUCKET_CACHE_MAX_SIZE', '1024'))
+
+# S3 transfer pool
+S3_TRANSFER_MAX_WORKERS = int(os.environ.get('S3_TRANSFER_MAX_WORKERS', '16'))
+S3_TRANSFER_PER_TENANT_LIMIT = int(os.environ.get('S3_TRANSFER_PER_TENANT_LIMIT', '4'))
+
+# S3 multipart uploads (S3 rejects parts smaller than 5 MiB except the last one)
+S3_MULTIPART_PART_SIZE = max(int(os.environ.get('S3_MULTIPART_PART_SIZE', str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+S3_MULTIPART_CONCURRENCY = max(int(os.environ.get('S3_MULTIPART_CONCURRENCY', '4')), 1)
+
+# Object listing
+LIST_DEFAULT_LIMIT = int(os.environ.get('LIST_DEFAULT_LIMIT', '100'))
+LIST_MAX_LIMIT = int(os.environ.get('LIST_MAX_LIMIT', '1000'))
+
+# MongoDB diagnostics: explain repository queries and warn on collection scans
+MONGO_EXPLAIN_QUERIES = os.environ.get('MONGO_EXPLAIN_QUERIES', 'false').lower() in ('1', 'true', 'yes')
+# A failed index creation is retried after this delay, doubled on each further failure up to the maximum
+MONGO_INDEX_RETRY_BACKOFF = float(os.environ.get('MONGO_INDEX_RETRY_BACKOFF', '30'))
+MONGO_INDEX_RETRY_MAX_BACKOFF = float(os.environ.get('MONGO_INDEX_RETRY_MAX_BACKOFF', '3600'))
+
+# Storage credential cache: per-process tier in front of the shared Redis tier
+CREDENTIAL_CACHE_TTL = int(os.environ.get('CREDENTIAL_CACHE_TTL', '1800'))
+CREDENTIAL_LOCAL_TTL = int(os.environ.get('CREDENTIAL_LOCAL_TTL', '300'))
+CREDENTIAL_LOCAL_MAX_SIZE = int(os.environ.get('CREDENTIAL_LOCAL_MAX_SIZE', '1024'))
+CREDENTIAL_INVALIDATION_CHANNEL = os.environ.get('CREDENTIAL_INVALIDATION_CHANNEL', 'storage_credential_invalidation')
+CREDENTIAL_REFRESH_AHEAD = int(os.environ.get('CREDENTIAL_REFRESH_AHEAD', '300'))
+CREDENTIAL_LOCK_WAIT = float(os.environ.get('CREDENTIAL_LOCK_WAIT', '5'))
+
+# API gateway client
+GATEWAY_MAX_CONNECTIONS = int(os.environ.get('GATEWAY_MAX_CONNECTIONS', '50'))
+GATEWAY_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('GATEWAY_MAX_KEEPALIVE_CONNECTIONS', '20'))
+GATEWAY_TIMEOUT = float(os.environ.get('GATEWAY_TIMEOUT', '5'))
+GATEWAY_CONNECT_TIMEOUT = float(os.environ.get('GATEWAY_CONNECT_TIMEOUT', '2'))
+GATEWAY_RETRIES = int(os.environ.get('GATEWAY_RETRIES', '2'))
+GATEWAY_RETRY_BACKOFF = float(os.environ.get('GATEWAY_RETRY_BACKOFF', '0.2'))
+# Hard limit on one gateway request, so a whole credential fetch has a known worst case
+GATEWAY_ATTEMPT_TIMEOUT = GATEWAY_CONNECT_TIMEOUT + GATEWAY_TIMEOUT
+GATEWAY_FETCH_BUDGET = (GATEWAY_RETRIES + 1) * GATEWAY_ATTEMPT_TIMEOUT + GATEWAY_RETRY_BACKOFF * (2 ** GATEWAY_RETRIES - 1)
+# The fetch lock must outlive the slowest fetch, or a second worker would fetch too
+CREDENTIAL_LOCK_TTL = max(float(os.environ.get('CREDENTIAL_LOCK_TTL', '10')), GATEWAY_FETCH_BUDGET + 1)
+
+# Presigned URLs for direct client-to-S3 transfers
+PRESIGNED_UPLOAD_TTL = int(os.environ.get('PRESIGNED_UPLOAD_TTL', '3600'))
+PRESIGNED_DOWNLOAD_TTL = int(os.environ.get('PRESIGNED_DOWNLOAD_TTL', '300'))
+
+# Batch endpoints
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', '1000'))
+BATCH_UPLOAD_CONCURRENCY = max(int(os.environ.get('BATCH_UPLOAD_CONCURRENCY', '8')), 1)
+
+# Deferred bucket cleanup: files of deleted objects are removed by a background worker
+CLEANUP_QUEUE_KEY = os.environ.get('CLEANUP_QUEUE_KEY', 'storage_cleanup_queue')
+CLEANUP_DEAD_LETTER_KEY = os.environ.get('CLEANUP_DEAD_LETTER_KEY', 'storage_cleanup_dead')
+CLEANUP_BATCH_SIZE = int(os.environ.get('CLEANUP_BATCH_SIZE', '100'))
+CLEANUP_POLL_INTERVAL = float(os.environ.get('CLEANUP_POLL_INTERVAL', '1'))
+CLEANUP_VISIBILITY_TIMEOUT = int(os.environ.get('CLEANUP_VISIBILITY_TIMEOUT', '60'))
+CLEANUP_MAX_ATTEMPTS = int(os.environ.get('CLEANUP_MAX_ATTEMPTS', '12'))
+CLEANUP_RETRY_BACKOFF = float(os.environ.get('CLEANUP_RETRY_BACKOFF', '5'))
+CLEANUP_RETRY_MAX_BACKOFF = float(os.environ.get('CLEANUP_RETRY_MAX_BACKOFF', '3600'))
+# Jobs of a licence whose credential is not cached wait this long without using up an attempt
+CLEANUP_CREDENTIAL_WAIT = float(os.environ.get('CLEANUP_CREDENTIAL_WAIT', '300'))
+
+# Content-addressed storage: identical uploads share one reference-counted blob
+STORAGE_DEDUP = os.environ.get('STORAGE_DEDUP', 'false').lower() in ('1', 'true', 'yes')
+
+# Object metadata cache: per-process LRU in front of the shared Redis tier.
+# Writes invalidate both tiers on the writing worker; other workers' local copies expire after OBJECT_CACHE_LOCAL_TTL.
+OBJECT_CACHE_ENABLED = os.environ.get('OBJECT_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+OBJECT_CACHE_TTL = int(os.environ.get('OBJECT_CACHE_TTL', '300'))
+OBJECT_CACHE_NEGATIVE_TTL = int(os.environ.get('OBJECT_CACHE_NEGATIVE_TTL', '30'))
+OBJECT_CACHE_LOCAL_TTL = float(os.environ.get('OBJECT_CACHE_LOCAL_TTL', '5'))
+OBJECT_CACHE_LOCAL_MAX_SIZE = int(os.environ.get('OBJECT_CACHE_LOCAL_MAX_SIZE', '10000'))
+# Invalidated keys hold a tombstone this long, so a read that started before the write cannot cache what it loaded
+OBJECT_CACHE_TOMBSTONE_TTL = int(os.environ.get('OBJECT_CACHE_TOMBSTONE_TTL', '10'))
+
+# NDJSON export: objects fetched per cursor batch and written per response chunk
+EXPORT_BATCH_SIZE = max(int(os.environ.get('EXPORT_BATCH_SIZE', '500')), 1)
+EXPORT_GZIP_LEVEL = int(os.environ.get('EXPORT_GZIP_LEVEL', '6'))
+
+# Prometheus metrics. Tenants are labelled by class rather than by licence to bound label cardinality;
+# METRICS_TENANT_CLASSES maps licence uuids to a class, e.g. {"<licence>": "premium"}.
+METRICS_TENANT_CLASSES = json.loads(os.environ.get('METRICS_TENANT_CLASSES', '{}'))
+METRICS_DEFAULT_TENANT_CLASS = os.environ.get('METRICS_DEFAULT_TENANT_CLASS', 'standard')
+# Adds a Server-Timing header with the stages of each request, for ad-hoc debugging
+SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
@@ -1,5 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Iterator, List, Tuple
+
+
+class InvalidRangeError(ValueError):
+    pass
 
 
 class StorageBucketRepository(ABC):
@@ -9,21 +13,83 @@ class StorageBucketRepository(ABC):
         pass
 
     @abstractmethod
-    def upload_file_to_bucket(self, file: Any, custom_uuid: str = None) -> (str, str):
+    def upload_file_to_bucket(self, file: Any, custom_uuid: str = None) -> (str, int):
         pass
 
     @abstractmethod
     def download_file_from_bucket(self, file_path: str) -> Any:
         pass
 
+    @abstractmethod
+    async def get_file_stream_async(self, file_path: str, byte_range: str = None) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def iter_file_stream(self, body: Any, chunk_size: int) -> AsyncIterator[bytes]:
+        pass
+
     @abstractmethod
     def delete_file_from_bucket(self, file_path: str) -> None:
         pass
 
+    @abstractmethod
+    def delete_files_from_bucket(self, file_paths: List[str]) -> Dict[str, str]:
+        pass
+
+    @abstractmethod
+    def iter_bucket_pages(self, start_after: str = None, page_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        pass
+
     @abstractmethod
     def list_files_in_bucket(self) -> Dict[str, Any]:
         pass
 
+    @abstractmethod
+    async def upload_file_to_bucket_async(self, file: Any, custom_uuid: str = None) -> (str, int):
+        pass
+
+    @abstractmethod
+    async def hash_upload_file_async(self, file: Any) -> Tuple[str, int]:
+        pass
+
+    @abstractmethod
+    async def upload_blob_async(self, file: Any, key: str) -> Tuple[str, int]:
+        pass
+
+    @abstractmethod
+    async def file_exists_async(self, file_path: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def download_file_from_bucket_async(self, file_path: str) -> Any:
+        pass
+
+    @abstractmethod
+    async def delete_file_from_bucket_async(self, file_path: str) -> None:
+        pass
+
+    @abstractmethod
+    async def delete_files_from_bucket_async(self, file_paths: List[str]) -> Dict[str, str]:
+        pass
+
+    @abstractmethod
+    async def list_files_in_bucket_async(self) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    async def generate_presigned_upload_async(self, filename: str, content_type: str = None, size: int = None,
+                                              custom_uuid: str = None) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    async def complete_presigned_upload_async(self, file_path: str, upload_id: str = None,
+                                              parts: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def generate_presigned_download(self, file_path: str, expires_in: int = None) -> str:
+        pass
+
     @abstractmethod
     def close(self):
         pass
\ No newline at end of file
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from models.object_model import ObjectWrite
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 
 class StorageRepository(ABC):
@@ -29,6 +29,10 @@ class StorageRepository(ABC):
     def delete_object(self, object_id: str):
         pass
 
+    @abstractmethod
+    def find_referenced_file_paths(self, file_paths: List[str]) -> set:
+        pass
+
     @abstractmethod
     def close(self):
         pass
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException
 from fastapi.openapi.utils import get_openapi
 from fastapi.security import HTTPBearer
@@ -8,9 +10,14 @@ from common_api.middlewares.v1 import TokenVerificationMiddleware
 from common_api.middlewares.v1 import DBConnectionMiddleware
 from common_api.middlewares.v1 import LicenceVerificationMiddleware
 from common_api.middlewares.v1 import CustomCORSMiddleware
+from middlewares.metrics_middleware import MetricsMiddleware
 from middlewares.storage_middleware import StorageConnectionMiddleware
+from repositories.storage_repository_mongo_async import close_async_clients
+from repositories.storage_repository_s3 import transfer_executor
+from services.credential_service import start_invalidation_listener, stop_invalidation_listener, close_gateway_client
+from services.cleanup_service import start_cleanup_worker, stop_cleanup_worker
 
-from routers import v1
+from routers import v1, stats
 from common_api.services.v0 import Logger
 from common_api.config import init_config
 
@@ -35,7 +42,21 @@ init_config(
 
 bearer_scheme = HTTPBearer()
 
-app = FastAPI(openapi_url="/storage/openapi.json")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_invalidation_listener()
+    start_cleanup_worker()
+    yield
+    logger.info(f"Stopping {API_NAME} Service")
+    await stop_cleanup_worker()
+    stop_invalidation_listener()
+    await close_gateway_client()
+    close_async_clients()
+    transfer_executor.shutdown()
+
+
+app = FastAPI(openapi_url="/storage/openapi.json", lifespan=lifespan)
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
@@ -67,6 +88,7 @@ def custom_openapi():
     return app.openapi_schema
 app.openapi = custom_openapi
 
+app.add_middleware(MetricsMiddleware)
 app.add_middleware(StorageConnectionMiddleware)
 app.add_middleware(DBConnectionMiddleware)
 app.add_middleware(LicenceVerificationMiddleware)
@@ -75,3 +97,4 @@ app.add_middleware(CustomCORSMiddleware)
 app.add_exception_handler(HTTPException, http_exception_handler)
 
 app.include_router(v1.router)
+app.include_router(stats.router)
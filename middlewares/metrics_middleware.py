@@ -0,0 +1,46 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from common_api.services.v0 import Logger
+from config.config import SERVER_TIMING_ENABLED
+from utils.metrics import tenant_class, tenant_class_var, request_timings_var, observe_stage, format_server_timing
+
+logger = Logger()
+
+
+class MetricsMiddleware:
+    """Label the stages of a request with its tenant class and time the request as a whole.
+
+    Added innermost, after the licence is known. With ``server_timing`` the stages
+    recorded before the response starts are returned in a Server-Timing header.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = SERVER_TIMING_ENABLED):
+        logger.init("Initializing MetricsMiddleware")
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = []
+        class_token = tenant_class_var.set(tenant_class(scope.get("state", {}).get("licence_uuid")))
+        timings_token = request_timings_var.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message):
+            if message["type"] == "http.response.start" and self.server_timing:
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", format_server_timing(timings, time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings_var.reset(timings_token)
+            observe_stage("request", time.perf_counter() - start)
+            tenant_class_var.reset(class_token)
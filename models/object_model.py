@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from typing import Optional
+from datetime import datetime
 
 
 class ObjectRead(BaseModel):
@@ -8,9 +9,53 @@ class ObjectRead(BaseModel):
     description: Optional[str] = None
     created_by: Optional[str] = Field(None, description="User who created the object")
     file_path: Optional[str] = Field(None, description="Path to the uploaded file")
+    version: Optional[int] = Field(None, description="Incremented by every change, also sent as the ETag")
+    updated_at: Optional[datetime] = Field(None, description="Time of the last change")
 
 
 class ObjectWrite(BaseModel):
     name: str
     description: Optional[str] = None
     created_by: Optional[str] = Field(None, description="User who created the object")
+
+
+class UploadedPart(BaseModel):
+    part_number: int = Field(..., ge=1, le=10000)
+    etag: str
+
+
+class UploadCompletion(BaseModel):
+    parts: Optional[list[UploadedPart]] = Field(None, description="Parts of a multipart direct upload")
+
+
+class BatchItem(BaseModel):
+    name: str
+    description: Optional[str] = None
+    file_index: Optional[int] = Field(None, ge=0, description="Index of the item's file in the files field")
+
+
+class ObjectFilter(BaseModel):
+    # A misspelt criterion must not be dropped, or the filter would match every object
+    model_config = ConfigDict(extra="forbid")
+
+    created_by: Optional[str] = None
+    name_prefix: Optional[str] = None
+    has_file: Optional[bool] = None
+
+    @model_validator(mode="after")
+    def check_criteria(self):
+        if self.created_by is None and not self.name_prefix and self.has_file is None:
+            raise ValueError("A filter needs at least one criterion")
+        return self
+
+
+class BatchDelete(BaseModel):
+    uuids: Optional[list[str]] = Field(None, description="Objects to delete")
+    filter: Optional[ObjectFilter] = Field(None, description="Delete every object matching the filter")
+    all: bool = Field(False, description="Delete every object of the tenant")
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if [self.uuids is not None, self.filter is not None, self.all].count(True) != 1:
+            raise ValueError("Provide exactly one of uuids, filter or all")
+        return self
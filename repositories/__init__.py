@@ -1,8 +1,9 @@
-from typing import Type
+import asyncio
+from typing import Awaitable, Callable, Type
 
 from common_api.services.v0 import Logger
-from repositories.storage_repository_mongo import StorageRepositoryMongo
-from repositories.storage_repository_s3 import StorageRepositoryS3
+from repositories.storage_repository_mongo_async import StorageRepositoryMongoAsync
+from repositories.storage_repository_s3_pool import s3_repository_pool
 
 logger = Logger()
 
@@ -17,21 +18,32 @@ class BucketRepositories:
         self.storage_bucket_repo = storage_bucket_repo
 
 
+class LazyBucketRepositories:
+    """Bucket repositories resolved on first use, so metadata-only requests skip credential lookup."""
+
+    def __init__(self, resolver: Callable[[], Awaitable[BucketRepositories]]):
+        self._resolver = resolver
+        self._task = None
+
+    async def resolve(self) -> BucketRepositories:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._resolver())
+        return await self._task
+
+
 def get_repositories(uri: str) -> Repositories | Type[Repositories]:
     if uri.startswith("mongodb"):
-        logger.info("Using MongoDB repositories")
         return Repositories(
-            storage_repo = StorageRepositoryMongo(uri)
+            storage_repo = StorageRepositoryMongoAsync(uri)
         )
 
     return Repositories
 
 
-def get_bucket_repositories(credentials) -> BucketRepositories | Type[BucketRepositories]:
+def get_bucket_repositories(credentials, licence: str = None) -> BucketRepositories | Type[BucketRepositories]:
     if isinstance(credentials, dict) and "s3" in credentials:
-        logger.info("Using S3 bucket repositories")
         return BucketRepositories(
-            storage_bucket_repo = StorageRepositoryS3(credentials["s3"])
+            storage_bucket_repo = s3_repository_pool.get(credentials["s3"], licence=licence)
         )
 
     return BucketRepositories
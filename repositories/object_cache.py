@@ -0,0 +1,180 @@
+import asyncio
+import threading
+from collections import Counter
+from typing import Iterable, Optional, Tuple
+
+from bson import json_util
+
+from common_api.services.v0 import Logger
+from common_api.services.v0.inmemory_service import get_redis_api_db
+from config.config import OBJECT_CACHE_TTL, OBJECT_CACHE_NEGATIVE_TTL, OBJECT_CACHE_LOCAL_TTL, \
+    OBJECT_CACHE_LOCAL_MAX_SIZE, OBJECT_CACHE_TOMBSTONE_TTL
+from utils.ttl_cache import TTLCache
+
+logger = Logger()
+
+_MISSING = object()
+# Kept in the local tier for objects known not to exist
+_NOT_FOUND = object()
+# Written in Redis over invalidated entries; never a valid json_util payload
+TOMBSTONE = "invalidated"
+
+
+class ObjectCache:
+    """Read-through cache of serialised objects, keyed by tenant database and uuid.
+
+    A bounded per-process LRU answers the hot set without network I/O; Redis is
+    shared by all workers. Lookups of missing objects are cached too, for a
+    shorter time, so repeated 404s do not reach Mongo. Redis errors are logged
+    and treated as misses: the database stays the source of truth.
+
+    Invalidation leaves a short-lived tombstone instead of deleting the key, and
+    results are only stored where no key exists. A read that missed before a
+    write and finishes after it therefore cannot put the old object back.
+    """
+
+    def __init__(self, redis, ttl: int = OBJECT_CACHE_TTL, negative_ttl: int = OBJECT_CACHE_NEGATIVE_TTL,
+                 local_ttl: float = OBJECT_CACHE_LOCAL_TTL, local_max_size: int = OBJECT_CACHE_LOCAL_MAX_SIZE,
+                 tombstone_ttl: int = OBJECT_CACHE_TOMBSTONE_TTL):
+        self.redis = redis
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.tombstone_ttl = tombstone_ttl
+        self.local = TTLCache(max_size=local_max_size, ttl=local_ttl)
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    def for_database(self, database: str) -> "DatabaseObjectCache":
+        return DatabaseObjectCache(self, database)
+
+    @staticmethod
+    def key(database: str, uuid: str) -> str:
+        return f"{database}_object_{uuid}"
+
+    def get(self, database: str, uuid: str) -> Tuple[bool, Optional[dict]]:
+        """Return ``(True, object)`` on a hit, where object is None for a cached 404, else ``(False, None)``."""
+        hit, object = self.get_local(database, uuid)
+        if hit:
+            return hit, object
+        return self.get_shared(database, uuid)
+
+    def get_local(self, database: str, uuid: str) -> Tuple[bool, Optional[dict]]:
+        """Look the object up in the per-process tier only; a miss is not counted."""
+        cached = self.local.get(self.key(database, uuid), _MISSING)
+        if cached is _MISSING:
+            return False, None
+        self._count("negative_hits" if cached is _NOT_FOUND else "local_hits")
+        return True, None if cached is _NOT_FOUND else dict(cached)
+
+    def get_shared(self, database: str, uuid: str) -> Tuple[bool, Optional[dict]]:
+        """Look the object up in Redis, filling the local tier on a hit."""
+        key = self.key(database, uuid)
+        try:
+            payload = self.redis.get(key)
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"Object cache read failed for {key}: {e}")
+            payload = None
+        if payload is None or payload in (TOMBSTONE, TOMBSTONE.encode()):
+            self._count("misses")
+            return False, None
+
+        object = json_util.loads(payload)
+        self.local.set(key, _NOT_FOUND if object is None else object)
+        self._count("negative_hits" if object is None else "redis_hits")
+        return True, None if object is None else dict(object)
+
+    def set(self, database: str, uuid: str, object: Optional[dict]) -> None:
+        """Cache a lookup result; None records that the object does not exist.
+
+        Nothing is stored when Redis already holds the key: another reader cached
+        it first, or a write invalidated it while this result was being loaded.
+        """
+        key = self.key(database, uuid)
+        ttl = self.ttl if object is not None else self.negative_ttl
+        try:
+            stored = self.redis.set(key, json_util.dumps(object), ex=ttl, nx=True)
+        except Exception as e:
+            self._count("errors")
+            logger.warning(f"Object cache write failed for {key}: {e}")
+            return
+        if stored:
+            self.local.set(key, _NOT_FOUND if object is None else dict(object), ttl=min(self.local.ttl, ttl))
+
+    def invalidate(self, database: str, uuids: Iterable[str]) -> None:
+        keys = [self.key(database, uuid) for uuid in uuids]
+        if not keys:
+            return
+        for key in keys:
+            self.local.pop(key)
+        self._count("invalidations", len(keys))
+        try:
+            pipeline = self.redis.pipeline()
+            for key in keys:
+                pipeline.set(key, TOMBSTONE, ex=self.tombstone_ttl)
+            pipeline.execute()
+        except Exception as e:
+            # The entries expire on their own after OBJECT_CACHE_TTL
+            self._count("errors")
+            logger.warning(f"Object cache invalidation failed for {len(keys)} keys: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        hits = counters.get("local_hits", 0) + counters.get("redis_hits", 0) + counters.get("negative_hits", 0)
+        lookups = hits + counters.get("misses", 0)
+        return {
+            "local_size": len(self.local),
+            "local_hits": counters.get("local_hits", 0),
+            "redis_hits": counters.get("redis_hits", 0),
+            "negative_hits": counters.get("negative_hits", 0),
+            "misses": counters.get("misses", 0),
+            "hit_ratio": round(hits / lookups, 6) if lookups else 0.0,
+            "invalidations": counters.get("invalidations", 0),
+            "errors": counters.get("errors", 0),
+        }
+
+    def clear(self) -> None:
+        self.local.clear()
+        with self._lock:
+            self._counters.clear()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+
+class DatabaseObjectCache:
+    """The part of an ObjectCache that belongs to one tenant database.
+
+    The ``*_async`` methods run the Redis calls in a worker thread so they never
+    block the event loop; local hits are answered in place.
+    """
+
+    def __init__(self, cache: ObjectCache, database: str):
+        self.cache = cache
+        self.database = database
+
+    def get(self, uuid: str) -> Tuple[bool, Optional[dict]]:
+        return self.cache.get(self.database, uuid)
+
+    def set(self, uuid: str, object: Optional[dict]) -> None:
+        self.cache.set(self.database, uuid, object)
+
+    def invalidate(self, *uuids: str) -> None:
+        self.cache.invalidate(self.database, uuids)
+
+    async def get_async(self, uuid: str) -> Tuple[bool, Optional[dict]]:
+        hit, object = self.cache.get_local(self.database, uuid)
+        if hit:
+            return hit, object
+        return await asyncio.to_thread(self.cache.get_shared, self.database, uuid)
+
+    async def set_async(self, uuid: str, object: Optional[dict]) -> None:
+        await asyncio.to_thread(self.cache.set, self.database, uuid, object)
+
+    async def invalidate_async(self, *uuids: str) -> None:
+        await asyncio.to_thread(self.cache.invalidate, self.database, uuids)
+
+
+object_cache = ObjectCache(get_redis_api_db())
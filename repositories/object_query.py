@@ -0,0 +1,140 @@
+import base64
+import json
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, IndexModel
+
+# ObjectRead field -> Mongo document field
+OBJECT_FIELDS = {
+    "uuid": "_id",
+    "name": "name",
+    "description": "description",
+    "created_by": "created_by",
+    "file_path": "file_path",
+    "version": "version",
+    "updated_at": "updated_at",
+}
+REQUIRED_FIELDS = ("uuid", "name")
+# Listings without ``fields`` still only fetch what ObjectRead returns
+OBJECT_READ_PROJECTION = {field: 1 for field in OBJECT_FIELDS.values()}
+
+# Indexes the repositories rely on. Each compound index ends with _id so that
+# filtered listings can walk the index in keyset order without a blocking sort.
+OBJECT_INDEXES = [
+    IndexModel([("created_by", ASCENDING), ("_id", ASCENDING)], name="created_by_id"),
+    IndexModel([("name", ASCENDING), ("_id", ASCENDING)], name="name_id"),
+    IndexModel([("file_path", ASCENDING)], name="file_path", sparse=True),
+    IndexModel([("pending_upload.file_path", ASCENDING)], name="pending_upload_file_path", sparse=True),
+]
+
+
+def build_referenced_filter(file_paths: List[str]) -> Dict[str, Any]:
+    """Match documents that own, or are still uploading, any of ``file_paths``."""
+    return {"$or": [
+        {"file_path": {"$in": file_paths}},
+        {"pending_upload.file_path": {"$in": file_paths}},
+    ]}
+
+
+def referenced_file_paths(documents: Iterable[Dict[str, Any]]) -> set:
+    paths = set()
+    for document in documents:
+        if document.get("file_path"):
+            paths.add(document["file_path"])
+        pending = document.get("pending_upload") or {}
+        if pending.get("file_path"):
+            paths.add(pending["file_path"])
+    return paths
+
+
+def encode_cursor(last_id: str) -> str:
+    payload = json.dumps({"after": last_id}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["after"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(last_id, str):
+        raise ValueError("Invalid cursor")
+    return last_id
+
+
+def build_filter(cursor: Optional[str] = None, created_by: Optional[str] = None,
+                 name_prefix: Optional[str] = None, has_file: Optional[bool] = None) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    if cursor:
+        query["_id"] = {"$gt": decode_cursor(cursor)}
+    if created_by is not None:
+        query["created_by"] = created_by
+    if name_prefix:
+        # Anchored, case-sensitive prefix regexes can use the name index
+        query["name"] = {"$regex": f"^{re.escape(name_prefix)}"}
+    if has_file is True:
+        query["file_path"] = {"$nin": [None, ""]}
+    elif has_file is False:
+        query["file_path"] = {"$in": [None, ""]}
+    return query
+
+
+def stamp_new_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Give a document about to be inserted its first version and update time."""
+    document.setdefault("version", 1)
+    document.setdefault("updated_at", datetime.now(timezone.utc))
+    return document
+
+
+# Applied by every write that changes a document, so its version only ever grows
+VERSION_BUMP = {"$inc": {"version": 1}, "$currentDate": {"updated_at": True}}
+
+
+def build_version_filter(versions: Optional[List[int]]) -> Dict[str, Any]:
+    if versions is None:
+        return {}
+    accepted = list(versions)
+    if 0 in accepted:
+        # Documents written before versioning have no version field
+        accepted.append(None)
+    return {"version": {"$in": accepted}}
+
+
+def build_projection(fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, int]]:
+    if not fields:
+        return None
+    unknown = [field for field in fields if field not in OBJECT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    projection = {OBJECT_FIELDS[field]: 1 for field in REQUIRED_FIELDS}
+    projection.update({OBJECT_FIELDS[field]: 1 for field in fields})
+    return projection
+
+
+def next_cursor(documents: list, limit: int) -> Optional[str]:
+    """Trim the look-ahead document fetched past ``limit`` and return the cursor to the next page."""
+    if len(documents) <= limit:
+        return None
+    del documents[limit:]
+    return encode_cursor(str(documents[-1]["_id"]))
+
+
+def find_collscans(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return every COLLSCAN stage found in the winning plan of an explain() result."""
+    planner = plan.get("queryPlanner", plan)
+    stages = [planner.get("winningPlan", {})]
+    scans = []
+    while stages:
+        stage = stages.pop()
+        if not isinstance(stage, dict):
+            continue
+        if stage.get("stage") == "COLLSCAN":
+            scans.append(stage)
+        for key in ("inputStage", "queryPlan"):
+            if key in stage:
+                stages.append(stage[key])
+        stages.extend(stage.get("inputStages", []))
+    return scans
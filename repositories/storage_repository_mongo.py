@@ -7,6 +7,7 @@ from pymongo import MongoClient
 
 from interfaces.storage_interface import StorageRepository
 from models.object_model import ObjectWrite
+from repositories.object_query import build_referenced_filter, referenced_file_paths
 from schemas.object_schema import list_object_serial, object_serial
 
 def check_uri(uri):
@@ -83,5 +84,10 @@ class StorageRepositoryMongo(StorageRepository):
     def delete_object(self, uuid: str) -> None:
         self.db[self.collection].delete_one({"_id": uuid})
 
+    def find_referenced_file_paths(self, file_paths: List[str]) -> set:
+        documents = self.db[self.collection].find(
+            build_referenced_filter(file_paths), {"file_path": 1, "pending_upload.file_path": 1})
+        return referenced_file_paths(documents)
+
     def close(self):
         self.client.close()
@@ -0,0 +1,319 @@
+import asyncio
+import functools
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+from uuid import uuid4
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from common_api.services.v0 import Logger
+from config.config import MONGO_EXPLAIN_QUERIES, MONGO_INDEX_RETRY_BACKOFF, MONGO_INDEX_RETRY_MAX_BACKOFF, OBJECT_CACHE_ENABLED, EXPORT_BATCH_SIZE
+from interfaces.storage_interface import StorageRepository
+from models.object_model import ObjectWrite
+from repositories.object_query import build_filter, build_projection, next_cursor, find_collscans, \
+    build_referenced_filter, referenced_file_paths, build_version_filter, stamp_new_document, VERSION_BUMP, \
+    OBJECT_INDEXES, OBJECT_READ_PROJECTION
+from repositories.object_cache import object_cache, DatabaseObjectCache
+from repositories.storage_repository_mongo import check_uri, extract_database
+from schemas.object_schema import list_object_serial, object_serial
+from utils.metrics import time_repository_methods
+
+logger = Logger()
+
+_clients: Dict[str, AsyncIOMotorClient] = {}
+_clients_lock = threading.Lock()
+
+# Databases whose indexes were created by this process, and background creations in flight
+_indexed_databases = set()
+_index_tasks: Dict[str, asyncio.Future] = {}
+# Databases whose last creation failed: (consecutive failures, monotonic time of the next attempt)
+_index_failures: Dict[str, Tuple[int, float]] = {}
+
+
+def get_async_client(uri: str) -> AsyncIOMotorClient:
+    """Return the process-wide motor client for ``uri``, creating it on first use."""
+    client = _clients.get(uri)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(uri)
+            if client is None:
+                client = AsyncIOMotorClient(uri)
+                _clients[uri] = client
+    return client
+
+
+def close_async_clients() -> None:
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+    _indexed_databases.clear()
+    for task in list(_index_tasks.values()):
+        task.cancel()
+    _index_tasks.clear()
+    _index_failures.clear()
+
+
+def _index_creation_done(uri: str, namespace: str, task: asyncio.Future) -> None:
+    _index_tasks.pop(uri, None)
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        # Errors such as a conflicting index or missing privileges persist, so back off before retrying
+        failures = _index_failures.get(uri, (0, 0.0))[0] + 1
+        delay = min(MONGO_INDEX_RETRY_BACKOFF * 2 ** (failures - 1), MONGO_INDEX_RETRY_MAX_BACKOFF)
+        _index_failures[uri] = (failures, time.monotonic() + delay)
+        logger.warning(f"Failed to create indexes on {namespace}, retrying in {delay:.0f}s: {error}")
+        return
+    _index_failures.pop(uri, None)
+    _indexed_databases.add(uri)
+
+
+@time_repository_methods
+class StorageRepositoryMongoAsync(StorageRepository):
+    # Repositories built without __init__ (tests, scripts) read straight from the database
+    cache: Optional[DatabaseObjectCache] = None
+
+    def __init__(self, uri):
+        check_uri(uri)
+        database = extract_database(uri)
+
+        self.uri = uri
+        self.client = get_async_client(self.uri)
+        self.db = self.client[database]
+        self.collection = "objects"
+        self.blob_collection = "blobs"
+        self.cache = object_cache.for_database(database) if OBJECT_CACHE_ENABLED else None
+
+    def ensure_indexes(self) -> None:
+        """Start creating OBJECT_INDEXES in the background, once per database.
+
+        Callers do not wait: building indexes over a large existing collection can
+        take minutes, and queries work without them in the meantime.
+        """
+        if self.uri in _indexed_databases or self.uri in _index_tasks:
+            return
+        failure = _index_failures.get(self.uri)
+        if failure is not None and time.monotonic() < failure[1]:
+            return
+        task = asyncio.ensure_future(self.db[self.collection].create_indexes(OBJECT_INDEXES))
+        _index_tasks[self.uri] = task
+        task.add_done_callback(functools.partial(_index_creation_done, self.uri, f"{self.db.name}.{self.collection}"))
+
+    async def explain(self, query: Dict[str, Any], projection: Optional[Dict[str, int]], limit: int = None) -> None:
+        cursor = self.db[self.collection].find(query, projection).sort("_id", 1)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        plan = await cursor.explain()
+        if find_collscans(plan):
+            logger.warning(f"COLLSCAN on {self.db.name}.{self.collection} for query {query}")
+
+    async def create_object(self, object_create: ObjectWrite) -> str:
+        object_data = object_create.model_dump()
+        # Use the provided _id if it exists, otherwise generate a new one
+        if "_id" not in object_data:
+            object_data["_id"] = str(uuid4())
+        self.ensure_indexes()
+        stamp_new_document(object_data)
+        try:
+            new_uuid = await self.db[self.collection].insert_one(object_data)
+        except Exception as e:
+            raise ValueError(f"Failed to create object in database: {str(e)}")
+        # A client-supplied uuid may have been cached as missing
+        await self.invalidate_cached(new_uuid.inserted_id)
+        return new_uuid.inserted_id
+
+    async def create_object_with_file(self, object_data: Dict[str, Any]) -> str:
+        # Use the provided _id if it exists, otherwise generate a new one
+        if "_id" not in object_data:
+            object_data["_id"] = str(uuid4())
+
+        self.ensure_indexes()
+        stamp_new_document(object_data)
+        try:
+            new_uuid = await self.db[self.collection].insert_one(object_data)
+        except Exception as e:
+            raise ValueError(f"Failed to create object with file in database: {str(e)}")
+        # A client-supplied uuid may have been cached as missing
+        await self.invalidate_cached(new_uuid.inserted_id)
+        return new_uuid.inserted_id
+
+    async def create_objects(self, documents: List[Dict[str, Any]]) -> Dict[int, str]:
+        """Insert documents in one unordered batch; return the error of each rejected document by index."""
+        if not documents:
+            return {}
+        self.ensure_indexes()
+        for document in documents:
+            stamp_new_document(document)
+        errors = {}
+        try:
+            await self.db[self.collection].insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            errors = {error["index"]: error.get("errmsg", "write error") for error in e.details.get("writeErrors", [])}
+        await self.invalidate_cached(*(document["_id"] for document in documents))
+        return errors
+
+    async def get_object(self, uuid: str) -> dict:
+        if self.cache is not None:
+            cached, object = await self.cache.get_async(uuid)
+            if cached:
+                return object
+
+        result = await self.db[self.collection].find_one({"_id": uuid})
+        object = object_serial(result) if result is not None else None
+        if self.cache is not None:
+            await self.cache.set_async(uuid, object)
+        return object
+
+    async def list_objects(self, limit: int = None, cursor: str = None, filters: Dict[str, Any] = None,
+                           fields: List[str] = None) -> Tuple[List[dict], Optional[str]]:
+        self.ensure_indexes()
+        query = build_filter(cursor=cursor, **(filters or {}))
+        projection = build_projection(fields) or OBJECT_READ_PROJECTION
+        if MONGO_EXPLAIN_QUERIES:
+            await self.explain(query, projection, None if limit is None else limit + 1)
+
+        result = self.db[self.collection].find(query, projection).sort("_id", 1)
+        if limit is None:
+            return list_object_serial(await result.to_list(length=None), fields), None
+
+        documents = await result.limit(limit + 1).to_list(length=limit + 1)
+        cursor = next_cursor(documents, limit)
+        return list_object_serial(documents, fields), cursor
+
+    async def iter_objects(self, resume_after: str = None, filters: Dict[str, Any] = None,
+                           batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[dict]]:
+        """Yield every matching object in _id order, in batches of ``batch_size``.
+
+        ``resume_after`` is the uuid of the last object already received; the
+        cursor fetches one batch at a time so memory does not grow with the collection.
+        """
+        query = build_filter(**(filters or {}))
+        if resume_after:
+            query["_id"] = {"$gt": resume_after}
+        cursor = self.db[self.collection].find(query, OBJECT_READ_PROJECTION).sort("_id", 1).batch_size(batch_size)
+        try:
+            batch = []
+            async for document in cursor:
+                batch.append(object_serial(document))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            # Release the server-side cursor as soon as an export stops early
+            await cursor.close()
+
+    async def get_object_version(self, uuid: str) -> Optional[int]:
+        """Return the version of the object without loading it, or None if it does not exist."""
+        result = await self.db[self.collection].find_one({"_id": uuid}, {"version": 1})
+        if result is None:
+            return None
+        return result.get("version", 0)
+
+    async def update_object(self, uuid: str, object_update: ObjectWrite,
+                            versions: List[int] = None) -> Optional[Dict[str, Any]]:
+        """Apply the update if the object exists and, when ``versions`` is given, is at one of them.
+
+        Returns the new ``version`` of the object, or None when nothing matched.
+        """
+        # Exclude created_by from updates to keep it immutable
+        update_fields = object_update.model_dump()
+        update_fields.pop('created_by', None)
+        update_data = {"$set": update_fields, **VERSION_BUMP}
+        result = await self.db[self.collection].find_one_and_update(
+            {"_id": uuid, **build_version_filter(versions)},
+            update_data,
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if result is not None:
+            await self.invalidate_cached(uuid)
+        return result
+
+    async def delete_object(self, uuid: str) -> Optional[dict]:
+        """Delete the document in one round trip and return its file_path, or None if it did not exist."""
+        result = await self.db[self.collection].find_one_and_delete({"_id": uuid}, projection={"file_path": 1})
+        if result is not None:
+            await self.invalidate_cached(uuid)
+        return result
+
+    async def get_file_paths(self, uuids: List[str]) -> Dict[str, Optional[str]]:
+        documents = await self.db[self.collection].find(
+            {"_id": {"$in": uuids}}, {"file_path": 1}).to_list(length=None)
+        return {document["_id"]: document.get("file_path") for document in documents}
+
+    async def find_referenced_file_paths(self, file_paths: List[str]) -> set:
+        documents = await self.db[self.collection].find(
+            build_referenced_filter(file_paths), {"file_path": 1, "pending_upload.file_path": 1}).to_list(length=None)
+        return referenced_file_paths(documents)
+
+    async def delete_objects(self, uuids: List[str]) -> int:
+        result = await self.db[self.collection].delete_many({"_id": {"$in": uuids}})
+        await self.invalidate_cached(*uuids)
+        return result.deleted_count
+
+    async def get_pending_upload(self, uuid: str) -> Optional[Dict[str, Any]]:
+        result = await self.db[self.collection].find_one({"_id": uuid}, {"pending_upload": 1})
+        if result is None:
+            return None
+        return result.get("pending_upload")
+
+    async def complete_upload(self, uuid: str, file_path: str, size: int, etag: str) -> bool:
+        # Matching on the pending path makes a second completion of the same upload a no-op
+        result = await self.db[self.collection].update_one(
+            {"_id": uuid, "pending_upload.file_path": file_path},
+            {"$set": {"file_path": file_path, "file_size": size, "file_etag": etag},
+             "$unset": {"pending_upload": ""}, **VERSION_BUMP}
+        )
+        if result.modified_count != 1:
+            return False
+        await self.invalidate_cached(uuid)
+        return True
+
+    async def invalidate_cached(self, *uuids: str) -> None:
+        if self.cache is not None:
+            await self.cache.invalidate_async(*uuids)
+
+    async def acquire_blob(self, digest: str, file_path: str, size: int, content_type: str = None) -> dict:
+        """Take a reference on the blob of ``digest``, registering it at ``file_path`` if it is new.
+
+        The returned document carries ``file_path`` unchanged when the caller created the
+        entry and must upload the file, or the path of the blob that already exists.
+        """
+        return await self.db[self.blob_collection].find_one_and_update(
+            {"_id": digest},
+            {"$inc": {"refcount": 1},
+             "$setOnInsert": {"file_path": file_path, "size": size, "content_type": content_type,
+                              "ready": False}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def mark_blob_ready(self, digest: str, file_path: str) -> None:
+        """Record that the blob's file is in the bucket, so later duplicates can skip the upload."""
+        await self.db[self.blob_collection].update_one(
+            {"_id": digest, "file_path": file_path}, {"$set": {"ready": True}})
+
+    async def reference_blob(self, digest: str) -> Optional[dict]:
+        return await self.db[self.blob_collection].find_one_and_update(
+            {"_id": digest}, {"$inc": {"refcount": 1}}, return_document=ReturnDocument.AFTER)
+
+    async def release_blob(self, digest: str, count: int = 1) -> Optional[str]:
+        """Drop ``count`` references; return the blob's path once nothing references it any more."""
+        blob = await self.db[self.blob_collection].find_one_and_update(
+            {"_id": digest}, {"$inc": {"refcount": -count}}, return_document=ReturnDocument.AFTER)
+        if blob is None or blob["refcount"] > 0:
+            return None
+        # Only remove the entry if no create took a new reference in the meantime
+        result = await self.db[self.blob_collection].delete_one({"_id": digest, "refcount": {"$lte": 0}})
+        return blob["file_path"] if result.deleted_count == 1 else None
+
+    def close(self):
+        # The motor client is shared per URI and closed on application shutdown
+        pass
@@ -1,10 +1,51 @@
+import asyncio
+import hashlib
+import json
 import os
+import re
+import time
 import boto3
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 from uuid import uuid4
 from fastapi import UploadFile
 from tempfile import SpooledTemporaryFile
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
-from interfaces.storage_bucket_interface import StorageBucketRepository
+from botocore.exceptions import ClientError
+from config.config import S3_MAX_POOL_CONNECTIONS, S3_BUCKET_CACHE_TTL, S3_BUCKET_CACHE_MAX_SIZE, \
+    S3_TRANSFER_MAX_WORKERS, S3_TRANSFER_PER_TENANT_LIMIT, S3_MULTIPART_PART_SIZE, S3_MULTIPART_CONCURRENCY, \
+    PRESIGNED_UPLOAD_TTL, PRESIGNED_DOWNLOAD_TTL
+from interfaces.storage_bucket_interface import StorageBucketRepository, InvalidRangeError
+from utils.metrics import timed, observe_upload, register_s3_timing
+from utils.transfer_executor import TransferExecutor
+from utils.ttl_cache import TTLCache
+
+NO_SUCH_BUCKET_CODES = ('NoSuchBucket',)
+# head_bucket has no body, so a missing bucket only shows as a bare 404 there
+HEAD_BUCKET_MISSING_CODES = NO_SUCH_BUCKET_CODES + ('404', 'NotFound')
+NO_SUCH_KEY_CODES = ('NoSuchKey', '404', 'NotFound')
+BUCKET_OWNED_CODES = ('BucketAlreadyOwnedByYou', 'BucketAlreadyExists')
+UPLOAD_READ_SIZE = 1024 * 1024
+MAX_MULTIPART_PARTS = 10000
+DELETE_OBJECTS_BATCH_SIZE = 1000
+HASH_READ_SIZE = 1024 * 1024
+
+# Deduplicated files live under blobs/<sha256>/<generation>. The generation changes
+# each time a blob is recreated, so a re-upload never collides with a pending deletion.
+BLOB_PREFIX = "blobs/"
+BLOB_PATH_PATTERN = re.compile(r"/blobs/([0-9a-f]{64})/[^/]+$")
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# (endpoint, bucket) pairs known to exist, shared by every repository of the process
+known_buckets = TTLCache(max_size=S3_BUCKET_CACHE_MAX_SIZE, ttl=S3_BUCKET_CACHE_TTL)
+
+# Blocking boto3 calls run here so that they never hold the event loop
+transfer_executor = TransferExecutor(
+    max_workers=S3_TRANSFER_MAX_WORKERS,
+    per_tenant_limit=S3_TRANSFER_PER_TENANT_LIMIT,
+    thread_name_prefix="s3-transfer"
+)
+
 
 def generate_unique_filename(original_filename, custom_uuid=None):
     file_ext = os.path.splitext(original_filename)[1]
@@ -13,6 +54,57 @@ def generate_unique_filename(original_filename, custom_uuid=None):
     return f"{uuid4()}{file_ext}"
 
 
+class CountingReader:
+    """File-like wrapper that counts the bytes read through it."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.size += len(data)
+        return data
+
+
+async def iter_upload_file(file: UploadFile, chunk_size: int = UPLOAD_READ_SIZE) -> AsyncIterator[bytes]:
+    await file.seek(0)
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def blob_key(digest: str, generation: str) -> str:
+    return f"{BLOB_PREFIX}{digest}/{generation}"
+
+
+def blob_digest(file_path: str) -> Optional[str]:
+    """Return the sha256 of a deduplicated file from its path, or None for a regular upload."""
+    match = BLOB_PATH_PATTERN.search(file_path or "")
+    return match.group(1) if match else None
+
+
+def hash_fileobj(fileobj) -> tuple:
+    digest = hashlib.sha256()
+    size = 0
+    fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(HASH_READ_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), size
+
+
+def credentials_key(credentials: dict) -> str:
+    payload = json.dumps(credentials, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 def get_client(credentials):
     endpoint = credentials.get('endpoint')
     access_key = credentials.get('access_key')
@@ -20,17 +112,31 @@ def get_client(credentials):
     region = credentials.get('region', 'us-east-1')
     use_ssl = credentials.get('use_ssl', False)
 
-    s3_client = boto3.client(
-        's3',
-        endpoint_url=endpoint,
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        region_name=region,
-        config=Config(signature_version='s3v4'),
-        use_ssl=use_ssl
-    )
+    with timed("s3.client_init"):
+        s3_client = boto3.client(
+            's3',
+            endpoint_url=endpoint,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name=region,
+            config=Config(
+                signature_version='s3v4',
+                max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                tcp_keepalive=True
+            ),
+            use_ssl=use_ssl
+        )
+    register_s3_timing(s3_client)
     return s3_client
 
+def get_error_code(error: ClientError) -> str:
+    return str(error.response.get('Error', {}).get('Code', ''))
+
+
+def is_no_such_bucket(error: Exception) -> bool:
+    return isinstance(error, ClientError) and get_error_code(error) in NO_SUCH_BUCKET_CODES
+
+
 def check_credentials(credentials):
     required_fields = ['endpoint', 'access_key', 'secret_key']
     if not credentials or not all(credentials.get(field) for field in required_fields):
@@ -43,51 +149,138 @@ class StorageRepositoryS3(StorageBucketRepository):
         check_credentials(credentials)
         self.credentials = credentials
         self.bucket_name = credentials.get('bucket_name', 'storage')
+        self.tenant_key = credentials_key(credentials)
         self.client = get_client(credentials)
 
+    @property
+    def bucket_cache_key(self):
+        return self.credentials.get('endpoint'), self.bucket_name
+
     def ensure_bucket_exists(self):
+        if self.bucket_cache_key in known_buckets:
+            return self.bucket_name
+
         try:
             self.client.head_bucket(Bucket=self.bucket_name)
-        except:
-            self.client.create_bucket(Bucket=self.bucket_name)
+        except ClientError as e:
+            if get_error_code(e) not in HEAD_BUCKET_MISSING_CODES:
+                raise
+            self.create_bucket()
+
+        known_buckets.set(self.bucket_cache_key, True)
         return self.bucket_name
 
+    def create_bucket(self):
+        try:
+            self.client.create_bucket(Bucket=self.bucket_name)
+        except ClientError as e:
+            if get_error_code(e) not in BUCKET_OWNED_CODES:
+                raise
+
+    def forget_bucket(self):
+        known_buckets.pop(self.bucket_cache_key)
+
+    def call_with_bucket(self, operation, **kwargs):
+        """Run an S3 call against the bucket, recreating it once if it vanished."""
+        bucket_name = self.ensure_bucket_exists()
+        try:
+            return operation(Bucket=bucket_name, **kwargs)
+        except ClientError as e:
+            if not is_no_such_bucket(e):
+                raise
+            self.forget_bucket()
+            bucket_name = self.ensure_bucket_exists()
+            return operation(Bucket=bucket_name, **kwargs)
+
     def download_file_from_bucket(self, file_path: str):
         if not file_path:
             return None
 
-        bucket_name = self.ensure_bucket_exists()
-        file_key = file_path.replace(f"s3://{bucket_name}/", "")
+        file_key = file_path.replace(f"s3://{self.bucket_name}/", "")
 
         try:
             file_content = SpooledTemporaryFile()
-            self.client.download_fileobj(bucket_name, file_key, file_content)
+            self.call_with_bucket(self.client.download_fileobj, Key=file_key, Fileobj=file_content)
             file_content.seek(0)
             return file_content
         except Exception as e:
             raise ValueError(f"Failed to download file from bucket: {str(e)}")
 
+    def get_file_stream(self, file_path: str, byte_range: str = None) -> dict:
+        """Open the object for streaming; the returned dict is the raw get_object response."""
+        file_key = file_path.replace(f"s3://{self.bucket_name}/", "")
+        kwargs = {'Key': file_key}
+        if byte_range:
+            kwargs['Range'] = byte_range
+        try:
+            return self.call_with_bucket(self.client.get_object, **kwargs)
+        except ClientError as e:
+            if get_error_code(e) == 'InvalidRange':
+                raise InvalidRangeError(f"Invalid range {byte_range} for file {file_key}")
+            if get_error_code(e) in NO_SUCH_KEY_CODES:
+                raise FileNotFoundError(f"File {file_key} not found in bucket")
+            raise ValueError(f"Failed to open file from bucket: {str(e)}")
+
+    async def get_file_stream_async(self, file_path: str, byte_range: str = None) -> dict:
+        return await transfer_executor.run(self.tenant_key, self.get_file_stream, file_path, byte_range)
+
+    async def iter_file_stream(self, body, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                chunk = await transfer_executor.run(self.tenant_key, body.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
     def delete_file_from_bucket(self, file_path: str):
         if not file_path:
             return
 
-        bucket_name = self.ensure_bucket_exists()
-        file_key = file_path.replace(f"s3://{bucket_name}/", "")
+        file_key = file_path.replace(f"s3://{self.bucket_name}/", "")
 
         try:
-            self.client.delete_object(Bucket=bucket_name, Key=file_key)
+            self.call_with_bucket(self.client.delete_object, Key=file_key)
         except Exception as e:
             raise ValueError(f"Failed to delete file from bucket: {str(e)}")
 
-    def list_files_in_bucket(self):
-        bucket_name = self.ensure_bucket_exists()
+    def delete_files_from_bucket(self, file_paths: List[str]) -> Dict[str, str]:
+        """Delete files with DeleteObjects, 1000 keys per call; return the error of each file left in place."""
+        keys = {file_path.replace(f"s3://{self.bucket_name}/", ""): file_path for file_path in file_paths if file_path}
+        key_list = list(keys)
+        errors = {}
 
-        try:
-            response = self.client.list_objects_v2(Bucket=bucket_name)
-            if 'Contents' not in response:
-                return {}
+        for start in range(0, len(key_list), DELETE_OBJECTS_BATCH_SIZE):
+            batch = key_list[start:start + DELETE_OBJECTS_BATCH_SIZE]
+            try:
+                response = self.call_with_bucket(
+                    self.client.delete_objects,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True})
+            except Exception as e:
+                errors.update({keys[key]: f"Failed to delete file from bucket: {str(e)}" for key in batch})
+                continue
+            for error in response.get('Errors', []):
+                errors[keys.get(error['Key'], error['Key'])] = error.get('Message') or error.get('Code', 'Unknown error')
+
+        return errors
 
-            files = {item['Key']: item['LastModified'] for item in response['Contents']}
+    def iter_bucket_pages(self, start_after: str = None, page_size: int = 1000) -> Iterator[List[dict]]:
+        """Yield the bucket listing one page of ``{Key, LastModified, Size}`` entries at a time, in key order."""
+        paginator = self.client.get_paginator('list_objects_v2')
+        kwargs = {'Bucket': self.bucket_name, 'PaginationConfig': {'PageSize': page_size}}
+        if start_after:
+            kwargs['StartAfter'] = start_after
+        for page in paginator.paginate(**kwargs):
+            contents = page.get('Contents', [])
+            if contents:
+                yield contents
+
+    def list_files_in_bucket(self):
+        try:
+            files = {}
+            for page in self.iter_bucket_pages():
+                files.update({item['Key']: item['LastModified'] for item in page})
             return files
         except Exception as e:
             raise ValueError(f"Failed to list files in bucket: {str(e)}")
@@ -96,29 +289,227 @@ class StorageRepositoryS3(StorageBucketRepository):
         if not file or not file.filename:
             return None, None
 
-        bucket_name = self.ensure_bucket_exists()
         unique_filename = generate_unique_filename(file.filename, custom_uuid)
-        file_content = file.file.read()
-        file.file.seek(0)
-
-        self.client.upload_fileobj(
-            file.file, 
-            bucket_name, 
-            unique_filename,
-            ExtraArgs={'ContentType': file.content_type}
+        transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_PART_SIZE,
+            multipart_chunksize=S3_MULTIPART_PART_SIZE,
+            max_concurrency=S3_MULTIPART_CONCURRENCY
+        )
+        reader = None
+
+        def upload(Bucket):
+            nonlocal reader
+            file.file.seek(0)
+            reader = CountingReader(file.file)
+            self.client.upload_fileobj(
+                reader,
+                Bucket,
+                unique_filename,
+                ExtraArgs={'ContentType': file.content_type},
+                Config=transfer_config
+            )
+
+        self.call_with_bucket(upload)
+
+        file_path = f"s3://{self.bucket_name}/{unique_filename}"
+        return file_path, reader.size
+
+    async def upload_file_to_bucket_async(self, file: UploadFile, custom_uuid=None):
+        if not file or not file.filename:
+            return None, None
+
+        return await self.upload_stream_to_bucket(
+            iter_upload_file(file),
+            filename=file.filename,
+            content_type=file.content_type,
+            custom_uuid=custom_uuid
         )
 
-        file_path = f"s3://{bucket_name}/{unique_filename}"
+    async def upload_stream_to_bucket(self, chunks: AsyncIterator[bytes], filename: str,
+                                      content_type: str = None, custom_uuid=None, key: str = None):
+        """Upload a byte stream without ever holding more than a few parts in memory.
+
+        Bodies smaller than one part go out as a single put_object. Larger ones
+        become a multipart upload with at most S3_MULTIPART_CONCURRENCY parts in
+        flight; the upload is aborted if the stream or any part fails. ``key`` overrides
+        the generated object name.
+        """
+        unique_filename = key or generate_unique_filename(filename, custom_uuid)
+        extra_args = {'ContentType': content_type} if content_type else {}
+        part_size = S3_MULTIPART_PART_SIZE
+
+        buffer = bytearray()
+        size = 0
+        upload_id = None
+        started_at = time.perf_counter()
+        parts = []
+        pending = []
 
         try:
-            file.file.seek(0)
-        except ValueError:
-            new_file = SpooledTemporaryFile()
-            new_file.write(file_content)
-            new_file.seek(0)
-            file.file = new_file
+            async for chunk in chunks:
+                buffer += chunk
+                size += len(chunk)
+                while len(buffer) >= part_size:
+                    if upload_id is None:
+                        upload_id = await transfer_executor.run(
+                            self.tenant_key, self.create_multipart_upload, unique_filename, extra_args)
+                    part = bytes(buffer[:part_size])
+                    del buffer[:part_size]
+                    pending.append(asyncio.ensure_future(
+                        self.upload_part_async(unique_filename, upload_id, len(parts) + len(pending) + 1, part)))
+                    if len(pending) >= S3_MULTIPART_CONCURRENCY:
+                        parts.append(await pending.pop(0))
+
+            if upload_id is None:
+                await transfer_executor.run(
+                    self.tenant_key, self.call_with_bucket, self.client.put_object,
+                    Key=unique_filename, Body=bytes(buffer), **extra_args)
+            else:
+                if buffer:
+                    pending.append(asyncio.ensure_future(
+                        self.upload_part_async(unique_filename, upload_id, len(parts) + len(pending) + 1, bytes(buffer))))
+                    buffer = bytearray()
+                while pending:
+                    parts.append(await pending.pop(0))
+                await transfer_executor.run(
+                    self.tenant_key, self.client.complete_multipart_upload,
+                    Bucket=self.bucket_name, Key=unique_filename, UploadId=upload_id,
+                    MultipartUpload={'Parts': parts})
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if upload_id is not None:
+                await self.abort_multipart_upload_async(unique_filename, upload_id)
+            raise
+
+        observe_upload(size, time.perf_counter() - started_at)
+        file_path = f"s3://{self.bucket_name}/{unique_filename}"
+        return file_path, size
+
+    async def hash_upload_file_async(self, file: UploadFile) -> tuple:
+        """Return the sha256 and size of an upload Starlette has already spooled locally."""
+        return await transfer_executor.run(self.tenant_key, hash_fileobj, file.file)
+
+    async def upload_blob_async(self, file: UploadFile, key: str):
+        return await self.upload_stream_to_bucket(
+            iter_upload_file(file), filename=file.filename, content_type=file.content_type, key=key)
+
+    def file_exists(self, file_path: str) -> bool:
+        file_key = file_path.replace(f"s3://{self.bucket_name}/", "")
+        try:
+            self.client.head_object(Bucket=self.bucket_name, Key=file_key)
+        except ClientError as e:
+            if get_error_code(e) in NO_SUCH_KEY_CODES:
+                return False
+            raise
+        return True
+
+    async def file_exists_async(self, file_path: str) -> bool:
+        return await transfer_executor.run(self.tenant_key, self.file_exists, file_path)
+
+    def create_multipart_upload(self, key: str, extra_args: dict) -> str:
+        response = self.call_with_bucket(self.client.create_multipart_upload, Key=key, **extra_args)
+        return response['UploadId']
+
+    async def upload_part_async(self, key: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        response = await transfer_executor.run(
+            self.tenant_key, self.client.upload_part,
+            Bucket=self.bucket_name, Key=key, UploadId=upload_id, PartNumber=part_number, Body=body)
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+
+    async def abort_multipart_upload_async(self, key: str, upload_id: str) -> None:
+        try:
+            await transfer_executor.run(
+                self.tenant_key, self.client.abort_multipart_upload,
+                Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+        except Exception:
+            # Keep the error that made us abort rather than the abort failure
+            pass
+
+    def generate_presigned_upload(self, filename: str, content_type: str = None, size: int = None,
+                                  custom_uuid=None) -> dict:
+        """Plan a direct client upload: one presigned PUT, or presigned parts for a multipart upload.
+
+        Only the multipart variant touches S3 (to open the upload); the URLs are signed locally.
+        """
+        unique_filename = generate_unique_filename(filename, custom_uuid)
+        file_path = f"s3://{self.bucket_name}/{unique_filename}"
+        bucket_name = self.ensure_bucket_exists()
+
+        if size is None or size <= S3_MULTIPART_PART_SIZE:
+            params = {'Bucket': bucket_name, 'Key': unique_filename}
+            if content_type:
+                params['ContentType'] = content_type
+            return {
+                'file_path': file_path,
+                'method': 'PUT',
+                'url': self.client.generate_presigned_url('put_object', Params=params, ExpiresIn=PRESIGNED_UPLOAD_TTL),
+                'headers': {'Content-Type': content_type} if content_type else {},
+                'expires_in': PRESIGNED_UPLOAD_TTL
+            }
+
+        part_size = max(S3_MULTIPART_PART_SIZE, -(-size // MAX_MULTIPART_PARTS))
+        part_count = -(-size // part_size)
+        upload_id = self.create_multipart_upload(unique_filename, {'ContentType': content_type} if content_type else {})
+        parts = [
+            {
+                'part_number': part_number,
+                'url': self.client.generate_presigned_url('upload_part', Params={
+                    'Bucket': bucket_name, 'Key': unique_filename, 'UploadId': upload_id, 'PartNumber': part_number
+                }, ExpiresIn=PRESIGNED_UPLOAD_TTL)
+            }
+            for part_number in range(1, part_count + 1)
+        ]
+        return {
+            'file_path': file_path,
+            'method': 'multipart',
+            'upload_id': upload_id,
+            'part_size': part_size,
+            'parts': parts,
+            'expires_in': PRESIGNED_UPLOAD_TTL
+        }
+
+    def complete_presigned_upload(self, file_path: str, upload_id: str = None, parts: list = None) -> dict:
+        """Finish a direct upload and return the size and ETag S3 reports for the object."""
+        file_key = file_path.replace(f"s3://{self.bucket_name}/", "")
+        try:
+            if upload_id:
+                self.client.complete_multipart_upload(
+                    Bucket=self.bucket_name, Key=file_key, UploadId=upload_id,
+                    MultipartUpload={'Parts': [{'PartNumber': part['part_number'], 'ETag': part['etag']}
+                                               for part in sorted(parts or [], key=lambda part: part['part_number'])]})
+            head = self.client.head_object(Bucket=self.bucket_name, Key=file_key)
+        except ClientError as e:
+            if get_error_code(e) in NO_SUCH_KEY_CODES + ('NoSuchUpload',):
+                raise FileNotFoundError(f"File {file_key} has not been uploaded")
+            raise ValueError(f"Failed to complete upload to bucket: {str(e)}")
+        return {'size': head['ContentLength'], 'etag': head.get('ETag')}
+
+    def generate_presigned_download(self, file_path: str, expires_in: int = PRESIGNED_DOWNLOAD_TTL) -> str:
+        file_key = file_path.replace(f"s3://{self.bucket_name}/", "")
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket_name, 'Key': file_key}, ExpiresIn=expires_in)
+
+    async def generate_presigned_upload_async(self, filename: str, content_type: str = None, size: int = None,
+                                              custom_uuid=None) -> dict:
+        return await transfer_executor.run(
+            self.tenant_key, self.generate_presigned_upload, filename, content_type, size, custom_uuid)
+
+    async def complete_presigned_upload_async(self, file_path: str, upload_id: str = None, parts: list = None) -> dict:
+        return await transfer_executor.run(self.tenant_key, self.complete_presigned_upload, file_path, upload_id, parts)
+
+    async def download_file_from_bucket_async(self, file_path: str):
+        return await transfer_executor.run(self.tenant_key, self.download_file_from_bucket, file_path)
+
+    async def delete_file_from_bucket_async(self, file_path: str):
+        return await transfer_executor.run(self.tenant_key, self.delete_file_from_bucket, file_path)
+
+    async def delete_files_from_bucket_async(self, file_paths: List[str]) -> Dict[str, str]:
+        return await transfer_executor.run(self.tenant_key, self.delete_files_from_bucket, file_paths)
 
-        return file_path, file_content
+    async def list_files_in_bucket_async(self):
+        return await transfer_executor.run(self.tenant_key, self.list_files_in_bucket)
 
     def close(self):
         # No need to explicitly close the boto3 client
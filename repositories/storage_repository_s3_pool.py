@@ -0,0 +1,69 @@
+import threading
+
+from common_api.services.v0 import Logger
+from config.config import S3_POOL_MAX_SIZE, S3_POOL_IDLE_TTL
+from repositories.storage_repository_s3 import StorageRepositoryS3, credentials_key
+from utils.ttl_cache import TTLCache
+
+logger = Logger()
+
+
+class StorageRepositoryS3Pool:
+    """Process-wide registry of S3 repositories, one per distinct credential set.
+
+    Repositories are keyed by a hash of their credentials so that each tenant
+    keeps a warm boto3 client (and its keep-alive connections) across requests.
+    Entries are evicted LRU-first and after ``idle_ttl`` seconds without use.
+    When a licence presents different credentials than last time, the entry
+    built from the old credentials is dropped.
+    """
+
+    def __init__(self, max_size: int = S3_POOL_MAX_SIZE, idle_ttl: float = S3_POOL_IDLE_TTL):
+        self._repositories = TTLCache(max_size=max_size, ttl=idle_ttl, sliding=True,
+                                      on_evict=self._on_evict)
+        self._licence_keys: dict[str, str] = {}
+        self._lock = threading.RLock()
+
+    def get(self, credentials: dict, licence: str = None) -> StorageRepositoryS3:
+        key = credentials_key(credentials)
+        if licence is not None:
+            self._forget_rotated(licence, key)
+
+        repository = self._repositories.get(key)
+        if repository is not None:
+            return repository
+
+        with self._lock:
+            repository = self._repositories.get(key)
+            if repository is None:
+                logger.info("Building S3 repository for new credential set")
+                repository = StorageRepositoryS3(credentials)
+                self._repositories.set(key, repository)
+        return repository
+
+    def invalidate(self, credentials: dict) -> None:
+        self._repositories.pop(credentials_key(credentials))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._repositories.clear()
+            self._licence_keys.clear()
+
+    def __len__(self) -> int:
+        return len(self._repositories)
+
+    def _forget_rotated(self, licence: str, key: str) -> None:
+        with self._lock:
+            previous_key = self._licence_keys.get(licence)
+            self._licence_keys[licence] = key
+        if previous_key is not None and previous_key != key:
+            logger.info(f"S3 credentials rotated for licence {licence}, dropping previous client")
+            self._repositories.pop(previous_key)
+
+    def _on_evict(self, key, repository) -> None:
+        with self._lock:
+            for licence in [lic for lic, k in self._licence_keys.items() if k == key]:
+                del self._licence_keys[licence]
+
+
+s3_repository_pool = StorageRepositoryS3Pool()
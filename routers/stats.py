@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Response, status
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from repositories.object_cache import object_cache
+from repositories.storage_repository_s3 import transfer_executor
+
+router = APIRouter(
+    tags=["stats"],
+    prefix="/storage"
+)
+
+
+@router.get("/stats", status_code=status.HTTP_200_OK, include_in_schema=False)
+async def api_read_stats() -> dict:
+    return {
+        "s3_transfers": transfer_executor.stats(),
+        "object_cache": object_cache.stats()
+    }
+
+
+@router.get("/metrics", status_code=status.HTTP_200_OK, include_in_schema=False)
+async def api_read_metrics() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
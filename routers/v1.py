@@ -1,13 +1,22 @@
-from fastapi import APIRouter, HTTPException, status, Request, File, UploadFile, Form, Depends
-from config.config import API_TAG_NAME
+import json
+from fastapi import APIRouter, HTTPException, status, Request, Response, File, UploadFile, Form, Depends, Query
+from fastapi.responses import StreamingResponse, RedirectResponse, ORJSONResponse
+from pydantic import TypeAdapter, ValidationError
+from config.config import API_TAG_NAME, LIST_DEFAULT_LIMIT, LIST_MAX_LIMIT, BATCH_MAX_ITEMS
 from common_api.decorators.v0.check_permission import check_permissions
-from models.object_model import ObjectWrite, ObjectRead
+from models.object_model import ObjectWrite, ObjectRead, UploadCompletion, BatchItem, BatchDelete
 from common_api.services.v0 import Logger
-from services.storage_service import create_object, get_objects, get_object, update_object, delete_object
+from services.storage_service import create_object, create_objects_batch, create_object_direct, \
+    complete_object_upload, get_objects, get_object, get_object_version, get_object_content, get_object_download_url, \
+    update_object, delete_object, delete_objects_batch, export_objects
+from utils.etag import format_etag, etag_matches
+from utils.ndjson import accepts_gzip
 from typing import Optional
 
 logger = Logger()
 
+batch_items_adapter = TypeAdapter(list[BatchItem])
+
 VERSION = "v1"
 api_group_name = f"/{API_TAG_NAME}/{VERSION}/"
 
@@ -23,7 +32,13 @@ async def api_create_object(
     request: Request, 
     name: str = Form(...),
     description: Optional[str] = Form(None),
-    file: UploadFile = File(None)
+    file: UploadFile = File(None),
+    direct_upload: bool = Form(False, description="Return a presigned upload instead of receiving the file"),
+    filename: Optional[str] = Form(None, description="Name of the file sent directly to the bucket"),
+    content_type: Optional[str] = Form(None),
+    size: Optional[int] = Form(None, ge=0, description="Size in bytes; large files get a multipart plan"),
+    sha256: Optional[str] = Form(None, pattern="^[0-9a-f]{64}$",
+                                 description="Content hash; with deduplication on, a known file need not be sent")
 ) -> dict:
     logger.api("POST /storage/v1/")
     object = ObjectWrite(
@@ -32,36 +47,163 @@ async def api_create_object(
         created_by=request.state.token_info.get('user_uuid')
     )
     logger.api(object)
-    new_uuid = create_object(request, object, file)
+    if direct_upload:
+        if not filename:
+            raise HTTPException(status_code=400, detail="filename is required for a direct upload")
+        new_uuid, upload = await create_object_direct(request, object, filename, content_type, size)
+        return {"uuid": new_uuid, "upload": upload}
+
+    new_uuid = await create_object(request, object, file, sha256)
     return {"uuid": new_uuid}
 
 
+@router.post("/batch", status_code=status.HTTP_200_OK)
+@check_permissions(['create'])
+async def api_create_objects_batch(
+    request: Request,
+    items: str = Form(..., description="JSON array of {name, description, file_index}"),
+    files: list[UploadFile] = File(None)
+) -> dict:
+    logger.api("POST /storage/v1/batch")
+    try:
+        batch = batch_items_adapter.validate_python(json.loads(items))
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid items: {e}")
+    if len(batch) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch holds at most {BATCH_MAX_ITEMS} items")
+
+    files = files or []
+    created_by = request.state.token_info.get('user_uuid')
+    entries = []
+    for item in batch:
+        if item.file_index is not None and item.file_index >= len(files):
+            raise HTTPException(status_code=400, detail=f"file_index {item.file_index} has no matching file")
+        object = ObjectWrite(name=item.name, description=item.description, created_by=created_by)
+        entries.append((object, files[item.file_index] if item.file_index is not None else None))
+
+    results = await create_objects_batch(request, entries)
+    return {"results": results}
+
+
+@router.post("/batch/delete", status_code=status.HTTP_200_OK)
+@check_permissions(['delete'])
+async def api_delete_objects_batch(request: Request, batch: BatchDelete) -> dict:
+    logger.api("POST /storage/v1/batch/delete")
+    if batch.uuids is not None and len(batch.uuids) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch holds at most {BATCH_MAX_ITEMS} items")
+    filters = batch.filter.model_dump() if batch.filter else ({} if batch.all else None)
+    results = await delete_objects_batch(request, uuids=batch.uuids, filters=filters)
+    return {"results": results}
+
+
 @router.get("/", status_code=status.HTTP_200_OK, response_model=list[ObjectRead])
 @check_permissions(['read', 'read_own'])
-async def api_read_objects(request: Request):
+async def api_read_objects(
+    request: Request,
+    limit: int = Query(LIST_DEFAULT_LIMIT, ge=1, le=LIST_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="Opaque cursor returned in X-Next-Cursor"),
+    created_by: Optional[str] = Query(None),
+    name_prefix: Optional[str] = Query(None),
+    has_file: Optional[bool] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated ObjectRead fields to return")
+):
     logger.api("GET /storage/v1/")
-    return get_objects(request)
+    filters = {"created_by": created_by, "name_prefix": name_prefix, "has_file": has_file}
+    projection = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    objects, next_cursor = await get_objects(request, limit=limit, cursor=cursor, filters=filters, fields=projection)
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    # Repository output already has the ObjectRead shape: skip re-validation and encode with orjson
+    return ORJSONResponse(objects, headers=headers)
+
+
+@router.get("/export", status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+@check_permissions(['read', 'read_own'])
+async def api_export_objects(
+    request: Request,
+    resume_after: Optional[str] = Query(None, description="uuid of the last object received, to resume an export"),
+    created_by: Optional[str] = Query(None),
+    name_prefix: Optional[str] = Query(None),
+    has_file: Optional[bool] = Query(None)
+):
+    logger.api("GET /storage/v1/export")
+    filters = {"created_by": created_by, "name_prefix": name_prefix, "has_file": has_file}
+    gzip = accepts_gzip(request.headers.get("accept-encoding"))
+    chunks = await export_objects(request, resume_after=resume_after, filters=filters, gzip=gzip)
+
+    headers = {"Cache-Control": "no-store", "Vary": "Accept-Encoding"}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type="application/x-ndjson", headers=headers)
 
 
 @router.get("/{uuid}", status_code=status.HTTP_200_OK, response_model=ObjectRead)
 @check_permissions(['list', 'list_own'])
 async def api_read_object(request: Request, uuid: str):
     logger.api("GET /storage/v1/{uuid}")
-    object = get_object(request, uuid)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Revalidation only needs the version, not the whole document
+        version = await get_object_version(request, uuid)
+        if etag_matches(if_none_match, version):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": format_etag(version)})
+    object = await get_object(request, uuid)
     if object is None:
         raise HTTPException(status_code=404, detail="Storage not found")
-    return object
+    return ORJSONResponse(object, headers={"ETag": format_etag(object.get("version"))})
+
+
+@router.get("/{uuid}/content", status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+@check_permissions(['list', 'list_own'])
+async def api_read_object_content(request: Request, uuid: str):
+    logger.api("GET /storage/v1/{uuid}/content")
+    chunks, file = await get_object_content(request, uuid, request.headers.get("range"))
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(file["ContentLength"])
+    }
+    if file.get("ETag"):
+        headers["ETag"] = file["ETag"]
+    if file.get("ContentRange"):
+        headers["Content-Range"] = file["ContentRange"]
+
+    return StreamingResponse(
+        chunks,
+        status_code=status.HTTP_206_PARTIAL_CONTENT if file.get("ContentRange") else status.HTTP_200_OK,
+        media_type=file.get("ContentType") or "application/octet-stream",
+        headers=headers
+    )
+
+
+@router.post("/{uuid}/complete", status_code=status.HTTP_200_OK)
+@check_permissions(['create'])
+async def api_complete_object_upload(request: Request, uuid: str, completion: UploadCompletion) -> dict:
+    logger.api("POST /storage/v1/{uuid}/complete")
+    parts = [part.model_dump() for part in completion.parts] if completion.parts else None
+    return await complete_object_upload(request, uuid, parts)
+
+
+@router.get("/{uuid}/download", status_code=status.HTTP_307_TEMPORARY_REDIRECT, response_class=RedirectResponse)
+@check_permissions(['list', 'list_own'])
+async def api_download_object(request: Request, uuid: str):
+    logger.api("GET /storage/v1/{uuid}/download")
+    url = await get_object_download_url(request, uuid)
+    return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
 
 
 @router.put("/{uuid}", status_code=status.HTTP_204_NO_CONTENT)
 @check_permissions(['update', 'update_own'])
-async def api_update_object(request: Request, uuid: str, object_update: ObjectWrite):
+async def api_update_object(request: Request, response: Response, uuid: str, object_update: ObjectWrite):
     logger.api("PUT /storage/v1/{uuid}")
-    update_object(request, uuid, object_update)
+    version = await update_object(request, uuid, object_update, request.headers.get("if-match"))
+    response.headers["ETag"] = format_etag(version)
 
 
 @router.delete("/{uuid}", status_code=status.HTTP_204_NO_CONTENT)
 @check_permissions(['delete', 'delete_own'])
 async def api_delete_object(request: Request, uuid: str):
     logger.api("DELETE /storage/v1/{uuid}")
-    delete_object(request, uuid)
+    await delete_object(request, uuid)
@@ -1,17 +1,30 @@
+from repositories.object_query import OBJECT_FIELDS
+
+
 def object_serial(object) -> dict:
-    result = {
+    """Build the ObjectRead shape in one pass; fields missing from the document are None."""
+    get = object.get
+    return {
         "uuid": str(object["_id"]),
         "name": object["name"],
-        "created_by": object.get("created_by"),
-        "description": object.get("description")
+        "description": get("description"),
+        "created_by": get("created_by"),
+        "file_path": get("file_path"),
+        "version": get("version"),
+        "updated_at": get("updated_at"),
     }
 
-    # Add file_path if it exists
-    if "file_path" in object:
-        result["file_path"] = object["file_path"]
 
-    return result
+def projected_object_serial(object, fields) -> dict:
+    """Build only uuid and the requested fields, so a projection is not padded with None values."""
+    serial = {"uuid": str(object["_id"])}
+    for field in fields:
+        if field != "uuid":
+            serial[field] = object.get(OBJECT_FIELDS[field])
+    return serial
 
 
-def list_object_serial(objects) -> list:
+def list_object_serial(objects, fields=None) -> list:
+    if fields:
+        return [projected_object_serial(object, fields) for object in objects]
     return [object_serial(object) for object in objects]
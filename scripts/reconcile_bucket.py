@@ -0,0 +1,63 @@
+"""
+Find, and optionally delete, bucket files that no object references.
+
+The bucket is listed page by page and each page is matched against the tenant
+database, so memory stays flat whatever the bucket size. With --checkpoint the
+progress is saved after every page and a rerun resumes where it stopped.
+
+    python -m scripts.reconcile_bucket --mongo-uri mongodb://host/tenant \
+        --credentials s3.json --checkpoint tenant.checkpoint.json [--delete]
+
+The credentials file holds the tenant's S3 credential, the same object the
+gateway returns under "s3". Orphans are printed one per line on stdout.
+"""
+import argparse
+import json
+import sys
+
+from repositories.storage_repository_mongo import StorageRepositoryMongo
+from repositories.storage_repository_s3 import StorageRepositoryS3
+from services.reconciliation_service import reconcile_bucket, load_checkpoint, save_checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", required=True, help="tenant database URI")
+    parser.add_argument("--credentials", required=True, help="JSON file with the tenant's S3 credential")
+    parser.add_argument("--checkpoint", help="file recording progress, read on start and written after each page")
+    parser.add_argument("--delete", action="store_true", help="delete the orphans instead of only listing them")
+    parser.add_argument("--min-age", type=int, default=3600,
+                        help="ignore files modified less than this many seconds ago (default: 3600)")
+    args = parser.parse_args()
+
+    with open(args.credentials) as credentials:
+        bucket_repo = StorageRepositoryS3(json.load(credentials))
+    storage_repo = StorageRepositoryMongo(args.mongo_uri)
+
+    def print_orphans(orphans):
+        for file_path in orphans:
+            print(file_path)
+        sys.stdout.flush()
+
+    def save_progress(stats):
+        if args.checkpoint:
+            save_checkpoint(args.checkpoint, stats)
+
+    try:
+        stats = reconcile_bucket(
+            bucket_repo,
+            storage_repo,
+            state=load_checkpoint(args.checkpoint),
+            delete=args.delete,
+            min_age=args.min_age,
+            on_orphans=print_orphans,
+            on_page=save_progress
+        )
+    finally:
+        storage_repo.close()
+
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
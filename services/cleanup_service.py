@@ -0,0 +1,160 @@
+import asyncio
+import json
+import random
+import time
+
+from common_api.services.v0 import Logger
+from common_api.services.v0.inmemory_service import get_redis_api_db
+from config.config import CLEANUP_QUEUE_KEY, CLEANUP_DEAD_LETTER_KEY, CLEANUP_BATCH_SIZE, CLEANUP_POLL_INTERVAL, \
+    CLEANUP_VISIBILITY_TIMEOUT, CLEANUP_MAX_ATTEMPTS, CLEANUP_RETRY_BACKOFF, CLEANUP_RETRY_MAX_BACKOFF, \
+    CLEANUP_CREDENTIAL_WAIT
+from repositories.storage_repository_s3_pool import s3_repository_pool
+from services.credential_service import read_cache_credential
+
+r = get_redis_api_db()
+logger = Logger()
+
+_worker: asyncio.Task | None = None
+
+# Jobs live in a sorted set scored by the time they are due. Claiming a job pushes
+# its score back by the visibility timeout instead of removing it, so the jobs of a
+# worker that dies mid-batch are picked up again once the timeout has passed.
+CLAIM_SCRIPT = """
+local jobs = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, job in ipairs(jobs) do
+    redis.call('ZADD', KEYS[1], ARGV[3], job)
+end
+return jobs
+"""
+
+
+def encode_job(job: dict) -> str:
+    return json.dumps(job, sort_keys=True, separators=(",", ":"))
+
+
+def decode_job(payload) -> dict | None:
+    if isinstance(payload, bytes):
+        payload = payload.decode("utf-8")
+    try:
+        job = json.loads(payload)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(job, dict) or not job.get("licence") or not job.get("file_path"):
+        return None
+    return job
+
+
+def enqueue_file_cleanup(licence: str, file_path: str, uuid: str = None) -> None:
+    job = {"licence": licence, "file_path": file_path, "uuid": uuid, "attempts": 0}
+    r.zadd(CLEANUP_QUEUE_KEY, {encode_job(job): time.time()})
+
+
+def claim_jobs(limit: int = CLEANUP_BATCH_SIZE) -> list[tuple[str, dict]]:
+    now = time.time()
+    claim = r.register_script(CLAIM_SCRIPT)
+    claimed = claim(keys=[CLEANUP_QUEUE_KEY], args=[now, limit, now + CLEANUP_VISIBILITY_TIMEOUT])
+
+    jobs = []
+    for payload in claimed:
+        job = decode_job(payload)
+        if job is None:
+            logger.warning(f"Dropping unreadable cleanup job {payload!r}")
+            r.zrem(CLEANUP_QUEUE_KEY, payload)
+            continue
+        jobs.append((payload, job))
+    return jobs
+
+
+def retry_delay(attempts: int) -> float:
+    delay = min(CLEANUP_RETRY_BACKOFF * 2 ** (attempts - 1), CLEANUP_RETRY_MAX_BACKOFF)
+    return random.uniform(delay / 2, delay)
+
+
+def complete_jobs(payloads: list[str]) -> None:
+    if payloads:
+        r.zrem(CLEANUP_QUEUE_KEY, *payloads)
+
+
+def reschedule_job(payload: str, job: dict, error: str) -> None:
+    attempts = job.get("attempts", 0) + 1
+    retried = dict(job, attempts=attempts, error=error)
+
+    pipeline = r.pipeline()
+    pipeline.zrem(CLEANUP_QUEUE_KEY, payload)
+    if attempts >= CLEANUP_MAX_ATTEMPTS:
+        logger.warning(f"Giving up on deleting {job['file_path']} for licence {job['licence']}: {error}")
+        pipeline.zadd(CLEANUP_DEAD_LETTER_KEY, {encode_job(retried): time.time()})
+    else:
+        pipeline.zadd(CLEANUP_QUEUE_KEY, {encode_job(retried): time.time() + retry_delay(attempts)})
+    pipeline.execute()
+
+
+def postpone_jobs(payloads: list[str], delay: float = CLEANUP_CREDENTIAL_WAIT) -> None:
+    """Make jobs due again later without counting an attempt."""
+    if payloads:
+        due = time.time() + delay
+        r.zadd(CLEANUP_QUEUE_KEY, {payload: due for payload in payloads})
+
+
+def settle_jobs(jobs: list[tuple[str, dict]], errors: dict[str, str]) -> None:
+    complete_jobs([payload for payload, job in jobs if job["file_path"] not in errors])
+    for payload, job in jobs:
+        if job["file_path"] in errors:
+            reschedule_job(payload, job, errors[job["file_path"]])
+
+
+async def process_jobs(jobs: list[tuple[str, dict]]) -> None:
+    """Delete the files of claimed jobs, one bulk call per licence; Redis is only called from worker threads."""
+    by_licence: dict[str, list[tuple[str, dict]]] = {}
+    for payload, job in jobs:
+        by_licence.setdefault(job["licence"], []).append((payload, job))
+
+    for licence, licence_jobs in by_licence.items():
+        file_paths = [job["file_path"] for _, job in licence_jobs]
+        # No token is available here, so only credentials still cached can be used;
+        # otherwise the jobs wait, for as long as it takes, until a request of the tenant caches them again
+        credential = await asyncio.to_thread(read_cache_credential, licence)
+        if not credential or "s3" not in credential:
+            await asyncio.to_thread(postpone_jobs, [payload for payload, _ in licence_jobs])
+            continue
+        try:
+            bucket_repo = s3_repository_pool.get(credential["s3"], licence=licence)
+            errors = await bucket_repo.delete_files_from_bucket_async(file_paths)
+        except Exception as e:
+            errors = {file_path: str(e) for file_path in file_paths}
+
+        await asyncio.to_thread(settle_jobs, licence_jobs, errors)
+
+
+async def run_cleanup_worker() -> None:
+    while True:
+        try:
+            jobs = await asyncio.to_thread(claim_jobs)
+            if jobs:
+                await process_jobs(jobs)
+            if len(jobs) == CLEANUP_BATCH_SIZE:
+                # More jobs are probably due; keep draining without waiting
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Cleanup worker iteration failed: {e}")
+        await asyncio.sleep(CLEANUP_POLL_INTERVAL)
+
+
+def start_cleanup_worker() -> None:
+    global _worker
+    if _worker is None or _worker.done():
+        _worker = asyncio.ensure_future(run_cleanup_worker())
+
+
+async def stop_cleanup_worker() -> None:
+    global _worker
+    if _worker is None:
+        return
+    _worker.cancel()
+    try:
+        await _worker
+    except asyncio.CancelledError:
+        pass
+    _worker = None
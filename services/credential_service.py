@@ -0,0 +1,305 @@
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+import httpx
+from fastapi import HTTPException
+
+from common_api.services.v0 import Logger
+from common_api.services.v0.inmemory_service import get_redis_api_db
+from config.config import URL_API_GATEWAY, CREDENTIAL_CACHE_TTL, CREDENTIAL_LOCAL_TTL, CREDENTIAL_LOCAL_MAX_SIZE, \
+    CREDENTIAL_INVALIDATION_CHANNEL, GATEWAY_MAX_CONNECTIONS, GATEWAY_MAX_KEEPALIVE_CONNECTIONS, GATEWAY_TIMEOUT, \
+    GATEWAY_CONNECT_TIMEOUT, GATEWAY_RETRIES, GATEWAY_RETRY_BACKOFF, CREDENTIAL_REFRESH_AHEAD, CREDENTIAL_LOCK_TTL, \
+    CREDENTIAL_LOCK_WAIT, GATEWAY_ATTEMPT_TIMEOUT
+from utils.metrics import CREDENTIAL_LOOKUPS, timed
+from utils.ttl_cache import TTLCache
+
+r = get_redis_api_db()
+logger = Logger()
+
+# Tier one: credentials already resolved by this process, keyed by licence.
+# Values are (credential, expires_at) where expires_at is the Redis expiry (epoch seconds).
+local_credentials = TTLCache(max_size=CREDENTIAL_LOCAL_MAX_SIZE, ttl=min(CREDENTIAL_LOCAL_TTL, CREDENTIAL_CACHE_TTL))
+
+# Identifies this process on the invalidation channel so it can ignore its own messages
+PROCESS_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+_listener = None
+_gateway_client: httpx.AsyncClient | None = None
+
+# Gateway fetches in flight in this process, one per licence
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def cache_key(licence: str) -> str:
+    return f"{licence}_storage"
+
+
+def lock_key(licence: str) -> str:
+    return f"{licence}_storage_lock"
+
+
+def encode_credential(credential: dict) -> str:
+    return json.dumps(credential, separators=(",", ":"))
+
+
+def decode_credential(payload) -> dict | None:
+    try:
+        credential = json.loads(payload)
+    except (TypeError, ValueError):
+        return None
+    return credential if isinstance(credential, dict) else None
+
+
+def read_cache_entry(licence: str) -> tuple[dict, float] | None:
+    entry = read_local_entry(licence)
+    return entry if entry is not None else read_shared_entry(licence)
+
+
+async def read_cache_entry_async(licence: str) -> tuple[dict, float] | None:
+    """Like read_cache_entry, with the Redis tier read from a worker thread instead of the event loop."""
+    entry = read_local_entry(licence)
+    return entry if entry is not None else await asyncio.to_thread(read_shared_entry, licence)
+
+
+def read_local_entry(licence: str) -> tuple[dict, float] | None:
+    entry = local_credentials.get(licence)
+    if entry is not None:
+        CREDENTIAL_LOOKUPS.labels("local_hit").inc()
+    return entry
+
+
+def read_shared_entry(licence: str) -> tuple[dict, float] | None:
+    key = cache_key(licence)
+    pipeline = r.pipeline()
+    pipeline.get(key)
+    pipeline.ttl(key)
+    with timed("credential.redis"):
+        cached_result, remaining_ttl = pipeline.execute()
+    if cached_result is None:
+        CREDENTIAL_LOOKUPS.labels("miss").inc()
+        return None
+
+    credential = decode_credential(cached_result)
+    if credential is None:
+        # Entries written before the JSON encoding cannot be read safely; refetch them
+        logger.info(f"Discarding unreadable cached storage credential for licence {licence}")
+        r.delete(key)
+        CREDENTIAL_LOOKUPS.labels("miss").inc()
+        return None
+
+    if not isinstance(remaining_ttl, int) or remaining_ttl <= 0:
+        remaining_ttl = CREDENTIAL_CACHE_TTL
+    entry = (credential, time.time() + remaining_ttl)
+    local_credentials.set(licence, entry, ttl=min(local_credentials.ttl, remaining_ttl))
+    CREDENTIAL_LOOKUPS.labels("redis_hit").inc()
+    logger.info(f"Using cached storage credential for licence {licence}")
+    return entry
+
+
+def read_cache_credential(licence: str) -> dict | None:
+    entry = read_cache_entry(licence)
+    return entry[0] if entry is not None else None
+
+
+def write_cache_credential(licence: str, credential: dict):
+    r.set(cache_key(licence), encode_credential(credential), ex=CREDENTIAL_CACHE_TTL)
+    local_credentials.set(licence, (credential, time.time() + CREDENTIAL_CACHE_TTL))
+    publish_invalidation(licence)
+    logger.info(f"Cached storage credential for licence {licence}")
+
+
+def invalidate_cache_credential(licence: str):
+    local_credentials.pop(licence)
+    r.delete(cache_key(licence))
+    publish_invalidation(licence)
+
+
+def publish_invalidation(licence: str):
+    try:
+        r.publish(CREDENTIAL_INVALIDATION_CHANNEL, json.dumps({"licence": licence, "origin": PROCESS_ID}))
+    except Exception as e:
+        logger.warning(f"Failed to publish credential invalidation for licence {licence}: {e}")
+
+
+def handle_invalidation(message: dict):
+    data = message.get("data")
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    try:
+        payload = json.loads(data)
+    except (TypeError, ValueError):
+        return
+    if payload.get("origin") == PROCESS_ID:
+        return
+    local_credentials.pop(payload.get("licence"))
+
+
+def start_invalidation_listener():
+    """Drop local copies when another worker writes or invalidates a credential."""
+    global _listener
+    if _listener is not None:
+        return
+    try:
+        pubsub = r.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{CREDENTIAL_INVALIDATION_CHANNEL: handle_invalidation})
+        _listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+    except Exception as e:
+        # Without the listener local entries still expire after CREDENTIAL_LOCAL_TTL
+        logger.warning(f"Credential invalidation listener not started: {e}")
+
+
+def stop_invalidation_listener():
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+
+
+def get_gateway_client() -> httpx.AsyncClient:
+    """Return the application-wide gateway client so connections are kept alive between calls."""
+    global _gateway_client
+    if _gateway_client is None or _gateway_client.is_closed:
+        _gateway_client = httpx.AsyncClient(
+            base_url=URL_API_GATEWAY,
+            limits=httpx.Limits(
+                max_connections=GATEWAY_MAX_CONNECTIONS,
+                max_keepalive_connections=GATEWAY_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(GATEWAY_TIMEOUT, connect=GATEWAY_CONNECT_TIMEOUT)
+        )
+    return _gateway_client
+
+
+async def close_gateway_client():
+    global _gateway_client
+    if _gateway_client is not None:
+        await _gateway_client.aclose()
+        _gateway_client = None
+
+
+def is_retryable(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+async def fetch_credential(token: str, licence: str) -> dict:
+    client = get_gateway_client()
+    headers = {"Authorization": f"Bearer {token}", "X-License-Key": f"{licence}"}
+
+    for attempt in range(GATEWAY_RETRIES + 1):
+        try:
+            with timed("gateway.fetch"):
+                # httpx timeouts apply per phase; this bounds the attempt as a whole
+                response = await asyncio.wait_for(
+                    client.get("/credential/v1/storage", headers=headers), GATEWAY_ATTEMPT_TIMEOUT)
+        except httpx.TransportError as e:
+            logger.warning(f"Credential request for licence {licence} failed: {e}")
+        except asyncio.TimeoutError:
+            logger.warning(f"Credential request for licence {licence} timed out after {GATEWAY_ATTEMPT_TIMEOUT}s")
+        else:
+            if response.status_code == 200:
+                return response.json()
+            if not is_retryable(response.status_code):
+                break
+            logger.warning(f"Credential request for licence {licence} returned {response.status_code}")
+
+        if attempt < GATEWAY_RETRIES:
+            # Full jitter keeps workers that failed together from retrying together
+            await asyncio.sleep(random.uniform(0, GATEWAY_RETRY_BACKOFF * 2 ** attempt))
+
+    raise HTTPException(status_code=500, detail="Credential request failed")
+
+
+def acquire_fetch_lock(licence: str):
+    """Take the cross-worker lock for a licence, or return None if another worker holds it."""
+    lock = r.lock(lock_key(licence), timeout=CREDENTIAL_LOCK_TTL, blocking=False)
+    try:
+        return lock if lock.acquire(blocking=False) else None
+    except Exception as e:
+        # Redis trouble must not prevent serving: fall back to process-level single-flight
+        logger.warning(f"Credential lock unavailable for licence {licence}: {e}")
+        return False
+
+
+def release_fetch_lock(lock):
+    if not lock:
+        return
+    try:
+        lock.release()
+    except Exception:
+        # The lock expired on its own; nothing else to release
+        pass
+
+
+async def wait_for_other_worker(licence: str) -> dict | None:
+    deadline = time.monotonic() + CREDENTIAL_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await read_cache_entry_async(licence)
+        if entry is not None:
+            return entry[0]
+    return None
+
+
+# The Redis calls of the fetch path run in worker threads so a herd of waiting
+# requests, or a slow Redis, never blocks the event loop
+async def load_credential(token: str, licence: str) -> dict:
+    lock = await asyncio.to_thread(acquire_fetch_lock, licence)
+    if lock is None:
+        credential = await wait_for_other_worker(licence)
+        if credential is not None:
+            return credential
+        logger.warning(f"Timed out waiting for credential of licence {licence}, fetching it directly")
+
+    try:
+        credential = await fetch_credential(token, licence)
+        await asyncio.to_thread(write_cache_credential, licence, credential)
+        return credential
+    finally:
+        await asyncio.to_thread(release_fetch_lock, lock)
+
+
+async def refresh_credential(token: str, licence: str) -> dict | None:
+    lock = await asyncio.to_thread(acquire_fetch_lock, licence)
+    if lock is None:
+        # Another worker is already refreshing this licence
+        return None
+    try:
+        credential = await fetch_credential(token, licence)
+        await asyncio.to_thread(write_cache_credential, licence, credential)
+        logger.info(f"Refreshed storage credential for licence {licence} ahead of expiry")
+        return credential
+    except Exception as e:
+        logger.warning(f"Background refresh of storage credential for licence {licence} failed: {e}")
+        return None
+    finally:
+        await asyncio.to_thread(release_fetch_lock, lock)
+
+
+def single_flight(licence: str, coroutine_factory) -> asyncio.Task:
+    task = _inflight.get(licence)
+    if task is None or task.done():
+        task = asyncio.ensure_future(coroutine_factory())
+        _inflight[licence] = task
+        task.add_done_callback(lambda done: _inflight.pop(licence, None) if _inflight.get(licence) is done else None)
+    return task
+
+
+async def get_credential(token: str, licence: str) -> dict:
+    entry = await read_cache_entry_async(licence)
+    if entry is not None:
+        credential, expires_at = entry
+        if expires_at - time.time() < CREDENTIAL_REFRESH_AHEAD:
+            # Keep serving the cached value while one background task renews it
+            single_flight(licence, lambda: refresh_credential(token, licence))
+        return credential
+
+    credential = await asyncio.shield(single_flight(licence, lambda: load_credential(token, licence)))
+    if credential is None:
+        # We joined a background refresh that was skipped or failed
+        credential = await asyncio.shield(single_flight(licence, lambda: load_credential(token, licence)))
+    return credential
@@ -0,0 +1,71 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from interfaces.storage_bucket_interface import StorageBucketRepository
+from interfaces.storage_interface import StorageRepository
+
+
+def load_checkpoint(path: str) -> dict:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as checkpoint:
+        return json.load(checkpoint)
+
+
+def save_checkpoint(path: str, state: dict) -> None:
+    # Write then rename so that an interrupted job never leaves a truncated checkpoint
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as checkpoint:
+        json.dump(state, checkpoint)
+    os.replace(temporary, path)
+
+
+def reconcile_bucket(bucket_repo: StorageBucketRepository, storage_repo: StorageRepository,
+                     state: dict = None, delete: bool = False, min_age: int = 3600,
+                     on_orphans: Callable[[list], None] = None,
+                     on_page: Callable[[dict], None] = None) -> dict:
+    """Find bucket files that no document references, one listing page at a time.
+
+    Each page of keys is checked with one batched lookup on file_path (and on the
+    path of direct uploads still pending), so memory does not grow with the bucket.
+    Files younger than ``min_age`` seconds are skipped because their document may
+    not be written yet. ``on_page`` receives the running totals, including the last
+    key processed, after every page and is where a checkpoint is saved. Passing a
+    saved ``state`` back resumes after its last key with its totals.
+    """
+    stats = {"start_after": None, "scanned": 0, "orphans": 0, "deleted": 0, "failed": 0}
+    stats.update(state or {})
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=min_age)
+
+    for page in bucket_repo.iter_bucket_pages(start_after=stats["start_after"]):
+        files = {f"s3://{bucket_repo.bucket_name}/{item['Key']}": item for item in page}
+        referenced = storage_repo.find_referenced_file_paths(list(files))
+        orphans = [file_path for file_path, item in files.items()
+                   if file_path not in referenced and not is_recent(item, cutoff)]
+
+        stats["scanned"] += len(page)
+        stats["orphans"] += len(orphans)
+        if orphans:
+            if on_orphans:
+                on_orphans(orphans)
+            if delete:
+                errors = bucket_repo.delete_files_from_bucket(orphans)
+                stats["deleted"] += len(orphans) - len(errors)
+                stats["failed"] += len(errors)
+
+        stats["start_after"] = page[-1]["Key"]
+        if on_page:
+            on_page(dict(stats))
+
+    return stats
+
+
+def is_recent(item: dict, cutoff: datetime) -> bool:
+    last_modified: Optional[datetime] = item.get("LastModified")
+    if last_modified is None:
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified > cutoff
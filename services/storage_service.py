@@ -1,19 +1,86 @@
+import asyncio
+from collections import Counter
+from uuid import uuid4
 from fastapi import HTTPException, UploadFile
+from config.config import BATCH_UPLOAD_CONCURRENCY, STORAGE_DEDUP, EXPORT_BATCH_SIZE
 from models.object_model import ObjectWrite
 from common_api.utils.v0 import get_state_repos, get_state_stores
+from common_api.services.v0 import Logger
+from interfaces.storage_bucket_interface import InvalidRangeError
+from repositories.storage_repository_s3 import blob_key, blob_digest
+from services.cleanup_service import enqueue_file_cleanup
+from utils.etag import etag_versions
+from utils.ndjson import encode_ndjson, gzip_stream
 
+logger = Logger()
 
-def create_object(request, new_object, file: UploadFile = None) -> str:
+DELETE_PAGE_SIZE = 1000
+
+
+async def store_blob(storage_repo, bucket_repo, file: UploadFile = None, sha256: str = None) -> str:
+    """Return the path of the blob holding the file's content, uploading it only if no copy exists.
+
+    Without a file, a client-supplied ``sha256`` references the existing blob once a
+    HEAD confirms it is still in the bucket.
+    """
+    if not (file and file.filename):
+        blob = await storage_repo.reference_blob(sha256)
+        if blob is not None and not await bucket_repo.file_exists_async(blob["file_path"]):
+            await storage_repo.release_blob(sha256)
+            blob = None
+        if blob is None:
+            raise HTTPException(status_code=404, detail="No stored file matches sha256, send the file")
+        return blob["file_path"]
+
+    digest, size = await bucket_repo.hash_upload_file_async(file)
+    if sha256 and sha256 != digest:
+        raise HTTPException(status_code=400, detail="sha256 does not match the uploaded file")
+
+    key = blob_key(digest, uuid4().hex)
+    candidate = f"s3://{bucket_repo.bucket_name}/{key}"
+    blob = await storage_repo.acquire_blob(digest, candidate, size, file.content_type)
+    file_path = blob["file_path"]
+    if file_path != candidate:
+        # Entries written before the ready flag existed were only kept for finished uploads
+        if blob.get("ready", True):
+            return file_path
+        # The upload that created the entry may still be running or may have failed
+        if await bucket_repo.file_exists_async(file_path):
+            await storage_repo.mark_blob_ready(digest, file_path)
+            return file_path
+        key = file_path.replace(f"s3://{bucket_repo.bucket_name}/", "")
+
+    try:
+        await bucket_repo.upload_blob_async(file, key)
+    except BaseException:
+        await storage_repo.release_blob(digest)
+        raise
+    await storage_repo.mark_blob_ready(digest, file_path)
+    return file_path
+
+
+async def release_file(storage_repo, file_path: str, count: int = 1) -> str | None:
+    """Return the file to remove from the bucket, or None while other objects still share it."""
+    digest = blob_digest(file_path)
+    if digest is None:
+        return file_path
+    return await storage_repo.release_blob(digest, count)
+
+
+async def create_object(request, new_object, file: UploadFile = None, sha256: str = None) -> str:
     try:
         repos = get_state_repos(request)
         stores = get_state_stores(request)
 
-        from uuid import uuid4
         new_uuid = str(uuid4())
 
         file_path = None
-        if file and file.filename:
-            file_path, _ = stores.storage_bucket_repo.upload_file_to_bucket(file, custom_uuid=new_uuid)
+        if STORAGE_DEDUP and (sha256 or (file and file.filename)):
+            bucket_stores = await stores.resolve()
+            file_path = await store_blob(repos.storage_repo, bucket_stores.storage_bucket_repo, file, sha256)
+        elif file and file.filename:
+            bucket_stores = await stores.resolve()
+            file_path, _ = await bucket_stores.storage_bucket_repo.upload_file_to_bucket_async(file, custom_uuid=new_uuid)
 
         new_object_dict = new_object.model_dump()
         if file_path:
@@ -21,35 +88,200 @@ def create_object(request, new_object, file: UploadFile = None) -> str:
 
         new_object_dict["_id"] = new_uuid
 
-        if file_path:
-            repos.storage_repo.create_object_with_file(new_object_dict)
-        else:
-            repos.storage_repo.create_object_with_file(new_object_dict)
+        try:
+            await repos.storage_repo.create_object_with_file(new_object_dict)
+        except Exception:
+            if blob_digest(file_path):
+                await repos.storage_repo.release_blob(blob_digest(file_path))
+            raise
 
         if not isinstance(new_uuid, str):
             raise TypeError("The UUID is not a string.")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"An error occurred while creating the object: {e}")
 
     return new_uuid
 
 
-def get_objects(request) -> list[ObjectWrite]:
+async def create_objects_batch(request, items: list[tuple[ObjectWrite, UploadFile | None]]) -> list[dict]:
+    """Create many objects at once and report the outcome of each item.
+
+    Files are uploaded concurrently, at most BATCH_UPLOAD_CONCURRENCY at a time, and all
+    metadata is written with one unordered insert. A failed item never fails the others.
+    """
+    # Two uploads reading the same UploadFile would interleave their reads and store corrupt content
+    owners = {}
+    for index, (_, file) in enumerate(items):
+        if file is not None and owners.setdefault(id(file), index) != index:
+            raise HTTPException(status_code=400,
+                                detail=f"Items {owners[id(file)]} and {index} reference the same file")
+
+    repos = get_state_repos(request)
+    stores = get_state_stores(request)
+    semaphore = asyncio.Semaphore(BATCH_UPLOAD_CONCURRENCY)
+    results = [{"index": index, "uuid": str(uuid4()), "status": "created"} for index in range(len(items))]
+
+    def fail(index, error):
+        results[index].update(uuid=None, status="failed", error=error)
+
+    async def upload(index, file):
+        async with semaphore:
+            bucket_stores = await stores.resolve()
+            if STORAGE_DEDUP:
+                return await store_blob(repos.storage_repo, bucket_stores.storage_bucket_repo, file)
+            file_path, _ = await bucket_stores.storage_bucket_repo.upload_file_to_bucket_async(
+                file, custom_uuid=results[index]["uuid"])
+            return file_path
+
+    uploads = {index: upload(index, file) for index, (_, file) in enumerate(items) if file and file.filename}
+    file_paths = {}
+    for index, outcome in zip(uploads, await asyncio.gather(*uploads.values(), return_exceptions=True)):
+        if isinstance(outcome, BaseException):
+            fail(index, f"An error occurred while uploading the file: {outcome}")
+        else:
+            file_paths[index] = outcome
+
+    documents, positions = [], []
+    for index, (new_object, _) in enumerate(items):
+        if results[index]["status"] == "failed":
+            continue
+        document = new_object.model_dump()
+        document["_id"] = results[index]["uuid"]
+        if index in file_paths:
+            document["file_path"] = file_paths[index]
+        documents.append(document)
+        positions.append(index)
+
+    try:
+        errors = await repos.storage_repo.create_objects(documents)
+    except Exception as e:
+        errors = {position: str(e) for position in range(len(documents))}
+
+    orphans = []
+    for position, error in errors.items():
+        index = positions[position]
+        fail(index, f"An error occurred while creating the object: {error}")
+        if index in file_paths:
+            orphans.append(file_paths[index])
+    if orphans:
+        # Best effort: files whose metadata was rejected would otherwise never be referenced
+        bucket_repo = (await stores.resolve()).storage_bucket_repo
+        released = await asyncio.gather(*[release_file(repos.storage_repo, path) for path in orphans],
+                                        return_exceptions=True)
+        await asyncio.gather(*[bucket_repo.delete_file_from_bucket_async(path) for path in released
+                               if isinstance(path, str)], return_exceptions=True)
+
+    return results
+
+
+async def create_object_direct(request, new_object, filename: str, content_type: str = None,
+                               size: int = None) -> tuple[str, dict]:
     try:
         repos = get_state_repos(request)
-        objects = repos.storage_repo.list_objects()
+        stores = await get_state_stores(request).resolve()
+
+        new_uuid = str(uuid4())
+
+        plan = await stores.storage_bucket_repo.generate_presigned_upload_async(
+            filename, content_type=content_type, size=size, custom_uuid=new_uuid)
+
+        new_object_dict = new_object.model_dump()
+        new_object_dict["_id"] = new_uuid
+        new_object_dict["pending_upload"] = {
+            "file_path": plan["file_path"],
+            "upload_id": plan.get("upload_id"),
+            "size": size
+        }
+        await repos.storage_repo.create_object_with_file(new_object_dict)
+    except ValueError as e:
+        raise HTTPException(status_code = 400, detail = str(e))
+    except Exception as e:
+        raise HTTPException(status_code = 500, detail = f"An error occurred while creating the object: {e}")
+
+    return new_uuid, plan
+
+
+async def complete_object_upload(request, uuid: str, parts: list[dict] = None) -> dict:
+    try:
+        repos = get_state_repos(request)
+        pending = await repos.storage_repo.get_pending_upload(uuid)
+        if pending is None:
+            raise HTTPException(status_code=404, detail="Pending upload not found")
+        if pending.get("upload_id") and not parts:
+            raise HTTPException(status_code=400, detail="Parts are required to complete a multipart upload")
+
+        stores = await get_state_stores(request).resolve()
+        uploaded = await stores.storage_bucket_repo.complete_presigned_upload_async(
+            pending["file_path"], upload_id=pending.get("upload_id"), parts=parts)
+        if pending.get("size") is not None and uploaded["size"] != pending["size"]:
+            raise HTTPException(status_code=409, detail="Uploaded size does not match the announced size")
+
+        completed = await repos.storage_repo.complete_upload(
+            uuid, pending["file_path"], uploaded["size"], uploaded["etag"])
+        if not completed:
+            # Deleted, or completed by another call, since the pending upload was read
+            raise HTTPException(status_code=409, detail="Upload is no longer pending")
+    except HTTPException:
+        raise
+    except FileNotFoundError:
+        raise HTTPException(status_code = 409, detail = "File has not been uploaded")
+    except ValueError as e:
+        raise HTTPException(status_code = 400, detail = str(e))
+    except Exception as e:
+        raise HTTPException(status_code = 500, detail = f"An error occurred while completing the upload: {e}")
+
+    return {"uuid": uuid, "file_path": pending["file_path"], "size": uploaded["size"], "etag": uploaded["etag"]}
+
+
+async def get_objects(request, limit: int = None, cursor: str = None, filters: dict = None,
+                      fields: list[str] = None) -> tuple[list[ObjectWrite], str | None]:
+    try:
+        repos = get_state_repos(request)
+        objects, next_cursor = await repos.storage_repo.list_objects(
+            limit=limit, cursor=cursor, filters=filters, fields=fields)
         if not isinstance(objects, list):
             raise TypeError("The method list_objects did not return a list.")
+    except ValueError as e:
+        raise HTTPException(status_code = 400, detail = str(e))
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"An error occurred while get the list of objects: {e}")
 
-    return objects
+    return objects, next_cursor
+
 
+async def export_objects(request, resume_after: str = None, filters: dict = None, gzip: bool = False):
+    """Return the NDJSON chunks of every object after ``resume_after``, gzipped if asked.
 
-def get_object(request, uuid: str) -> ObjectWrite:
+    The first batch is read before returning so that database errors still get a
+    proper status; the rest is fetched as the response is sent.
+    """
     try:
         repos = get_state_repos(request)
-        object = repos.storage_repo.get_object(uuid)
+        batches = repos.storage_repo.iter_objects(
+            resume_after=resume_after, filters=filters, batch_size=EXPORT_BATCH_SIZE)
+        first = await anext(batches, None)
+    except ValueError as e:
+        raise HTTPException(status_code = 400, detail = str(e))
+    except Exception as e:
+        raise HTTPException(status_code = 500, detail = f"An error occurred while exporting the objects: {e}")
+
+    async def all_batches():
+        if first is None:
+            return
+        yield first
+        async for batch in batches:
+            yield batch
+
+    chunks = encode_ndjson(all_batches())
+    return gzip_stream(chunks) if gzip else chunks
+
+
+async def get_object(request, uuid: str) -> ObjectWrite:
+    try:
+        repos = get_state_repos(request)
+        object = await repos.storage_repo.get_object(uuid)
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"An error occurred while retrieving the object: {e}")
 
@@ -59,32 +291,156 @@ def get_object(request, uuid: str) -> ObjectWrite:
     return object
 
 
-def update_object(request, uuid: str, object_update: ObjectWrite) -> None:
+async def get_object_content(request, uuid: str, byte_range: str = None):
+    try:
+        repos = get_state_repos(request)
+        object_data = await repos.storage_repo.get_object(uuid)
+        if object_data is None or not object_data.get("file_path"):
+            raise HTTPException(status_code=404, detail="Storage not found")
+
+        stores = await get_state_stores(request).resolve()
+        bucket_repo = stores.storage_bucket_repo
+        file = await bucket_repo.get_file_stream_async(object_data["file_path"], byte_range)
+    except HTTPException:
+        raise
+    except InvalidRangeError:
+        raise HTTPException(status_code = 416, detail = "Requested range not satisfiable")
+    except FileNotFoundError:
+        raise HTTPException(status_code = 404, detail = "File not found")
+    except Exception as e:
+        raise HTTPException(status_code = 500, detail = f"An error occurred while retrieving the object content: {e}")
+
+    return bucket_repo.iter_file_stream(file["Body"]), file
+
+
+async def get_object_download_url(request, uuid: str) -> str:
+    try:
+        repos = get_state_repos(request)
+        object_data = await repos.storage_repo.get_object(uuid)
+        if object_data is None or not object_data.get("file_path"):
+            raise HTTPException(status_code=404, detail="Storage not found")
+
+        stores = await get_state_stores(request).resolve()
+        url = stores.storage_bucket_repo.generate_presigned_download(object_data["file_path"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code = 500, detail = f"An error occurred while signing the download: {e}")
+
+    return url
+
+
+async def get_object_version(request, uuid: str) -> int:
     try:
         repos = get_state_repos(request)
-        repos.storage_repo.update_object(uuid, object_update)
+        version = await repos.storage_repo.get_object_version(uuid)
+    except Exception as e:
+        raise HTTPException(status_code = 500, detail = f"An error occurred while retrieving the object: {e}")
+
+    if version is None:
+        raise HTTPException(status_code = 404, detail = "Storage not found")
+
+    return version
+
+
+async def update_object(request, uuid: str, object_update: ObjectWrite, if_match: str = None) -> int:
+    try:
+        repos = get_state_repos(request)
+        versions = etag_versions(if_match)
+        updated = await repos.storage_repo.update_object(uuid, object_update, versions)
+        if updated is None:
+            # Nothing matched: either the object is gone or it changed since the client read it
+            if versions is not None and await repos.storage_repo.get_object_version(uuid) is not None:
+                raise HTTPException(status_code = 412, detail = "Storage was modified since it was read")
+            raise HTTPException(status_code = 404, detail = "Storage not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"An error occurred while updating the object: {e}")
 
+    return updated.get("version", 0)
+
 
-def delete_object(request, uuid: str) -> None:
+async def delete_object(request, uuid: str) -> None:
     try:
         repos = get_state_repos(request)
-        stores = get_state_stores(request)
-        
-        # First, get the object to retrieve its file_path
-        object_data = repos.storage_repo.get_object(uuid)
-        if object_data is None:
+        deleted = await repos.storage_repo.delete_object(uuid)
+        if deleted is None:
             raise HTTPException(status_code=404, detail="Storage not found")
-        
-        # Delete the file from bucket if it exists
-        if object_data.get("file_path"):
-            stores.storage_bucket_repo.delete_file_from_bucket(object_data["file_path"])
-        
-        # Then delete the database record
-        repos.storage_repo.delete_object(uuid)
     except HTTPException:
-        # Re-raise HTTPException as is
         raise
     except Exception as e:
         raise HTTPException(status_code = 500, detail = f"An error occurred while deleting the object: {e}")
+
+    # The file is removed by the cleanup worker so the client only waits on Mongo
+    if deleted.get("file_path"):
+        try:
+            file_path = await release_file(repos.storage_repo, deleted["file_path"])
+            if file_path:
+                # Off the event loop, so a slow Redis does not stall other requests
+                await asyncio.to_thread(enqueue_file_cleanup, request.state.licence_uuid, file_path, uuid)
+        except Exception as e:
+            logger.warning(f"Failed to queue cleanup of {deleted['file_path']} for object {uuid}: {e}")
+
+
+async def delete_objects_batch(request, uuids: list[str] = None, filters: dict = None) -> list[dict]:
+    """Delete many objects, page by page, and report the outcome of each one.
+
+    A page costs one $in (or filtered) read, one DeleteObjects call per 1000 files and
+    one delete_many. Documents whose file could not be removed are kept.
+    """
+    repos = get_state_repos(request)
+    stores = get_state_stores(request)
+    results = []
+
+    async def release_blobs(file_paths: list[str | None]) -> None:
+        digests = Counter(blob_digest(path) for path in file_paths if blob_digest(path))
+        for digest, count in digests.items():
+            try:
+                file_path = await repos.storage_repo.release_blob(digest, count)
+                if file_path:
+                    await asyncio.to_thread(enqueue_file_cleanup, request.state.licence_uuid, file_path)
+            except Exception as e:
+                logger.warning(f"Failed to release blob {digest}: {e}")
+
+    async def delete_page(file_paths: dict[str, str | None]) -> None:
+        # Shared blobs are only released here; the last release queues their removal
+        owned = [path for path in file_paths.values() if path and not blob_digest(path)]
+        errors = {}
+        if owned:
+            bucket_repo = (await stores.resolve()).storage_bucket_repo
+            errors = await bucket_repo.delete_files_from_bucket_async(owned)
+
+        deletable = [uuid for uuid, path in file_paths.items() if not path or path not in errors]
+        if deletable:
+            await repos.storage_repo.delete_objects(deletable)
+            await release_blobs([file_paths[uuid] for uuid in deletable])
+
+        for uuid, path in file_paths.items():
+            if path and path in errors:
+                results.append({"uuid": uuid, "status": "failed", "error": errors[path]})
+            else:
+                results.append({"uuid": uuid, "status": "deleted"})
+
+    try:
+        if uuids is not None:
+            uuids = list(dict.fromkeys(uuids))
+            for start in range(0, len(uuids), DELETE_PAGE_SIZE):
+                page = uuids[start:start + DELETE_PAGE_SIZE]
+                file_paths = await repos.storage_repo.get_file_paths(page)
+                results.extend({"uuid": uuid, "status": "not_found"} for uuid in page if uuid not in file_paths)
+                await delete_page(file_paths)
+        else:
+            cursor = None
+            while True:
+                objects, cursor = await repos.storage_repo.list_objects(
+                    limit=DELETE_PAGE_SIZE, cursor=cursor, filters=filters, fields=["file_path"])
+                await delete_page({object["uuid"]: object.get("file_path") for object in objects})
+                if not cursor:
+                    break
+    except ValueError as e:
+        raise HTTPException(status_code = 400, detail = str(e))
+    except Exception as e:
+        raise HTTPException(status_code = 500, detail = f"An error occurred while deleting the objects: {e}")
+
+    return results
@@ -0,0 +1,127 @@
+"""
+Test to verify that batch creation uploads concurrently and reports each item.
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from fastapi import HTTPException
+from pymongo.errors import BulkWriteError
+from models.object_model import ObjectWrite
+from repositories.storage_repository_mongo_async import StorageRepositoryMongoAsync
+from services.storage_service import create_objects_batch
+
+
+def upload_file(filename):
+    file = Mock()
+    file.filename = filename
+    return file
+
+
+@pytest.fixture
+def state():
+    storage_repo = AsyncMock()
+    storage_repo.create_objects.return_value = {}
+    bucket_repo = AsyncMock()
+    bucket_repo.upload_file_to_bucket_async.side_effect = \
+        lambda file, custom_uuid: (f"s3://bucket/{custom_uuid}-{file.filename}", 1)
+    stores = Mock()
+    stores.resolve = AsyncMock(return_value=Mock(storage_bucket_repo=bucket_repo))
+    with patch('services.storage_service.get_state_repos', return_value=Mock(storage_repo=storage_repo)), \
+            patch('services.storage_service.get_state_stores', return_value=stores):
+        yield storage_repo, bucket_repo
+
+
+def test_batch_writes_all_metadata_in_one_insert(state):
+    """Test that every item is inserted through a single create_objects call"""
+    storage_repo, bucket_repo = state
+    items = [(ObjectWrite(name="a"), upload_file("a.txt")), (ObjectWrite(name="b"), None)]
+
+    results = asyncio.run(create_objects_batch(Mock(), items))
+
+    assert [result["status"] for result in results] == ["created", "created"]
+    documents = storage_repo.create_objects.await_args.args[0]
+    assert [document["_id"] for document in documents] == [result["uuid"] for result in results]
+    assert documents[0]["file_path"].endswith("a.txt")
+    assert "file_path" not in documents[1]
+    assert bucket_repo.upload_file_to_bucket_async.await_count == 1
+
+
+def test_upload_fan_out_is_bounded(state, monkeypatch):
+    """Test that no more than BATCH_UPLOAD_CONCURRENCY uploads run at once"""
+    _, bucket_repo = state
+    monkeypatch.setattr('services.storage_service.BATCH_UPLOAD_CONCURRENCY', 2)
+    running, peak = 0, 0
+
+    async def slow_upload(file, custom_uuid):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return f"s3://bucket/{custom_uuid}", 1
+
+    bucket_repo.upload_file_to_bucket_async.side_effect = slow_upload
+    items = [(ObjectWrite(name=str(i)), upload_file(f"{i}.txt")) for i in range(6)]
+
+    asyncio.run(create_objects_batch(Mock(), items))
+
+    assert peak == 2
+
+
+def test_partial_failures_are_reported_per_item(state):
+    """Test that upload and insert failures only fail their own item and orphaned files are removed"""
+    storage_repo, bucket_repo = state
+
+    async def upload(file, custom_uuid):
+        if file.filename == "broken.txt":
+            raise ValueError("S3 unavailable")
+        return f"s3://bucket/{file.filename}", 1
+
+    bucket_repo.upload_file_to_bucket_async.side_effect = upload
+    storage_repo.create_objects.return_value = {1: "E11000 duplicate key"}
+    items = [
+        (ObjectWrite(name="ok"), upload_file("ok.txt")),
+        (ObjectWrite(name="broken"), upload_file("broken.txt")),
+        (ObjectWrite(name="duplicate"), upload_file("duplicate.txt")),
+    ]
+
+    results = asyncio.run(create_objects_batch(Mock(), items))
+
+    assert [result["status"] for result in results] == ["created", "failed", "failed"]
+    assert "S3 unavailable" in results[1]["error"]
+    assert "duplicate key" in results[2]["error"]
+    assert results[2]["uuid"] is None
+    bucket_repo.delete_file_from_bucket_async.assert_awaited_once_with("s3://bucket/duplicate.txt")
+
+
+def test_items_sharing_a_file_are_rejected(state):
+    """Test that two items naming the same file_index fail the batch before any upload"""
+    storage_repo, bucket_repo = state
+    shared = upload_file("shared.bin")
+    items = [(ObjectWrite(name="a"), shared), (ObjectWrite(name="b"), None), (ObjectWrite(name="c"), shared)]
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(create_objects_batch(Mock(), items))
+
+    assert error.value.status_code == 400
+    assert "0 and 2" in error.value.detail
+    bucket_repo.upload_file_to_bucket_async.assert_not_awaited()
+    storage_repo.create_objects.assert_not_awaited()
+
+
+def test_repository_maps_bulk_write_errors_to_indexes():
+    """Test that an unordered insert reports the rejected documents by position"""
+    repo = StorageRepositoryMongoAsync.__new__(StorageRepositoryMongoAsync)
+    repo.uri = "mongodb://localhost/test"
+    repo.ensure_indexes = Mock()
+    repo.collection = "objects"
+    collection = Mock()
+    collection.insert_many = AsyncMock(side_effect=BulkWriteError({
+        "writeErrors": [{"index": 2, "code": 11000, "errmsg": "E11000 duplicate key"}]
+    }))
+    repo.db = {"objects": collection}
+
+    errors = asyncio.run(repo.create_objects([{"_id": "a"}, {"_id": "b"}, {"_id": "a"}]))
+
+    assert errors == {2: "E11000 duplicate key"}
+    assert collection.insert_many.await_args.kwargs == {"ordered": False}
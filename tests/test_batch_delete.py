@@ -0,0 +1,109 @@
+"""
+Test to verify that bulk deletion batches its database and bucket calls.
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from pydantic import ValidationError
+from models.object_model import BatchDelete
+from repositories.storage_repository_s3 import StorageRepositoryS3, known_buckets
+import repositories.storage_repository_s3 as s3_module
+from services.storage_service import delete_objects_batch
+
+
+@pytest.fixture
+def state():
+    storage_repo = AsyncMock()
+    bucket_repo = AsyncMock()
+    bucket_repo.delete_files_from_bucket_async.return_value = {}
+    stores = Mock()
+    stores.resolve = AsyncMock(return_value=Mock(storage_bucket_repo=bucket_repo))
+    with patch('services.storage_service.get_state_repos', return_value=Mock(storage_repo=storage_repo)), \
+            patch('services.storage_service.get_state_stores', return_value=stores):
+        yield storage_repo, bucket_repo, stores
+
+
+def test_uuids_are_deleted_with_one_call_per_store(state):
+    """Test that a list of uuids costs one lookup, one bucket call and one delete_many"""
+    storage_repo, bucket_repo, _ = state
+    storage_repo.get_file_paths.return_value = {"a": "s3://bucket/a.txt", "b": None}
+
+    results = asyncio.run(delete_objects_batch(Mock(), uuids=["a", "b", "missing", "a"]))
+
+    storage_repo.get_file_paths.assert_awaited_once_with(["a", "b", "missing"])
+    bucket_repo.delete_files_from_bucket_async.assert_awaited_once_with(["s3://bucket/a.txt"])
+    storage_repo.delete_objects.assert_awaited_once_with(["a", "b"])
+    assert {result["uuid"]: result["status"] for result in results} == \
+        {"a": "deleted", "b": "deleted", "missing": "not_found"}
+
+
+def test_documents_are_kept_when_their_file_fails(state):
+    """Test that an object whose file could not be deleted keeps its document"""
+    storage_repo, bucket_repo, _ = state
+    storage_repo.get_file_paths.return_value = {"a": "s3://bucket/a.txt", "b": "s3://bucket/b.txt"}
+    bucket_repo.delete_files_from_bucket_async.return_value = {"s3://bucket/b.txt": "AccessDenied"}
+
+    results = asyncio.run(delete_objects_batch(Mock(), uuids=["a", "b"]))
+
+    storage_repo.delete_objects.assert_awaited_once_with(["a"])
+    assert results[1] == {"uuid": "b", "status": "failed", "error": "AccessDenied"}
+
+
+def test_filter_walks_every_page(state):
+    """Test that a filter deletes page by page until no cursor is left"""
+    storage_repo, _, stores = state
+    storage_repo.list_objects.side_effect = [
+        ([{"uuid": "a", "name": "a"}, {"uuid": "b", "name": "b"}], "cursor-1"),
+        ([{"uuid": "c", "name": "c"}], None),
+    ]
+
+    results = asyncio.run(delete_objects_batch(Mock(), filters={"created_by": "user-1"}))
+
+    assert [result["uuid"] for result in results] == ["a", "b", "c"]
+    assert storage_repo.list_objects.await_args_list[1].kwargs["cursor"] == "cursor-1"
+    assert storage_repo.delete_objects.await_count == 2
+    stores.resolve.assert_not_called()
+
+
+def test_batch_delete_requires_exactly_one_target():
+    """Test that a request gives either uuids or a filter"""
+    with pytest.raises(ValidationError):
+        BatchDelete()
+    with pytest.raises(ValidationError):
+        BatchDelete(uuids=["a"], filter={"created_by": "alice"})
+    with pytest.raises(ValidationError):
+        BatchDelete(uuids=["a"], all=True)
+
+
+def test_filter_must_name_a_known_criterion():
+    """Test that an empty or misspelt filter is rejected instead of matching the whole tenant"""
+    with pytest.raises(ValidationError):
+        BatchDelete(filter={})
+    with pytest.raises(ValidationError):
+        BatchDelete(filter={"name_prefix": ""})
+    with pytest.raises(ValidationError):
+        BatchDelete(filter={"createdBy": "alice"})
+    assert BatchDelete(filter={"has_file": False}).filter.has_file is False
+    assert BatchDelete(all=True).all
+
+
+def test_bucket_deletes_are_split_into_batches_of_limit(monkeypatch):
+    """Test that DeleteObjects is called once per batch and reports per-key errors"""
+    monkeypatch.setattr(s3_module, "DELETE_OBJECTS_BATCH_SIZE", 2)
+    known_buckets.clear()
+    repo = StorageRepositoryS3.__new__(StorageRepositoryS3)
+    repo.credentials = {"endpoint": "http://minio:9000", "bucket_name": "bulk-bucket"}
+    repo.bucket_name = "bulk-bucket"
+    repo.client = Mock()
+    repo.client.delete_objects.side_effect = [
+        {"Errors": [{"Key": "b", "Code": "AccessDenied", "Message": "Access Denied"}]},
+        {},
+    ]
+
+    errors = repo.delete_files_from_bucket(["s3://bulk-bucket/a", "s3://bulk-bucket/b", "s3://bulk-bucket/c"])
+
+    assert repo.client.delete_objects.call_count == 2
+    first_batch = repo.client.delete_objects.call_args_list[0].kwargs["Delete"]["Objects"]
+    assert first_batch == [{"Key": "a"}, {"Key": "b"}]
+    assert errors == {"s3://bulk-bucket/b": "Access Denied"}
+    known_buckets.clear()
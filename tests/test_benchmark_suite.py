@@ -0,0 +1,60 @@
+"""
+Test to verify the benchmark stand-ins behave like the backends they replace and regressions are detected.
+"""
+import asyncio
+from models.object_model import ObjectWrite
+from benchmarks.bench_endpoints import compare, percentile
+from benchmarks.standins import InMemoryMongoClient, InMemoryS3Client
+from repositories.storage_repository_mongo_async import StorageRepositoryMongoAsync
+from repositories.storage_repository_s3 import StorageRepositoryS3
+
+
+def test_repository_runs_against_the_mongo_stand_in():
+    """Test that the real async repository can create, read, update, list and delete in memory"""
+    InMemoryMongoClient.databases = {}
+    repo = StorageRepositoryMongoAsync.__new__(StorageRepositoryMongoAsync)
+    repo.uri = "mongodb://standin:27017/test-suite"
+    repo.db = InMemoryMongoClient(repo.uri)["test-suite"]
+    repo.collection = "objects"
+
+    async def scenario():
+        uuid = await repo.create_object(ObjectWrite(name="Report"))
+        updated = await repo.update_object(uuid, ObjectWrite(name="Renamed"), [1])
+        objects, _ = await repo.list_objects(limit=10)
+        deleted = await repo.delete_object(uuid)
+        return updated, objects, deleted, await repo.get_object(uuid)
+
+    updated, objects, deleted, after = asyncio.run(scenario())
+
+    assert updated["version"] == 2
+    assert objects[0]["name"] == "Renamed"
+    assert deleted is not None and after is None
+
+
+def test_s3_repository_runs_against_the_s3_stand_in():
+    """Test that uploads and ranged reads go through the S3 stand-in"""
+    repo = StorageRepositoryS3.__new__(StorageRepositoryS3)
+    repo.credentials = {"endpoint": "http://s3.standin:9000"}
+    repo.bucket_name = "test-suite"
+    repo.client = InMemoryS3Client()
+
+    repo.call_with_bucket(repo.client.put_object, Key="a.txt", Body=b"0123456789")
+
+    response = repo.get_file_stream("s3://test-suite/a.txt", "bytes=2-4")
+    assert response["Body"].read() == b"234"
+    assert response["ContentRange"] == "bytes 2-4/10"
+    assert repo.file_exists("s3://test-suite/a.txt")
+    assert not repo.file_exists("s3://test-suite/b.txt")
+
+
+def test_regressions_beyond_tolerance_are_reported():
+    """Test that throughput drops and p95 growth past the tolerance are flagged"""
+    baseline = {"get/c1": {"rps": 1000.0, "p95_ms": 2.0}, "list/c1": {"rps": 100.0, "p95_ms": 10.0}}
+    results = {"get/c1": {"rps": 900.0, "p95_ms": 2.1}, "list/c1": {"rps": 50.0, "p95_ms": 20.0},
+               "new/c1": {"rps": 1.0, "p95_ms": 1.0}}
+
+    regressions = compare(results, baseline, tolerance=0.15)
+
+    assert len(regressions) == 2
+    assert all(regression.startswith("list/c1") for regression in regressions)
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) in (2.0, 3.0)
@@ -0,0 +1,96 @@
+"""
+Test to verify that bucket existence is cached instead of checked before every S3 operation.
+"""
+import pytest
+from unittest.mock import Mock
+from botocore.exceptions import ClientError
+from repositories.storage_repository_s3 import StorageRepositoryS3, known_buckets
+
+
+def client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": code}}, "operation")
+
+
+def create_repo(bucket_name="cached-bucket"):
+    """Create an S3 repository with a mocked boto3 client"""
+    repo = StorageRepositoryS3.__new__(StorageRepositoryS3)
+    repo.credentials = {"endpoint": "http://minio:9000", "bucket_name": bucket_name}
+    repo.bucket_name = bucket_name
+    repo.client = Mock()
+    return repo
+
+
+@pytest.fixture(autouse=True)
+def clear_known_buckets():
+    known_buckets.clear()
+    yield
+    known_buckets.clear()
+
+
+def test_head_bucket_called_once_for_repeated_operations():
+    """Test that only the first operation pays for the head_bucket round trip"""
+    repo = create_repo()
+
+    repo.delete_file_from_bucket("s3://cached-bucket/a.pdf")
+    repo.delete_file_from_bucket("s3://cached-bucket/b.pdf")
+
+    repo.client.head_bucket.assert_called_once_with(Bucket="cached-bucket")
+    assert repo.client.delete_object.call_count == 2
+
+
+def test_cache_is_shared_between_repositories_of_same_endpoint():
+    """Test that a new repository for a known bucket does not check it again"""
+    create_repo().ensure_bucket_exists()
+    other = create_repo()
+
+    other.ensure_bucket_exists()
+
+    other.client.head_bucket.assert_not_called()
+
+
+def test_missing_bucket_is_created():
+    """Test that a 404 on head_bucket creates the bucket"""
+    repo = create_repo()
+    repo.client.head_bucket.side_effect = client_error("404")
+
+    repo.ensure_bucket_exists()
+
+    repo.client.create_bucket.assert_called_once_with(Bucket="cached-bucket")
+
+
+def test_other_errors_are_not_swallowed():
+    """Test that errors other than a missing bucket do not trigger create_bucket"""
+    repo = create_repo()
+    repo.client.head_bucket.side_effect = client_error("403")
+
+    with pytest.raises(ClientError):
+        repo.ensure_bucket_exists()
+
+    repo.client.create_bucket.assert_not_called()
+
+
+def test_no_such_bucket_clears_cache_and_retries():
+    """Test that an operation failing with NoSuchBucket recreates the bucket and retries once"""
+    repo = create_repo()
+    repo.ensure_bucket_exists()
+    repo.client.head_bucket.side_effect = client_error("404")
+    repo.client.delete_object.side_effect = [client_error("NoSuchBucket"), None]
+
+    repo.delete_file_from_bucket("s3://cached-bucket/a.pdf")
+
+    repo.client.create_bucket.assert_called_once_with(Bucket="cached-bucket")
+    assert repo.client.delete_object.call_count == 2
+
+
+def test_missing_key_does_not_touch_the_bucket_cache():
+    """Test that a 404 from an object operation is not taken for a missing bucket"""
+    repo = create_repo()
+    repo.ensure_bucket_exists()
+    repo.client.download_fileobj.side_effect = client_error("404")
+
+    with pytest.raises(ValueError):
+        repo.download_file_from_bucket("s3://cached-bucket/missing.pdf")
+
+    assert repo.bucket_cache_key in known_buckets
+    repo.client.head_bucket.assert_called_once()
+    assert repo.client.download_fileobj.call_count == 1
@@ -0,0 +1,120 @@
+"""
+Test to verify that the bucket cleanup queue retries failed deletions with backoff.
+"""
+import asyncio
+import json
+import threading
+import time
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+import services.cleanup_service as cleanup_service
+from services.cleanup_service import enqueue_file_cleanup, claim_jobs, process_jobs, encode_job
+
+CREDENTIAL = {"s3": {"endpoint": "http://minio:9000"}}
+
+
+def job(file_path, attempts=0, licence="licence-1"):
+    value = {"licence": licence, "file_path": file_path, "uuid": None, "attempts": attempts}
+    return encode_job(value), value
+
+
+@pytest.fixture
+def mock_redis():
+    redis = Mock()
+    with patch.object(cleanup_service, "r", redis):
+        yield redis
+
+
+@pytest.fixture
+def bucket_repo():
+    repo = AsyncMock()
+    repo.delete_files_from_bucket_async.return_value = {}
+    with patch.object(cleanup_service, "read_cache_credential", return_value=CREDENTIAL), \
+            patch.object(cleanup_service.s3_repository_pool, "get", return_value=repo):
+        yield repo
+
+
+def test_enqueue_adds_job_due_now(mock_redis):
+    """Test that a queued file is due immediately"""
+    enqueue_file_cleanup("licence-1", "s3://bucket/a.txt", "uuid-1")
+
+    key, members = mock_redis.zadd.call_args.args
+    payload, score = next(iter(members.items()))
+    assert key == cleanup_service.CLEANUP_QUEUE_KEY
+    assert json.loads(payload)["file_path"] == "s3://bucket/a.txt"
+    assert score <= time.time()
+
+
+def test_claim_skips_unreadable_jobs(mock_redis):
+    """Test that claimed payloads are decoded and garbage is dropped"""
+    payload, value = job("s3://bucket/a.txt")
+    mock_redis.register_script.return_value.return_value = [payload.encode(), b"not-json"]
+
+    assert claim_jobs() == [(payload.encode(), value)]
+    mock_redis.zrem.assert_called_once_with(cleanup_service.CLEANUP_QUEUE_KEY, b"not-json")
+
+
+def test_deleted_files_are_removed_from_queue(mock_redis, bucket_repo):
+    """Test that a licence's files are deleted in one batch and their jobs completed"""
+    jobs = [job("s3://bucket/a.txt"), job("s3://bucket/b.txt")]
+
+    asyncio.run(process_jobs(jobs))
+
+    bucket_repo.delete_files_from_bucket_async.assert_awaited_once_with(["s3://bucket/a.txt", "s3://bucket/b.txt"])
+    mock_redis.zrem.assert_called_once_with(cleanup_service.CLEANUP_QUEUE_KEY, jobs[0][0], jobs[1][0])
+
+
+def test_failed_file_is_rescheduled_with_backoff(mock_redis, bucket_repo):
+    """Test that a failed deletion is retried later with one more attempt counted"""
+    bucket_repo.delete_files_from_bucket_async.return_value = {"s3://bucket/a.txt": "SlowDown"}
+    payload, _ = job("s3://bucket/a.txt")
+
+    asyncio.run(process_jobs([(payload, json.loads(payload))]))
+
+    pipeline = mock_redis.pipeline.return_value
+    pipeline.zrem.assert_called_once_with(cleanup_service.CLEANUP_QUEUE_KEY, payload)
+    key, members = pipeline.zadd.call_args.args
+    retried, due = next(iter(members.items()))
+    assert key == cleanup_service.CLEANUP_QUEUE_KEY
+    assert json.loads(retried)["attempts"] == 1
+    assert json.loads(retried)["error"] == "SlowDown"
+    assert due > time.time()
+
+
+def test_job_goes_to_dead_letter_after_max_attempts(mock_redis, bucket_repo):
+    """Test that a job failing CLEANUP_MAX_ATTEMPTS times is parked instead of retried"""
+    bucket_repo.delete_files_from_bucket_async.return_value = {"s3://bucket/a.txt": "AccessDenied"}
+    payload, value = job("s3://bucket/a.txt", attempts=cleanup_service.CLEANUP_MAX_ATTEMPTS - 1)
+
+    asyncio.run(process_jobs([(payload, value)]))
+
+    key, _ = mock_redis.pipeline.return_value.zadd.call_args.args
+    assert key == cleanup_service.CLEANUP_DEAD_LETTER_KEY
+
+
+def test_missing_credential_postpones_without_using_an_attempt(mock_redis):
+    """Test that jobs wait when the licence has no cached credential and never reach the dead letters"""
+    payload, value = job("s3://bucket/a.txt", attempts=cleanup_service.CLEANUP_MAX_ATTEMPTS - 1)
+
+    with patch.object(cleanup_service, "read_cache_credential", return_value=None), \
+            patch.object(cleanup_service.s3_repository_pool, "get") as mock_get:
+        asyncio.run(process_jobs([(payload, value)]))
+
+    mock_get.assert_not_called()
+    mock_redis.zrem.assert_not_called()
+    mock_redis.pipeline.assert_not_called()
+    key, members = mock_redis.zadd.call_args.args
+    assert key == cleanup_service.CLEANUP_QUEUE_KEY
+    assert list(members) == [payload]
+    assert members[payload] > time.time() + cleanup_service.CLEANUP_CREDENTIAL_WAIT - 5
+
+
+def test_worker_calls_redis_off_the_event_loop(mock_redis, bucket_repo):
+    """Test that settling processed jobs never blocks the event loop on Redis"""
+    loop_thread = threading.get_ident()
+    threads = []
+    mock_redis.zrem.side_effect = lambda *args: threads.append(threading.get_ident())
+
+    asyncio.run(process_jobs([job("s3://bucket/a.txt")]))
+
+    assert threads and loop_thread not in threads
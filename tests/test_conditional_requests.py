@@ -0,0 +1,98 @@
+"""
+Test to verify that objects carry a version exposed as an ETag and honoured by conditional requests.
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from models.object_model import ObjectWrite
+from repositories.storage_repository_mongo_async import StorageRepositoryMongoAsync
+from services.storage_service import update_object
+from utils.etag import format_etag, etag_matches, etag_versions
+
+
+def create_repo():
+    """Create an async repository with a mocked collection"""
+    collection = AsyncMock()
+    repo = StorageRepositoryMongoAsync.__new__(StorageRepositoryMongoAsync)
+    repo.db = {"objects": collection}
+    repo.collection = "objects"
+    repo.ensure_indexes = Mock()
+    return repo, collection
+
+
+def test_etag_headers_are_parsed():
+    """Test that ETags round-trip through If-Match / If-None-Match headers"""
+    assert format_etag(3) == '"3"'
+    assert format_etag(None) == '"0"'
+    assert etag_matches('"2", W/"3"', 3)
+    assert etag_matches("*", 7)
+    assert not etag_matches('"2"', 3)
+    assert etag_versions('"2", "x", W/"5"') == [2, 5]
+    assert etag_versions("*") is None
+
+
+def test_new_objects_start_at_version_one():
+    """Test that inserted documents get a first version and update time"""
+    repo, collection = create_repo()
+
+    asyncio.run(repo.create_object_with_file({"_id": "uuid-1", "name": "Report"}))
+
+    document = collection.insert_one.call_args.args[0]
+    assert document["version"] == 1
+    assert document["updated_at"] is not None
+
+
+def test_update_bumps_version_and_checks_if_match():
+    """Test that an update increments the version and only applies to the expected versions"""
+    repo, collection = create_repo()
+    collection.find_one_and_update.return_value = {"_id": "uuid-1", "version": 3}
+
+    result = asyncio.run(repo.update_object("uuid-1", ObjectWrite(name="Renamed"), [0, 2]))
+
+    filter_query, update_data = collection.find_one_and_update.call_args.args
+    assert filter_query == {"_id": "uuid-1", "version": {"$in": [0, 2, None]}}
+    assert update_data["$inc"] == {"version": 1}
+    assert update_data["$currentDate"] == {"updated_at": True}
+    assert collection.find_one_and_update.call_args.kwargs["return_document"] == ReturnDocument.AFTER
+    assert result["version"] == 3
+
+
+def test_version_lookup_is_projected():
+    """Test that revalidation reads the version alone"""
+    repo, collection = create_repo()
+    collection.find_one.return_value = {"_id": "uuid-1"}
+
+    assert asyncio.run(repo.get_object_version("uuid-1")) == 0
+    collection.find_one.assert_awaited_once_with({"_id": "uuid-1"}, {"version": 1})
+
+
+@patch('services.storage_service.get_state_repos')
+def test_stale_if_match_is_rejected(mock_get_repos):
+    """Test that an update against a changed version answers 412, and a missing object 404"""
+    storage_repo = AsyncMock()
+    storage_repo.update_object.return_value = None
+    storage_repo.get_object_version.return_value = 4
+    mock_get_repos.return_value.storage_repo = storage_repo
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(update_object(Mock(), "uuid-1", ObjectWrite(name="Renamed"), '"3"'))
+    assert exc_info.value.status_code == 412
+    storage_repo.update_object.assert_awaited_once_with("uuid-1", ObjectWrite(name="Renamed"), [3])
+
+    storage_repo.get_object_version.return_value = None
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(update_object(Mock(), "uuid-1", ObjectWrite(name="Renamed"), '"3"'))
+    assert exc_info.value.status_code == 404
+
+
+@patch('services.storage_service.get_state_repos')
+def test_update_returns_new_version(mock_get_repos):
+    """Test that a successful update reports the version to send back as ETag"""
+    storage_repo = AsyncMock()
+    storage_repo.update_object.return_value = {"_id": "uuid-1", "version": 5}
+    mock_get_repos.return_value.storage_repo = storage_repo
+
+    assert asyncio.run(update_object(Mock(), "uuid-1", ObjectWrite(name="Renamed"))) == 5
+    storage_repo.update_object.assert_awaited_once_with("uuid-1", ObjectWrite(name="Renamed"), None)
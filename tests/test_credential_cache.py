@@ -0,0 +1,85 @@
+"""
+Test to verify the two-tier (process + Redis) storage credential cache.
+"""
+import json
+import time
+import pytest
+from unittest.mock import Mock, patch
+import services.credential_service as credential_service
+from services.credential_service import (
+    read_cache_credential, write_cache_credential, handle_invalidation, local_credentials, PROCESS_ID
+)
+
+CREDENTIAL = {"s3": {"endpoint": "http://minio:9000", "access_key": "a", "secret_key": "s"}}
+
+
+@pytest.fixture
+def mock_redis():
+    redis = Mock()
+    pipeline = Mock()
+    redis.pipeline.return_value = pipeline
+    local_credentials.clear()
+    with patch.object(credential_service, "r", redis):
+        yield redis, pipeline
+    local_credentials.clear()
+
+
+def test_local_hit_does_no_network_io(mock_redis):
+    """Test that a credential already resolved by the process skips Redis"""
+    redis, _ = mock_redis
+    local_credentials.set("licence-1", (CREDENTIAL, time.time() + 600))
+
+    assert read_cache_credential("licence-1") == CREDENTIAL
+    redis.pipeline.assert_not_called()
+    redis.get.assert_not_called()
+
+
+def test_redis_hit_is_decoded_and_kept_locally(mock_redis):
+    """Test that a Redis hit is decoded from JSON and stored in the local tier"""
+    redis, pipeline = mock_redis
+    pipeline.execute.return_value = [json.dumps(CREDENTIAL).encode(), 120]
+
+    assert read_cache_credential("licence-1") == CREDENTIAL
+    assert read_cache_credential("licence-1") == CREDENTIAL
+    assert pipeline.execute.call_count == 1
+
+
+def test_legacy_entry_is_discarded_not_evaluated(mock_redis):
+    """Test that a str(dict) entry is never evaluated and is deleted instead"""
+    redis, pipeline = mock_redis
+    pipeline.execute.return_value = [str(CREDENTIAL).encode(), 120]
+
+    assert read_cache_credential("licence-1") is None
+    redis.delete.assert_called_once_with("licence-1_storage")
+
+
+def test_write_stores_json_with_ttl_and_publishes(mock_redis):
+    """Test that writes use JSON with an explicit TTL and notify other workers"""
+    redis, _ = mock_redis
+
+    write_cache_credential("licence-1", CREDENTIAL)
+
+    key, payload = redis.set.call_args[0]
+    assert key == "licence-1_storage"
+    assert json.loads(payload) == CREDENTIAL
+    assert redis.set.call_args.kwargs["ex"] == credential_service.CREDENTIAL_CACHE_TTL
+    redis.publish.assert_called_once()
+    assert local_credentials.get("licence-1")[0] == CREDENTIAL
+
+
+def test_invalidation_from_other_worker_drops_local_copy(mock_redis):
+    """Test that an invalidation message from another process evicts the local entry"""
+    local_credentials.set("licence-1", (CREDENTIAL, time.time() + 600))
+
+    handle_invalidation({"data": json.dumps({"licence": "licence-1", "origin": "other-worker"}).encode()})
+
+    assert local_credentials.get("licence-1") is None
+
+
+def test_own_invalidation_is_ignored(mock_redis):
+    """Test that a process does not evict the entry it just wrote"""
+    local_credentials.set("licence-1", (CREDENTIAL, time.time() + 600))
+
+    handle_invalidation({"data": json.dumps({"licence": "licence-1", "origin": PROCESS_ID})})
+
+    assert local_credentials.get("licence-1")[0] == CREDENTIAL
@@ -0,0 +1,121 @@
+"""
+Test to verify refresh-ahead and single-flight fetching of storage credentials.
+"""
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import Mock, patch
+import services.credential_service as credential_service
+from services.credential_service import get_credential, local_credentials
+
+CREDENTIAL = {"s3": {"endpoint": "http://minio:9000"}}
+FRESH_CREDENTIAL = {"s3": {"endpoint": "http://minio:9000", "rotated": True}}
+
+
+@pytest.fixture
+def mock_redis():
+    redis = Mock()
+    pipeline = Mock()
+    pipeline.execute.return_value = [None, -2]
+    redis.pipeline.return_value = pipeline
+    redis.lock.return_value.acquire.return_value = True
+    local_credentials.clear()
+    credential_service._inflight.clear()
+    with patch.object(credential_service, "r", redis):
+        yield redis
+    local_credentials.clear()
+    credential_service._inflight.clear()
+
+
+def slow_gateway(result, calls):
+    async def fetch(token, licence):
+        calls.append(licence)
+        await asyncio.sleep(0.01)
+        return result
+    return fetch
+
+
+def test_concurrent_misses_share_one_gateway_fetch(mock_redis):
+    """Test that concurrent misses for one licence cause a single gateway call"""
+    calls = []
+
+    async def scenario():
+        return await asyncio.gather(*[get_credential("token", "licence-1") for _ in range(10)])
+
+    with patch.object(credential_service, "fetch_credential", slow_gateway(CREDENTIAL, calls)):
+        results = asyncio.run(scenario())
+
+    assert calls == ["licence-1"]
+    assert all(result == CREDENTIAL for result in results)
+    mock_redis.lock.return_value.release.assert_called_once()
+
+
+def test_entry_close_to_expiry_is_served_and_refreshed(mock_redis):
+    """Test that a nearly expired entry keeps serving while it is refreshed in the background"""
+    calls = []
+    local_credentials.set("licence-1", (CREDENTIAL, time.time() + 1))
+
+    async def scenario():
+        served = await get_credential("token", "licence-1")
+        await asyncio.sleep(0.05)
+        return served
+
+    with patch.object(credential_service, "fetch_credential", slow_gateway(FRESH_CREDENTIAL, calls)):
+        served = asyncio.run(scenario())
+
+    assert served == CREDENTIAL
+    assert calls == ["licence-1"]
+    assert local_credentials.get("licence-1")[0] == FRESH_CREDENTIAL
+
+
+def test_refresh_skipped_when_other_worker_holds_lock(mock_redis):
+    """Test that only the worker holding the Redis lock refreshes a licence"""
+    calls = []
+    mock_redis.lock.return_value.acquire.return_value = False
+    local_credentials.set("licence-1", (CREDENTIAL, time.time() + 1))
+
+    async def scenario():
+        served = await get_credential("token", "licence-1")
+        await asyncio.sleep(0.05)
+        return served
+
+    with patch.object(credential_service, "fetch_credential", slow_gateway(FRESH_CREDENTIAL, calls)):
+        served = asyncio.run(scenario())
+
+    assert served == CREDENTIAL
+    assert calls == []
+
+
+def test_miss_waits_for_other_worker_instead_of_fetching(mock_redis):
+    """Test that a miss behind another worker's lock reads the value that worker stores"""
+    calls = []
+    mock_redis.lock.return_value.acquire.return_value = False
+    pipeline = mock_redis.pipeline.return_value
+    pipeline.execute.side_effect = [[None, -2], [None, -2], [b'{"s3": {"endpoint": "http://minio:9000"}}', 1800]]
+
+    with patch.object(credential_service, "fetch_credential", slow_gateway(FRESH_CREDENTIAL, calls)):
+        credential = asyncio.run(get_credential("token", "licence-1"))
+
+    assert credential == CREDENTIAL
+    assert calls == []
+
+
+def test_redis_calls_of_a_miss_run_off_the_event_loop(mock_redis):
+    """Test that the Redis read, lock, write and release of a miss never block the event loop"""
+    loop_thread = threading.get_ident()
+    threads = []
+
+    def record(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return True
+
+    mock_redis.pipeline.return_value.execute.side_effect = lambda: record() and [None, -2]
+    mock_redis.lock.return_value.acquire.side_effect = record
+    mock_redis.lock.return_value.release.side_effect = record
+    mock_redis.set.side_effect = record
+
+    with patch.object(credential_service, "fetch_credential", slow_gateway(CREDENTIAL, [])):
+        assert asyncio.run(get_credential("token", "licence-1")) == CREDENTIAL
+
+    assert len(threads) == 4 and loop_thread not in threads
@@ -0,0 +1,159 @@
+"""
+Test to verify that identical uploads share one reference-counted blob.
+"""
+import asyncio
+import hashlib
+import io
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from fastapi import HTTPException
+from models.object_model import ObjectWrite
+from repositories.storage_repository_s3 import blob_key, blob_digest, hash_fileobj
+from services.storage_service import create_object, delete_object, store_blob
+
+CONTENT = b"repetitive attachment"
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+BLOB_PATH = f"s3://bucket/{blob_key(DIGEST, 'gen-1')}"
+
+
+def upload_file():
+    file = Mock()
+    file.filename = "report.pdf"
+    file.content_type = "application/pdf"
+    file.file = io.BytesIO(CONTENT)
+    return file
+
+
+def create_bucket_repo():
+    bucket_repo = AsyncMock()
+    bucket_repo.bucket_name = "bucket"
+    bucket_repo.hash_upload_file_async.side_effect = lambda file: hash_fileobj(file.file)
+    bucket_repo.file_exists_async.return_value = True
+    return bucket_repo
+
+
+def test_blob_paths_carry_their_digest():
+    """Test that the digest is recovered from blob paths and regular uploads are told apart"""
+    assert blob_digest(BLOB_PATH) == DIGEST
+    assert blob_digest("s3://bucket/uuid-1.pdf") is None
+    assert hash_fileobj(io.BytesIO(CONTENT)) == (DIGEST, len(CONTENT))
+
+
+def test_first_upload_stores_the_blob():
+    """Test that a new hash registers the blob and uploads it under its content key"""
+    storage_repo = AsyncMock()
+    storage_repo.acquire_blob.side_effect = lambda digest, file_path, size, content_type: {"file_path": file_path}
+    bucket_repo = create_bucket_repo()
+
+    file_path = asyncio.run(store_blob(storage_repo, bucket_repo, upload_file()))
+
+    assert blob_digest(file_path) == DIGEST
+    key = bucket_repo.upload_blob_async.await_args.args[1]
+    assert file_path == f"s3://bucket/{key}"
+    storage_repo.mark_blob_ready.assert_awaited_once_with(DIGEST, file_path)
+
+
+def test_duplicate_upload_is_skipped():
+    """Test that a hash already stored only takes a reference"""
+    storage_repo = AsyncMock()
+    storage_repo.acquire_blob.return_value = {"file_path": BLOB_PATH, "refcount": 2}
+    bucket_repo = create_bucket_repo()
+
+    assert asyncio.run(store_blob(storage_repo, bucket_repo, upload_file())) == BLOB_PATH
+    bucket_repo.upload_blob_async.assert_not_called()
+
+
+def test_unfinished_blob_is_uploaded_again():
+    """Test that a duplicate of a blob whose first upload never landed uploads it to the same key"""
+    storage_repo = AsyncMock()
+    storage_repo.acquire_blob.return_value = {"file_path": BLOB_PATH, "refcount": 1, "ready": False}
+    bucket_repo = create_bucket_repo()
+    bucket_repo.file_exists_async.return_value = False
+
+    assert asyncio.run(store_blob(storage_repo, bucket_repo, upload_file())) == BLOB_PATH
+    assert bucket_repo.upload_blob_async.await_args.args[1] == blob_key(DIGEST, "gen-1")
+    storage_repo.mark_blob_ready.assert_awaited_once_with(DIGEST, BLOB_PATH)
+
+
+def test_unfinished_blob_found_in_bucket_is_marked_ready():
+    """Test that a blob not yet marked ready is reused without an upload once a HEAD finds it"""
+    storage_repo = AsyncMock()
+    storage_repo.acquire_blob.return_value = {"file_path": BLOB_PATH, "refcount": 2, "ready": False}
+    bucket_repo = create_bucket_repo()
+
+    assert asyncio.run(store_blob(storage_repo, bucket_repo, upload_file())) == BLOB_PATH
+    bucket_repo.upload_blob_async.assert_not_called()
+    storage_repo.mark_blob_ready.assert_awaited_once_with(DIGEST, BLOB_PATH)
+
+
+def test_failed_upload_releases_the_reference():
+    """Test that a blob entry created for an upload that failed is released"""
+    storage_repo = AsyncMock()
+    storage_repo.acquire_blob.side_effect = lambda digest, file_path, size, content_type: {"file_path": file_path}
+    bucket_repo = create_bucket_repo()
+    bucket_repo.upload_blob_async.side_effect = ValueError("S3 unavailable")
+
+    with pytest.raises(ValueError):
+        asyncio.run(store_blob(storage_repo, bucket_repo, upload_file()))
+
+    storage_repo.release_blob.assert_awaited_once_with(DIGEST)
+
+
+def test_client_hash_references_existing_blob_without_file():
+    """Test that a known client-supplied hash skips the upload after a HEAD check"""
+    storage_repo = AsyncMock()
+    storage_repo.reference_blob.return_value = {"file_path": BLOB_PATH, "refcount": 3}
+    bucket_repo = create_bucket_repo()
+
+    assert asyncio.run(store_blob(storage_repo, bucket_repo, None, DIGEST)) == BLOB_PATH
+    bucket_repo.file_exists_async.assert_awaited_once_with(BLOB_PATH)
+    bucket_repo.hash_upload_file_async.assert_not_called()
+
+
+def test_client_hash_of_missing_blob_is_rejected():
+    """Test that a hash whose blob vanished from the bucket is released and refused"""
+    storage_repo = AsyncMock()
+    storage_repo.reference_blob.return_value = {"file_path": BLOB_PATH, "refcount": 1}
+    bucket_repo = create_bucket_repo()
+    bucket_repo.file_exists_async.return_value = False
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(store_blob(storage_repo, bucket_repo, None, DIGEST))
+
+    assert exc_info.value.status_code == 404
+    storage_repo.release_blob.assert_awaited_once_with(DIGEST)
+
+
+@patch('services.storage_service.STORAGE_DEDUP', True)
+@patch('services.storage_service.get_state_stores')
+@patch('services.storage_service.get_state_repos')
+def test_create_with_dedup_records_blob_path(mock_get_repos, mock_get_stores):
+    """Test that create_object stores the shared blob path on the document"""
+    storage_repo = AsyncMock()
+    storage_repo.acquire_blob.return_value = {"file_path": BLOB_PATH, "refcount": 2}
+    mock_get_repos.return_value.storage_repo = storage_repo
+    mock_get_stores.return_value.resolve = AsyncMock(return_value=Mock(storage_bucket_repo=create_bucket_repo()))
+
+    asyncio.run(create_object(Mock(), ObjectWrite(name="Report"), upload_file()))
+
+    assert storage_repo.create_object_with_file.await_args.args[0]["file_path"] == BLOB_PATH
+
+
+@patch('services.storage_service.enqueue_file_cleanup')
+@patch('services.storage_service.get_state_stores')
+@patch('services.storage_service.get_state_repos')
+def test_delete_queues_blob_only_at_zero_references(mock_get_repos, mock_get_stores, mock_enqueue):
+    """Test that deleting a deduplicated object only removes the blob once nothing references it"""
+    storage_repo = AsyncMock()
+    storage_repo.delete_object.return_value = {"_id": "uuid-1", "file_path": BLOB_PATH}
+    storage_repo.release_blob.side_effect = [None, BLOB_PATH]
+    mock_get_repos.return_value.storage_repo = storage_repo
+    request = Mock()
+    request.state.licence_uuid = "licence-1"
+
+    asyncio.run(delete_object(request, "uuid-1"))
+    mock_enqueue.assert_not_called()
+
+    asyncio.run(delete_object(request, "uuid-2"))
+    mock_enqueue.assert_called_once_with("licence-1", BLOB_PATH, "uuid-2")
+    storage_repo.release_blob.assert_awaited_with(DIGEST, 1)
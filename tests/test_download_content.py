@@ -0,0 +1,92 @@
+"""
+Test to verify that object content is streamed from the bucket with Range support.
+"""
+import asyncio
+import io
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from botocore.exceptions import ClientError
+from fastapi import HTTPException
+from interfaces.storage_bucket_interface import InvalidRangeError
+from repositories.storage_repository_s3 import StorageRepositoryS3, known_buckets
+from services.storage_service import get_object_content
+
+
+def create_bucket_repo():
+    """Create an S3 repository with a mocked boto3 client"""
+    repo = StorageRepositoryS3.__new__(StorageRepositoryS3)
+    repo.credentials = {"endpoint": "http://minio:9000", "bucket_name": "test-bucket"}
+    repo.bucket_name = "test-bucket"
+    repo.tenant_key = "tenant"
+    repo.client = Mock()
+    return repo
+
+
+@pytest.fixture(autouse=True)
+def clear_known_buckets():
+    known_buckets.clear()
+    yield
+    known_buckets.clear()
+
+
+def test_get_file_stream_forwards_range():
+    """Test that the Range header is forwarded to a ranged S3 GET"""
+    repo = create_bucket_repo()
+
+    repo.get_file_stream("s3://test-bucket/file.mp4", "bytes=0-99")
+
+    repo.client.get_object.assert_called_once_with(Bucket="test-bucket", Key="file.mp4", Range="bytes=0-99")
+
+
+def test_get_file_stream_maps_invalid_range():
+    """Test that an unsatisfiable range is reported as InvalidRangeError"""
+    repo = create_bucket_repo()
+    repo.client.get_object.side_effect = ClientError({"Error": {"Code": "InvalidRange"}}, "GetObject")
+
+    with pytest.raises(InvalidRangeError):
+        repo.get_file_stream("s3://test-bucket/file.mp4", "bytes=500-")
+
+
+def test_iter_file_stream_yields_chunks_and_closes_body():
+    """Test that the body is read in chunks and closed once exhausted"""
+    repo = create_bucket_repo()
+    body = Mock(wraps=io.BytesIO(b"abcdefghij"))
+
+    async def collect():
+        return [chunk async for chunk in repo.iter_file_stream(body, chunk_size=4)]
+
+    assert asyncio.run(collect()) == [b"abcd", b"efgh", b"ij"]
+    body.close.assert_called_once()
+
+
+@patch('services.storage_service.get_state_stores')
+@patch('services.storage_service.get_state_repos')
+def test_get_object_content_without_file_raises_404(mock_get_repos, mock_get_stores):
+    """Test that an object without file_path has no content"""
+    mock_get_repos.return_value.storage_repo = AsyncMock()
+    mock_get_repos.return_value.storage_repo.get_object.return_value = {"uuid": "test-uuid", "name": "No file"}
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(get_object_content(Mock(), "test-uuid"))
+
+    assert exc_info.value.status_code == 404
+    mock_get_stores.assert_not_called()
+
+
+@patch('services.storage_service.get_state_stores')
+@patch('services.storage_service.get_state_repos')
+def test_get_object_content_invalid_range_raises_416(mock_get_repos, mock_get_stores):
+    """Test that an unsatisfiable range becomes a 416"""
+    mock_get_repos.return_value.storage_repo = AsyncMock()
+    mock_get_repos.return_value.storage_repo.get_object.return_value = {
+        "uuid": "test-uuid", "name": "Video", "file_path": "s3://test-bucket/test-uuid.mp4"
+    }
+    mock_get_stores.return_value.resolve = AsyncMock(return_value=mock_get_stores.return_value)
+    mock_get_stores.return_value.storage_bucket_repo = Mock()
+    mock_get_stores.return_value.storage_bucket_repo.get_file_stream_async = AsyncMock(
+        side_effect=InvalidRangeError("bad range"))
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(get_object_content(Mock(), "test-uuid", "bytes=999-"))
+
+    assert exc_info.value.status_code == 416
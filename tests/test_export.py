@@ -0,0 +1,111 @@
+"""
+Test to verify that the NDJSON export streams objects batch by batch, resumes and compresses.
+"""
+import asyncio
+import gzip
+import zlib
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from fastapi import HTTPException
+from repositories.object_query import OBJECT_READ_PROJECTION
+from repositories.storage_repository_mongo_async import StorageRepositoryMongoAsync
+from services.storage_service import export_objects
+from utils.ndjson import accepts_gzip
+
+
+class FakeCursor:
+    """Async cursor over documents that records how it was configured"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.sort = Mock(return_value=self)
+        self.batch_size = Mock(return_value=self)
+        self.close = AsyncMock()
+
+    async def __aiter__(self):
+        for document in self.documents:
+            yield document
+
+
+def create_repo(count):
+    cursor = FakeCursor([{"_id": f"uuid-{i}", "name": f"Object {i}"} for i in range(count)])
+    collection = Mock()
+    collection.find.return_value = cursor
+    repo = StorageRepositoryMongoAsync.__new__(StorageRepositoryMongoAsync)
+    repo.db = {"objects": collection}
+    repo.collection = "objects"
+    return repo, collection, cursor
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+async def collect_export(request, **kwargs):
+    return await collect(await export_objects(request, **kwargs))
+
+
+def test_objects_are_read_in_bounded_batches():
+    """Test that the cursor is projected, sorted, batched and resumed after the given uuid"""
+    repo, collection, cursor = create_repo(5)
+
+    async def run():
+        return [batch async for batch in repo.iter_objects(resume_after="uuid-0", batch_size=2)]
+
+    batches = asyncio.run(run())
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    collection.find.assert_called_once_with({"_id": {"$gt": "uuid-0"}}, OBJECT_READ_PROJECTION)
+    cursor.batch_size.assert_called_once_with(2)
+    cursor.close.assert_awaited_once()
+
+
+@patch('services.storage_service.get_state_repos')
+def test_export_streams_ndjson(mock_get_repos):
+    """Test that each batch becomes one chunk of newline-delimited JSON"""
+    repo, _, _ = create_repo(3)
+    mock_get_repos.return_value.storage_repo = repo
+
+    with patch('services.storage_service.EXPORT_BATCH_SIZE', 2):
+        chunks = asyncio.run(collect_export(Mock()))
+
+    assert len(chunks) == 2
+    lines = b"".join(chunks).decode().splitlines()
+    assert lines[0].startswith('{"uuid":"uuid-0","name":"Object 0"')
+    assert len(lines) == 3
+
+
+@patch('services.storage_service.get_state_repos')
+def test_gzip_export_decodes_after_every_chunk(mock_get_repos):
+    """Test that the gzip stream is flushed per batch so partial downloads stay readable"""
+    repo, _, _ = create_repo(3)
+    mock_get_repos.return_value.storage_repo = repo
+
+    with patch('services.storage_service.EXPORT_BATCH_SIZE', 2):
+        chunks = asyncio.run(collect_export(Mock(), gzip=True))
+
+    assert zlib.decompressobj(31).decompress(chunks[0]).count(b"\n") == 2
+    assert gzip.decompress(b"".join(chunks)).count(b"\n") == 3
+
+
+@patch('services.storage_service.get_state_repos')
+def test_export_failure_before_first_byte_is_an_error(mock_get_repos):
+    """Test that a database error on the first batch is reported as a 500"""
+    async def failing(**kwargs):
+        raise ConnectionError("mongo down")
+        yield
+
+    mock_get_repos.return_value.storage_repo.iter_objects = failing
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(export_objects(Mock()))
+    assert exc_info.value.status_code == 500
+
+
+def test_accept_encoding_negotiation():
+    """Test that gzip is only used when the client accepts it"""
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("br;q=1.0, gzip;q=0.5")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("identity")
+    assert not accepts_gzip(None)
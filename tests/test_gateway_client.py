@@ -0,0 +1,105 @@
+"""
+Test to verify that credentials are fetched from the gateway asynchronously with retries.
+"""
+import asyncio
+import httpx
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi import HTTPException
+import services.credential_service as credential_service
+from config.config import CREDENTIAL_LOCK_TTL, GATEWAY_FETCH_BUDGET, GATEWAY_RETRIES, GATEWAY_ATTEMPT_TIMEOUT
+from services.credential_service import fetch_credential, get_gateway_client
+
+
+def gateway_returning(*statuses):
+    """Create a gateway client whose responses follow the given status codes"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        status = statuses[min(len(calls), len(statuses)) - 1]
+        if status == "error":
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(status, json={"s3": {"endpoint": "http://minio:9000"}})
+
+    client = httpx.AsyncClient(base_url="http://gateway", transport=httpx.MockTransport(handler))
+    return client, calls
+
+
+@pytest.fixture(autouse=True)
+def no_backoff():
+    with patch.object(credential_service.asyncio, "sleep", AsyncMock()) as mock_sleep:
+        yield mock_sleep
+
+
+def test_fetch_credential_sends_token_and_licence():
+    """Test that the gateway call carries the caller's token and licence"""
+    client, calls = gateway_returning(200)
+
+    with patch.object(credential_service, "get_gateway_client", return_value=client):
+        credential = asyncio.run(fetch_credential("token-1", "licence-1"))
+
+    assert credential == {"s3": {"endpoint": "http://minio:9000"}}
+    assert calls[0].url.path == "/credential/v1/storage"
+    assert calls[0].headers["Authorization"] == "Bearer token-1"
+    assert calls[0].headers["X-License-Key"] == "licence-1"
+
+
+def test_fetch_credential_retries_transient_failures(no_backoff):
+    """Test that connection errors and 5xx responses are retried with backoff"""
+    client, calls = gateway_returning("error", 503, 200)
+
+    with patch.object(credential_service, "get_gateway_client", return_value=client), \
+            patch.object(credential_service, "GATEWAY_RETRIES", 2):
+        credential = asyncio.run(fetch_credential("token-1", "licence-1"))
+
+    assert credential["s3"]["endpoint"] == "http://minio:9000"
+    assert len(calls) == 3
+    assert no_backoff.await_count == 2
+
+
+def test_fetch_credential_does_not_retry_client_errors():
+    """Test that a 403 fails immediately"""
+    client, calls = gateway_returning(403)
+
+    with patch.object(credential_service, "get_gateway_client", return_value=client), \
+            pytest.raises(HTTPException) as exc_info:
+        asyncio.run(fetch_credential("token-1", "licence-1"))
+
+    assert exc_info.value.status_code == 500
+    assert len(calls) == 1
+
+
+def test_slow_attempt_is_cut_off_and_retried():
+    """Test that an attempt outliving GATEWAY_ATTEMPT_TIMEOUT is abandoned and retried"""
+    client, calls = gateway_returning(200)
+    hang = asyncio.Event()
+
+    async def get(url, headers):
+        calls.append(url)
+        if len(calls) == 1:
+            await hang.wait()
+        return httpx.Response(200, json={"s3": {}})
+
+    client.get = get
+    with patch.object(credential_service, "get_gateway_client", return_value=client), \
+            patch.object(credential_service, "GATEWAY_ATTEMPT_TIMEOUT", 0.01):
+        assert asyncio.run(fetch_credential("token-1", "licence-1")) == {"s3": {}}
+
+    assert len(calls) == 2
+
+
+def test_fetch_lock_outlives_the_slowest_fetch():
+    """Test that the lock TTL covers every attempt timing out plus the largest backoffs"""
+    assert GATEWAY_FETCH_BUDGET >= (GATEWAY_RETRIES + 1) * GATEWAY_ATTEMPT_TIMEOUT
+    assert CREDENTIAL_LOCK_TTL > GATEWAY_FETCH_BUDGET
+
+
+def test_gateway_client_is_shared():
+    """Test that every call reuses the same pooled client"""
+    first = get_gateway_client()
+
+    assert get_gateway_client() is first
+    asyncio.run(credential_service.close_gateway_client())
+    assert get_gateway_client() is not first
+    asyncio.run(credential_service.close_gateway_client())
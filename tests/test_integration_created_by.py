@@ -1,9 +1,10 @@
 """
 Integration test to verify that created_by field is immutable through the complete flow.
 """
+import asyncio
 import pytest
-from unittest.mock import Mock, MagicMock
-from repositories.storage_repository_mongo import StorageRepositoryMongo
+from unittest.mock import Mock, MagicMock, AsyncMock
+from repositories.storage_repository_mongo_async import StorageRepositoryMongoAsync
 from services.storage_service import create_object, update_object, get_object
 from models.object_model import ObjectWrite
 from fastapi import Request
@@ -20,7 +21,7 @@ def create_mock_repo():
     """Create a mock repository for testing"""
     mock_client = Mock()
     mock_db = Mock()
-    mock_collection = Mock()
+    mock_collection = AsyncMock()
     
     # Mock successful insert and update operations
     mock_collection.insert_one.return_value = Mock(inserted_id="test-uuid-123")
@@ -30,13 +31,13 @@ def create_mock_repo():
         "description": "Test Description",
         "created_by": "original-creator-uuid"
     }
-    mock_collection.find_one_and_update.return_value = None  # Update doesn't return data
+    mock_collection.find_one_and_update.return_value = {"_id": "test-uuid-123", "version": 2}  # Update returns the new version
     
     mock_client.__getitem__ = Mock(return_value=mock_db)
     mock_db.__getitem__ = Mock(return_value=mock_collection)
     
     # Create repository instance with mocked dependencies
-    repo = StorageRepositoryMongo.__new__(StorageRepositoryMongo)
+    repo = StorageRepositoryMongoAsync.__new__(StorageRepositoryMongoAsync)
     repo.uri = "mongodb://localhost:27017/test"
     repo.client = mock_client
     repo.db = mock_db
@@ -66,7 +67,7 @@ def test_integration_created_by_immutable():
     )
     
     # This would be called by the POST endpoint
-    new_uuid = create_object(request, create_obj)
+    new_uuid = asyncio.run(create_object(request, create_obj))
     
     # Verify creation includes created_by
     mock_collection.insert_one.assert_called_once()
@@ -81,7 +82,7 @@ def test_integration_created_by_immutable():
     )
     
     # This would be called by the PUT endpoint
-    update_object(request, "test-uuid-123", update_obj)
+    asyncio.run(update_object(request, "test-uuid-123", update_obj))
     
     # Verify that the update was called
     mock_collection.find_one_and_update.assert_called_once()
@@ -118,7 +119,7 @@ def test_created_by_preserved_when_none_in_update():
     )
     
     # Call update_object directly
-    repo.update_object("test-uuid", update_obj)
+    asyncio.run(repo.update_object("test-uuid", update_obj))
     
     # Verify that the update was called
     mock_collection.find_one_and_update.assert_called_once()
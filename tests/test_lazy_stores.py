@@ -0,0 +1,59 @@
+"""
+Test to verify that bucket repositories are only resolved by operations that touch files.
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from models.object_model import ObjectWrite
+from repositories import LazyBucketRepositories
+from services.storage_service import create_object, delete_object
+
+
+def test_lazy_stores_resolve_once():
+    """Test that concurrent resolutions share one credential lookup"""
+    stores = Mock()
+    resolver = AsyncMock(return_value=stores)
+    lazy = LazyBucketRepositories(resolver)
+
+    async def scenario():
+        return await asyncio.gather(lazy.resolve(), lazy.resolve(), lazy.resolve())
+
+    assert asyncio.run(scenario()) == [stores, stores, stores]
+    resolver.assert_awaited_once()
+
+
+def test_lazy_stores_not_resolved_until_used():
+    """Test that building the handle does not resolve anything"""
+    resolver = AsyncMock()
+    LazyBucketRepositories(resolver)
+
+    resolver.assert_not_called()
+
+
+@patch('services.storage_service.get_state_stores')
+@patch('services.storage_service.get_state_repos')
+def test_create_without_file_does_not_resolve_stores(mock_get_repos, mock_get_stores):
+    """Test that a metadata-only create never resolves credentials"""
+    mock_get_repos.return_value.storage_repo = AsyncMock()
+    resolver = AsyncMock()
+    mock_get_stores.return_value = LazyBucketRepositories(resolver)
+
+    asyncio.run(create_object(Mock(), ObjectWrite(name="No file")))
+
+    resolver.assert_not_called()
+    mock_get_repos.return_value.storage_repo.create_object_with_file.assert_awaited_once()
+
+
+@patch('services.storage_service.get_state_stores')
+@patch('services.storage_service.get_state_repos')
+def test_delete_without_file_does_not_resolve_stores(mock_get_repos, mock_get_stores):
+    """Test that deleting an object without file never resolves credentials"""
+    mock_get_repos.return_value.storage_repo = AsyncMock()
+    mock_get_repos.return_value.storage_repo.delete_object.return_value = {"_id": "test-uuid"}
+    resolver = AsyncMock()
+    mock_get_stores.return_value = LazyBucketRepositories(resolver)
+
+    asyncio.run(delete_object(Mock(), "test-uuid"))
+
+    resolver.assert_not_called()
+    mock_get_repos.return_value.storage_repo.delete_object.assert_awaited_once_with("test-uuid")
@@ -0,0 +1,112 @@
+"""
+Test to verify keyset pagination, filtering and projection of the object listing.
+"""
+import asyncio
+from datetime import datetime
+import orjson
+import pytest
+from unittest.mock import Mock, AsyncMock
+from repositories.object_query import build_filter, build_projection, decode_cursor, encode_cursor, \
+    OBJECT_READ_PROJECTION
+from models.object_model import ObjectRead
+from repositories.storage_repository_mongo_async import StorageRepositoryMongoAsync
+from schemas.object_schema import list_object_serial
+
+
+def create_mock_repo(documents):
+    """Create an async repository whose find() cursor returns the given documents"""
+    cursor = Mock()
+    cursor.sort.return_value = cursor
+    cursor.limit.return_value = cursor
+    cursor.to_list = AsyncMock(return_value=documents)
+    mock_collection = Mock()
+    mock_collection.find.return_value = cursor
+    mock_collection.create_indexes = AsyncMock()
+    mock_db = Mock()
+    mock_db.__getitem__ = Mock(return_value=mock_collection)
+
+    repo = StorageRepositoryMongoAsync.__new__(StorageRepositoryMongoAsync)
+    repo.uri = "mongodb://localhost:27017/test"
+    repo.db = mock_db
+    repo.collection = "objects"
+    return repo, mock_collection, cursor
+
+
+def test_cursor_round_trip():
+    """Test that a cursor decodes to the _id it was built from"""
+    assert decode_cursor(encode_cursor("uuid-42")) == "uuid-42"
+
+
+def test_invalid_cursor_raises_value_error():
+    """Test that a tampered cursor is rejected"""
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_build_filter_combines_cursor_and_filters():
+    """Test that filters are pushed down to Mongo alongside the keyset condition"""
+    query = build_filter(cursor=encode_cursor("uuid-1"), created_by="user-1", name_prefix="a.b", has_file=True)
+
+    assert query == {
+        "_id": {"$gt": "uuid-1"},
+        "created_by": "user-1",
+        "name": {"$regex": "^a\\.b"},
+        "file_path": {"$nin": [None, ""]}
+    }
+
+
+def test_build_projection_always_keeps_required_fields():
+    """Test that projections keep the fields ObjectRead requires"""
+    assert build_projection(["file_path"]) == {"_id": 1, "name": 1, "file_path": 1}
+    assert build_projection(None) is None
+    with pytest.raises(ValueError):
+        build_projection(["password"])
+
+
+def test_list_objects_returns_next_cursor_when_more_documents():
+    """Test that one look-ahead document produces a cursor and is not returned"""
+    documents = [{"_id": f"uuid-{i}", "name": f"Object {i}"} for i in range(3)]
+    repo, mock_collection, cursor = create_mock_repo(documents)
+
+    objects, next_cursor = asyncio.run(repo.list_objects(limit=2, filters={"created_by": "user-1"}))
+
+    mock_collection.find.assert_called_once_with({"created_by": "user-1"}, OBJECT_READ_PROJECTION)
+    cursor.sort.assert_called_once_with("_id", 1)
+    cursor.limit.assert_called_once_with(3)
+    assert [item["uuid"] for item in objects] == ["uuid-0", "uuid-1"]
+    assert decode_cursor(next_cursor) == "uuid-1"
+
+
+def test_list_objects_last_page_has_no_cursor():
+    """Test that the last page does not return a cursor"""
+    repo, _, _ = create_mock_repo([{"_id": "uuid-0", "name": "Object 0"}])
+
+    objects, next_cursor = asyncio.run(repo.list_objects(limit=2))
+
+    assert len(objects) == 1
+    assert next_cursor is None
+
+
+def test_serialised_objects_match_object_read():
+    """Test that repository output encodes to the same JSON the response model would produce"""
+    documents = [
+        {"_id": "uuid-0", "name": "Object 0", "file_path": "s3://bucket/a", "version": 3,
+         "updated_at": datetime(2026, 1, 1, 12, 30, 0, 123000), "pending_upload": {"file_path": "s3://bucket/b"}},
+        {"_id": "uuid-1", "name": "Object 1", "description": "Legacy document"},
+    ]
+
+    objects = list_object_serial(documents)
+
+    expected = [ObjectRead.model_validate(object).model_dump(mode="json") for object in objects]
+    assert orjson.loads(orjson.dumps(objects)) == expected
+    assert set(OBJECT_READ_PROJECTION) == {"_id"} | set(ObjectRead.model_fields) - {"uuid"}
+
+
+def test_projected_listing_returns_only_requested_fields():
+    """Test that a listing with fields returns uuid and those fields, not the whole ObjectRead shape"""
+    repo, mock_collection, _ = create_mock_repo([{"_id": "uuid-0", "name": "Object 0", "file_path": "s3://bucket/a"}])
+
+    objects, _ = asyncio.run(repo.list_objects(limit=2, fields=["file_path"]))
+
+    mock_collection.find.assert_called_once_with({}, {"_id": 1, "name": 1, "file_path": 1})
+    assert objects == [{"uuid": "uuid-0", "file_path": "s3://bucket/a"}]
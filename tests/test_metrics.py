@@ -0,0 +1,92 @@
+"""
+Test to verify per-stage Prometheus metrics, their tenant class labels and the Server-Timing header.
+"""
+import asyncio
+import boto3
+from unittest.mock import patch
+from botocore.stub import Stubber
+from prometheus_client import REGISTRY
+from middlewares.metrics_middleware import MetricsMiddleware
+from routers.stats import api_read_metrics
+from utils.metrics import observe_stage, register_s3_timing, tenant_class_var, format_server_timing
+from utils.transfer_executor import TransferExecutor
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def run_request(app, state=None):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/storage/v1/", "headers": [], "state": state or {}}
+    asyncio.run(app(scope, receive, send))
+    return messages
+
+
+async def endpoint(scope, receive, send):
+    observe_stage("mongo.get_object", 0.002)
+    observe_stage("mongo.get_object", 0.001)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+@patch('utils.metrics.METRICS_TENANT_CLASSES', {"licence-1": "premium"})
+def test_stages_are_labelled_with_the_tenant_class():
+    """Test that stages observed during a request carry the class of the request's licence"""
+    before = sample("storage_stage_seconds_count", stage="mongo.get_object", tenant_class="premium")
+
+    run_request(MetricsMiddleware(endpoint, server_timing=False), {"licence_uuid": "licence-1"})
+
+    assert sample("storage_stage_seconds_count", stage="mongo.get_object", tenant_class="premium") == before + 2
+    assert sample("storage_stage_seconds_count", stage="request", tenant_class="premium") >= 1
+
+
+def test_server_timing_header_is_optional():
+    """Test that Server-Timing lists the summed stages and the total only when enabled"""
+    enabled = run_request(MetricsMiddleware(endpoint, server_timing=True))
+    disabled = run_request(MetricsMiddleware(endpoint, server_timing=False))
+
+    headers = dict(enabled[0]["headers"])
+    assert headers[b"server-timing"].startswith(b"mongo.get_object;dur=3.00, total;dur=")
+    assert b"server-timing" not in dict(disabled[0]["headers"])
+    assert format_server_timing([], 0.0125) == "total;dur=12.50"
+
+
+def test_transfer_jobs_keep_the_request_context():
+    """Test that blocking jobs see the tenant class of the request that queued them"""
+    executor = TransferExecutor(max_workers=1, per_tenant_limit=1)
+
+    async def run():
+        tenant_class_var.set("premium")
+        return await executor.run("tenant", tenant_class_var.get)
+
+    assert asyncio.run(run()) == "premium"
+    executor.shutdown()
+
+
+def test_s3_calls_are_timed_by_operation():
+    """Test that every boto3 call is observed under its operation name"""
+    client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="a", aws_secret_access_key="s")
+    register_s3_timing(client)
+    before = sample("storage_s3_operation_seconds_count", operation="HeadBucket", tenant_class="standard")
+
+    with Stubber(client) as stubber:
+        stubber.add_response("head_bucket", {}, {"Bucket": "bucket"})
+        client.head_bucket(Bucket="bucket")
+
+    assert sample("storage_s3_operation_seconds_count", operation="HeadBucket", tenant_class="standard") == before + 1
+
+
+def test_metrics_endpoint_exposes_prometheus_text():
+    """Test that /storage/metrics renders the registry in the Prometheus text format"""
+    response = asyncio.run(api_read_metrics())
+
+    assert response.media_type.startswith("text/plain")
+    assert b"storage_stage_seconds_bucket" in response.body
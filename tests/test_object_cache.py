@@ -0,0 +1,126 @@
+"""
+Test to verify the two-tier read-through cache of object metadata and its invalidation on writes.
+"""
+import asyncio
+import threading
+from datetime import datetime
+from unittest.mock import Mock, AsyncMock
+from bson import json_util
+from models.object_model import ObjectWrite
+from benchmarks.standins import InMemoryRedis
+from repositories.object_cache import ObjectCache, TOMBSTONE
+from repositories.storage_repository_mongo_async import StorageRepositoryMongoAsync
+
+DOCUMENT = {"_id": "uuid-1", "name": "Report", "version": 2, "updated_at": datetime(2026, 1, 1)}
+
+
+def create_repo(redis=None):
+    """Create an async repository with a mocked collection and a cache over a mocked Redis"""
+    collection = AsyncMock()
+    collection.find_one.return_value = dict(DOCUMENT)
+    redis = redis or Mock(get=Mock(return_value=None))
+    cache = ObjectCache(redis, ttl=300, negative_ttl=30, local_ttl=5, local_max_size=10, tombstone_ttl=10)
+    repo = StorageRepositoryMongoAsync.__new__(StorageRepositoryMongoAsync)
+    repo.db = {"objects": collection}
+    repo.collection = "objects"
+    repo.cache = cache.for_database("tenant")
+    return repo, collection, cache, redis
+
+
+def test_second_read_is_served_locally():
+    """Test that a miss is loaded from Mongo, written to both tiers and then served without I/O"""
+    repo, collection, cache, redis = create_repo()
+
+    first = asyncio.run(repo.get_object("uuid-1"))
+    second = asyncio.run(repo.get_object("uuid-1"))
+
+    assert first == second and second["version"] == 2
+    collection.find_one.assert_awaited_once()
+    redis.get.assert_called_once_with("tenant_object_uuid-1")
+    assert redis.set.call_args.kwargs["ex"] == 300
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["local_hits"] == 1
+
+
+def test_redis_hit_skips_mongo():
+    """Test that an object cached by another worker is decoded from Redis"""
+    redis = Mock(get=Mock(return_value=json_util.dumps({"uuid": "uuid-1", "updated_at": DOCUMENT["updated_at"]})))
+    repo, collection, cache, _ = create_repo(redis)
+
+    object = asyncio.run(repo.get_object("uuid-1"))
+
+    assert object["updated_at"] == DOCUMENT["updated_at"]
+    collection.find_one.assert_not_called()
+    assert cache.stats()["redis_hits"] == 1
+
+
+def test_missing_objects_are_cached_briefly():
+    """Test that repeated lookups of a missing object reach Mongo once"""
+    repo, collection, cache, redis = create_repo()
+    collection.find_one.return_value = None
+
+    assert asyncio.run(repo.get_object("missing")) is None
+    assert asyncio.run(repo.get_object("missing")) is None
+
+    collection.find_one.assert_awaited_once()
+    assert redis.set.call_args.kwargs["ex"] == 30
+    assert cache.stats()["negative_hits"] == 1
+
+
+def test_writes_invalidate_both_tiers():
+    """Test that update, delete and create drop the cached entry"""
+    repo, collection, cache, redis = create_repo()
+    collection.find_one_and_update.return_value = {"_id": "uuid-1", "version": 3}
+    collection.find_one_and_delete.return_value = {"_id": "uuid-1"}
+    collection.insert_one.return_value = Mock(inserted_id="uuid-1")
+    repo.ensure_indexes = Mock()
+
+    for write in (lambda: repo.update_object("uuid-1", ObjectWrite(name="Renamed")),
+                  lambda: repo.delete_object("uuid-1"),
+                  lambda: repo.create_object_with_file({"_id": "uuid-1", "name": "Report"})):
+        asyncio.run(repo.get_object("uuid-1"))
+        asyncio.run(write())
+        redis.pipeline.return_value.set.assert_called_with("tenant_object_uuid-1", TOMBSTONE, ex=10)
+        asyncio.run(repo.get_object("uuid-1"))
+
+    assert collection.find_one.await_count == 4
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_redis_failure_falls_back_to_mongo():
+    """Test that an unreachable Redis turns lookups into misses instead of errors"""
+    redis = Mock(get=Mock(side_effect=ConnectionError("down")), set=Mock(side_effect=ConnectionError("down")))
+    repo, collection, cache, _ = create_repo(redis)
+
+    assert asyncio.run(repo.get_object("uuid-1"))["name"] == "Report"
+    assert cache.stats()["errors"] == 2
+
+
+def test_read_racing_a_write_does_not_cache_the_old_object():
+    """Test that a miss whose load overlaps an invalidation leaves the stale document out of both tiers"""
+    repo, collection, cache, redis = create_repo(InMemoryRedis())
+
+    async def find_one_racing_update(query):
+        await repo.invalidate_cached("uuid-1")
+        return dict(DOCUMENT)
+
+    collection.find_one.side_effect = find_one_racing_update
+    asyncio.run(repo.get_object("uuid-1"))
+
+    assert redis.get("tenant_object_uuid-1") == TOMBSTONE.encode()
+    collection.find_one.side_effect = None
+    collection.find_one.return_value = dict(DOCUMENT, version=3)
+    assert asyncio.run(repo.get_object("uuid-1"))["version"] == 3
+
+
+def test_redis_calls_run_off_the_event_loop():
+    """Test that the async repository never calls Redis from the event loop thread"""
+    loop_thread = threading.get_ident()
+    threads = []
+    redis = Mock(get=Mock(side_effect=lambda key: threads.append(threading.get_ident())),
+                 set=Mock(side_effect=lambda *args, **kwargs: threads.append(threading.get_ident())))
+    repo, _, _, _ = create_repo(redis)
+
+    asyncio.run(repo.get_object("uuid-1"))
+
+    assert len(threads) == 2 and loop_thread not in threads
@@ -0,0 +1,162 @@
+"""
+Test to verify that object indexes are created once per database and that COLLSCANs are detected.
+"""
+import asyncio
+import time
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+import repositories.storage_repository_mongo_async as mongo_async
+from repositories.object_query import find_collscans, OBJECT_INDEXES
+from repositories.storage_repository_mongo_async import StorageRepositoryMongoAsync
+
+
+def create_mock_repo(uri="mongodb://localhost:27017/tenant"):
+    """Create an async repository with a mocked motor collection"""
+    mock_collection = Mock()
+    mock_collection.create_indexes = AsyncMock(return_value=["created_by_id", "name_id", "file_path"])
+    mock_db = Mock()
+    mock_db.name = "tenant"
+    mock_db.__getitem__ = Mock(return_value=mock_collection)
+
+    repo = StorageRepositoryMongoAsync.__new__(StorageRepositoryMongoAsync)
+    repo.uri = uri
+    repo.db = mock_db
+    repo.collection = "objects"
+    return repo, mock_collection
+
+
+async def finish_index_build(uri):
+    """Wait for the background index creation of ``uri`` and its completion callback"""
+    task = mongo_async._index_tasks.get(uri)
+    if task is not None:
+        await asyncio.wait([task])
+    await asyncio.sleep(0)
+
+
+@pytest.fixture(autouse=True)
+def reset_index_state():
+    mongo_async._indexed_databases.clear()
+    mongo_async._index_tasks.clear()
+    mongo_async._index_failures.clear()
+    yield
+    mongo_async._indexed_databases.clear()
+    mongo_async._index_tasks.clear()
+    mongo_async._index_failures.clear()
+
+
+def test_indexes_created_once_per_database():
+    """Test that concurrent and repeated calls create the indexes only once"""
+    repo, mock_collection = create_mock_repo()
+    other, _ = create_mock_repo()
+    other.db = repo.db
+
+    async def scenario():
+        repo.ensure_indexes()
+        other.ensure_indexes()
+        await finish_index_build(repo.uri)
+        repo.ensure_indexes()
+
+    asyncio.run(scenario())
+
+    mock_collection.create_indexes.assert_awaited_once_with(OBJECT_INDEXES)
+    assert repo.uri in mongo_async._indexed_databases
+
+
+def test_requests_do_not_wait_for_the_index_build():
+    """Test that ensure_indexes returns while a slow build is still running"""
+    repo, mock_collection = create_mock_repo()
+
+    async def scenario():
+        finished = asyncio.Event()
+
+        async def slow_build(indexes):
+            await finished.wait()
+            return ["created_by_id"]
+
+        mock_collection.create_indexes.side_effect = slow_build
+        repo.ensure_indexes()
+        await asyncio.sleep(0)
+        assert repo.uri in mongo_async._index_tasks
+        assert repo.uri not in mongo_async._indexed_databases
+        finished.set()
+        await finish_index_build(repo.uri)
+
+    asyncio.run(scenario())
+
+    assert repo.uri in mongo_async._indexed_databases
+
+
+def test_each_database_gets_its_own_indexes():
+    """Test that a second tenant database is indexed too"""
+    repo, first_collection = create_mock_repo("mongodb://localhost:27017/tenant-a")
+    other, second_collection = create_mock_repo("mongodb://localhost:27017/tenant-b")
+
+    async def scenario():
+        repo.ensure_indexes()
+        other.ensure_indexes()
+        await finish_index_build(repo.uri)
+        await finish_index_build(other.uri)
+
+    asyncio.run(scenario())
+
+    first_collection.create_indexes.assert_awaited_once()
+    second_collection.create_indexes.assert_awaited_once()
+
+
+def test_failed_index_creation_is_retried_after_backoff():
+    """Test that a failure is retried only once its backoff has passed, and the backoff doubles"""
+    repo, mock_collection = create_mock_repo()
+    mock_collection.create_indexes.side_effect = [Exception("not authorized"), Exception("not authorized"), ["ok"]]
+
+    async def attempt():
+        repo.ensure_indexes()
+        await finish_index_build(repo.uri)
+
+    async def scenario():
+        await attempt()
+        await attempt()
+        assert mock_collection.create_indexes.await_count == 1
+        first_failures, first_retry_at = mongo_async._index_failures[repo.uri]
+
+        mongo_async._index_failures[repo.uri] = (first_failures, 0.0)
+        await attempt()
+        failures, retry_at = mongo_async._index_failures[repo.uri]
+        assert failures == 2
+        assert retry_at - time.monotonic() > first_retry_at - time.monotonic()
+
+        mongo_async._index_failures[repo.uri] = (failures, 0.0)
+        await attempt()
+
+    with patch.object(mongo_async, "MONGO_INDEX_RETRY_BACKOFF", 30):
+        asyncio.run(scenario())
+
+    assert mock_collection.create_indexes.await_count == 3
+    assert repo.uri in mongo_async._indexed_databases
+    assert repo.uri not in mongo_async._index_failures
+
+
+def test_find_collscans_detects_nested_stage():
+    """Test that a COLLSCAN below other stages is reported"""
+    plan = {"queryPlanner": {"winningPlan": {"stage": "LIMIT", "inputStage": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}}}
+    indexed = {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "created_by_id"}}}}
+
+    assert len(find_collscans(plan)) == 1
+    assert find_collscans(indexed) == []
+
+
+def test_explain_mode_warns_on_collscan():
+    """Test that the diagnostic mode explains list queries and warns on COLLSCAN"""
+    repo, mock_collection = create_mock_repo()
+    cursor = Mock()
+    cursor.sort.return_value = cursor
+    cursor.limit.return_value = cursor
+    cursor.to_list = AsyncMock(return_value=[])
+    cursor.explain = AsyncMock(return_value={"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}})
+    mock_collection.find.return_value = cursor
+
+    with patch.object(mongo_async, "MONGO_EXPLAIN_QUERIES", True), patch.object(mongo_async, "logger") as mock_logger:
+        asyncio.run(repo.list_objects(limit=10, filters={"created_by": "user-1"}))
+
+    cursor.explain.assert_awaited_once()
+    mock_logger.warning.assert_called_once()
+    assert "COLLSCAN" in mock_logger.warning.call_args[0][0]
@@ -0,0 +1,145 @@
+"""
+Test to verify direct client-to-S3 transfers through presigned URLs.
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock, AsyncMock, patch
+from botocore.exceptions import ClientError
+from fastapi import HTTPException
+import repositories.storage_repository_s3 as s3_module
+from repositories.storage_repository_s3 import StorageRepositoryS3, known_buckets
+from services.storage_service import complete_object_upload
+
+
+def create_repo():
+    """Create an S3 repository with a mocked boto3 client"""
+    repo = StorageRepositoryS3.__new__(StorageRepositoryS3)
+    repo.credentials = {"endpoint": "http://minio:9000", "bucket_name": "direct-bucket"}
+    repo.bucket_name = "direct-bucket"
+    repo.tenant_key = "tenant"
+    repo.client = Mock()
+    repo.client.generate_presigned_url.side_effect = \
+        lambda operation, Params, ExpiresIn: f"https://signed/{operation}/{Params.get('PartNumber', '')}"
+    repo.client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    return repo
+
+
+@pytest.fixture(autouse=True)
+def small_parts(monkeypatch):
+    monkeypatch.setattr(s3_module, "S3_MULTIPART_PART_SIZE", 10)
+    known_buckets.clear()
+    yield
+    known_buckets.clear()
+
+
+def test_small_upload_gets_single_presigned_put():
+    """Test that a file of unknown or small size gets one presigned PUT"""
+    repo = create_repo()
+
+    plan = repo.generate_presigned_upload("a.txt", content_type="text/plain", size=5, custom_uuid="uuid-1")
+
+    assert plan["method"] == "PUT"
+    assert plan["file_path"] == "s3://direct-bucket/uuid-1.txt"
+    assert plan["headers"] == {"Content-Type": "text/plain"}
+    repo.client.put_object.assert_not_called()
+    repo.client.create_multipart_upload.assert_not_called()
+
+
+def test_large_upload_gets_multipart_plan():
+    """Test that a large file gets one presigned URL per part of an opened multipart upload"""
+    repo = create_repo()
+
+    plan = repo.generate_presigned_upload("big.bin", size=25, custom_uuid="uuid-2")
+
+    assert plan["method"] == "multipart"
+    assert plan["upload_id"] == "upload-1"
+    assert plan["part_size"] == 10
+    assert [part["part_number"] for part in plan["parts"]] == [1, 2, 3]
+    assert plan["parts"][0]["url"] == "https://signed/upload_part/1"
+
+
+def test_part_size_grows_to_stay_under_part_limit(monkeypatch):
+    """Test that huge files never need more than MAX_MULTIPART_PARTS parts"""
+    monkeypatch.setattr(s3_module, "MAX_MULTIPART_PARTS", 4)
+    repo = create_repo()
+
+    plan = repo.generate_presigned_upload("huge.bin", size=100, custom_uuid="uuid-3")
+
+    assert plan["part_size"] == 25
+    assert len(plan["parts"]) == 4
+
+
+def test_complete_multipart_reports_head_size_and_etag():
+    """Test that completion assembles the parts in order and reads size and ETag with HEAD"""
+    repo = create_repo()
+    repo.client.head_object.return_value = {"ContentLength": 25, "ETag": '"abc-3"'}
+
+    result = repo.complete_presigned_upload("s3://direct-bucket/uuid-2.bin", "upload-1", [
+        {"part_number": 2, "etag": "e2"}, {"part_number": 1, "etag": "e1"}
+    ])
+
+    assert result == {"size": 25, "etag": '"abc-3"'}
+    parts = repo.client.complete_multipart_upload.call_args.kwargs["MultipartUpload"]["Parts"]
+    assert parts == [{"PartNumber": 1, "ETag": "e1"}, {"PartNumber": 2, "ETag": "e2"}]
+
+
+def test_complete_without_uploaded_object_raises_file_not_found():
+    """Test that completing before the client uploaded anything is reported as missing"""
+    repo = create_repo()
+    repo.client.head_object.side_effect = ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+    with pytest.raises(FileNotFoundError):
+        repo.complete_presigned_upload("s3://direct-bucket/uuid-1.txt")
+
+
+@patch('services.storage_service.get_state_stores')
+@patch('services.storage_service.get_state_repos')
+def test_completion_sets_file_path(mock_get_repos, mock_get_stores):
+    """Test that a verified upload moves the pending path to file_path"""
+    storage_repo = AsyncMock()
+    storage_repo.get_pending_upload.return_value = {"file_path": "s3://b/uuid-1.txt", "upload_id": None, "size": 5}
+    mock_get_repos.return_value.storage_repo = storage_repo
+    bucket_repo = AsyncMock()
+    bucket_repo.complete_presigned_upload_async.return_value = {"size": 5, "etag": '"e"'}
+    mock_get_stores.return_value.resolve = AsyncMock(return_value=Mock(storage_bucket_repo=bucket_repo))
+
+    result = asyncio.run(complete_object_upload(Mock(), "uuid-1"))
+
+    assert result["file_path"] == "s3://b/uuid-1.txt"
+    storage_repo.complete_upload.assert_awaited_once_with("uuid-1", "s3://b/uuid-1.txt", 5, '"e"')
+
+
+@patch('services.storage_service.get_state_stores')
+@patch('services.storage_service.get_state_repos')
+def test_completion_with_wrong_size_is_rejected(mock_get_repos, mock_get_stores):
+    """Test that an upload whose size differs from the announced size is not attached"""
+    storage_repo = AsyncMock()
+    storage_repo.get_pending_upload.return_value = {"file_path": "s3://b/uuid-1.txt", "upload_id": None, "size": 5}
+    mock_get_repos.return_value.storage_repo = storage_repo
+    bucket_repo = AsyncMock()
+    bucket_repo.complete_presigned_upload_async.return_value = {"size": 6, "etag": '"e"'}
+    mock_get_stores.return_value.resolve = AsyncMock(return_value=Mock(storage_bucket_repo=bucket_repo))
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(complete_object_upload(Mock(), "uuid-1"))
+
+    assert exc_info.value.status_code == 409
+    storage_repo.complete_upload.assert_not_called()
+
+
+@patch('services.storage_service.get_state_stores')
+@patch('services.storage_service.get_state_repos')
+def test_completion_losing_a_race_is_rejected(mock_get_repos, mock_get_stores):
+    """Test that a completion whose update matched nothing does not report success"""
+    storage_repo = AsyncMock()
+    storage_repo.get_pending_upload.return_value = {"file_path": "s3://b/uuid-1.txt", "upload_id": None, "size": 5}
+    storage_repo.complete_upload.return_value = False
+    mock_get_repos.return_value.storage_repo = storage_repo
+    bucket_repo = AsyncMock()
+    bucket_repo.complete_presigned_upload_async.return_value = {"size": 5, "etag": '"e"'}
+    mock_get_stores.return_value.resolve = AsyncMock(return_value=Mock(storage_bucket_repo=bucket_repo))
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(complete_object_upload(Mock(), "uuid-1"))
+
+    assert exc_info.value.status_code == 409
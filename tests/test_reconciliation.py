@@ -0,0 +1,97 @@
+"""
+Test to verify that bucket reconciliation finds orphaned files page by page and can resume.
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock
+from repositories.object_query import referenced_file_paths
+from repositories.storage_repository_s3 import StorageRepositoryS3
+from services.reconciliation_service import reconcile_bucket, load_checkpoint, save_checkpoint
+
+OLD = datetime.now(timezone.utc) - timedelta(days=1)
+NEW = datetime.now(timezone.utc)
+
+
+def create_bucket_repo(pages):
+    bucket_repo = Mock()
+    bucket_repo.bucket_name = "bucket"
+    bucket_repo.iter_bucket_pages.side_effect = lambda start_after=None: iter(
+        [page for page in pages if start_after is None or page[0]["Key"] > start_after])
+    bucket_repo.delete_files_from_bucket.return_value = {}
+    return bucket_repo
+
+
+def create_storage_repo(referenced):
+    storage_repo = Mock()
+    storage_repo.find_referenced_file_paths.side_effect = lambda paths: {path for path in paths if path in referenced}
+    return storage_repo
+
+
+PAGES = [
+    [{"Key": "a", "LastModified": OLD}, {"Key": "b", "LastModified": OLD}],
+    [{"Key": "c", "LastModified": OLD}, {"Key": "d", "LastModified": NEW}],
+]
+
+
+def test_orphans_are_found_with_one_lookup_per_page():
+    """Test that unreferenced old files are reported and each page costs one lookup"""
+    bucket_repo = create_bucket_repo(PAGES)
+    storage_repo = create_storage_repo({"s3://bucket/a"})
+    found = []
+
+    stats = reconcile_bucket(bucket_repo, storage_repo, on_orphans=found.extend)
+
+    assert found == ["s3://bucket/b", "s3://bucket/c"]
+    assert storage_repo.find_referenced_file_paths.call_count == 2
+    assert stats == {"start_after": "d", "scanned": 4, "orphans": 2, "deleted": 0, "failed": 0}
+    bucket_repo.delete_files_from_bucket.assert_not_called()
+
+
+def test_delete_removes_orphans_in_batches():
+    """Test that --delete removes each page's orphans with one bulk call"""
+    bucket_repo = create_bucket_repo(PAGES)
+    bucket_repo.delete_files_from_bucket.side_effect = [{}, {"s3://bucket/c": "AccessDenied"}]
+
+    stats = reconcile_bucket(bucket_repo, create_storage_repo(set()), delete=True)
+
+    assert bucket_repo.delete_files_from_bucket.call_args_list[0].args[0] == ["s3://bucket/a", "s3://bucket/b"]
+    assert stats["deleted"] == 2
+    assert stats["failed"] == 1
+
+
+def test_resume_from_checkpoint(tmp_path):
+    """Test that a saved checkpoint restarts after its last key with its totals"""
+    checkpoint = str(tmp_path / "checkpoint.json")
+    bucket_repo = create_bucket_repo(PAGES)
+    storage_repo = create_storage_repo(set())
+    save_checkpoint(checkpoint, {"start_after": "b", "scanned": 2, "orphans": 2, "deleted": 0, "failed": 0})
+
+    stats = reconcile_bucket(bucket_repo, storage_repo, state=load_checkpoint(checkpoint),
+                             on_page=lambda state: save_checkpoint(checkpoint, state))
+
+    bucket_repo.iter_bucket_pages.assert_called_once_with(start_after="b")
+    assert stats["scanned"] == 4
+    assert load_checkpoint(checkpoint) == stats
+
+
+def test_pending_uploads_count_as_referenced():
+    """Test that files of direct uploads not yet completed are not orphans"""
+    documents = [{"_id": "1", "file_path": "s3://bucket/a"}, {"_id": "2", "pending_upload": {"file_path": "s3://bucket/b"}}]
+
+    assert referenced_file_paths(documents) == {"s3://bucket/a", "s3://bucket/b"}
+
+
+def test_bucket_listing_is_paginated():
+    """Test that the bucket is listed through the paginator instead of a single truncated call"""
+    repo = StorageRepositoryS3.__new__(StorageRepositoryS3)
+    repo.bucket_name = "bucket"
+    repo.client = Mock()
+    repo.client.get_paginator.return_value.paginate.return_value = [
+        {"Contents": [{"Key": "a", "LastModified": OLD}]}, {}, {"Contents": [{"Key": "b", "LastModified": OLD}]}
+    ]
+
+    pages = list(repo.iter_bucket_pages(start_after="0"))
+
+    assert [[item["Key"] for item in page] for page in pages] == [["a"], ["b"]]
+    repo.client.get_paginator.assert_called_once_with("list_objects_v2")
+    assert repo.client.get_paginator.return_value.paginate.call_args.kwargs["StartAfter"] == "0"
+    assert repo.list_files_in_bucket() == {"a": OLD, "b": OLD}
@@ -0,0 +1,78 @@
+"""
+Test to verify that S3 repositories are pooled per credential set.
+"""
+import time
+import pytest
+from unittest.mock import Mock, patch
+from repositories.storage_repository_s3_pool import StorageRepositoryS3Pool, credentials_key
+
+
+CREDENTIALS = {
+    "endpoint": "http://minio:9000",
+    "access_key": "access",
+    "secret_key": "secret",
+    "bucket_name": "tenant-bucket"
+}
+
+
+@pytest.fixture
+def mock_get_client():
+    with patch('repositories.storage_repository_s3.get_client') as mock:
+        mock.side_effect = lambda credentials: Mock()
+        yield mock
+
+
+def test_same_credentials_reuse_repository(mock_get_client):
+    """Test that repeated lookups with the same credentials reuse one client"""
+    pool = StorageRepositoryS3Pool(max_size=10, idle_ttl=60)
+
+    first = pool.get(dict(CREDENTIALS), licence="licence-1")
+    second = pool.get(dict(CREDENTIALS), licence="licence-1")
+
+    assert first is second
+    assert mock_get_client.call_count == 1
+
+
+def test_credentials_key_ignores_key_order():
+    """Test that the pool key does not depend on dict ordering"""
+    reordered = dict(reversed(list(CREDENTIALS.items())))
+    assert credentials_key(CREDENTIALS) == credentials_key(reordered)
+
+
+def test_rotated_credentials_rebuild_repository(mock_get_client):
+    """Test that a licence with new credentials gets a new client and the old one is dropped"""
+    pool = StorageRepositoryS3Pool(max_size=10, idle_ttl=60)
+
+    old = pool.get(dict(CREDENTIALS), licence="licence-1")
+    rotated = dict(CREDENTIALS, secret_key="rotated-secret")
+    new = pool.get(rotated, licence="licence-1")
+
+    assert old is not new
+    assert len(pool) == 1
+    assert mock_get_client.call_count == 2
+
+
+def test_pool_evicts_least_recently_used(mock_get_client):
+    """Test that the pool never holds more than max_size repositories"""
+    pool = StorageRepositoryS3Pool(max_size=2, idle_ttl=60)
+
+    first = pool.get(dict(CREDENTIALS, access_key="a"))
+    pool.get(dict(CREDENTIALS, access_key="b"))
+    pool.get(dict(CREDENTIALS, access_key="a"))
+    pool.get(dict(CREDENTIALS, access_key="c"))
+
+    assert len(pool) == 2
+    assert pool.get(dict(CREDENTIALS, access_key="a")) is first
+    assert mock_get_client.call_count == 3
+
+
+def test_idle_repository_expires(mock_get_client):
+    """Test that a repository unused for longer than idle_ttl is rebuilt"""
+    pool = StorageRepositoryS3Pool(max_size=10, idle_ttl=0.01)
+
+    first = pool.get(dict(CREDENTIALS))
+    time.sleep(0.02)
+    second = pool.get(dict(CREDENTIALS))
+
+    assert first is not second
+    assert mock_get_client.call_count == 2
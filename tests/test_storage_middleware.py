@@ -0,0 +1,103 @@
+"""
+Test to verify that the storage middleware is a pass-through ASGI layer.
+"""
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi import HTTPException
+from repositories import LazyBucketRepositories
+from middlewares.storage_middleware import StorageConnectionMiddleware
+
+
+def http_scope(path="/storage/v1/"):
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": [(b"authorization", b"Bearer token-1")],
+        "server": ("testserver", 80),
+        "state": {"licence_uuid": "licence-1"},
+    }
+
+
+def run(app, scope, body_chunks=(b"",)):
+    """Drive an ASGI app and collect the messages it sends"""
+    sent = []
+    incoming = [{"type": "http.request", "body": chunk, "more_body": index < len(body_chunks) - 1}
+                for index, chunk in enumerate(body_chunks)]
+
+    async def receive():
+        return incoming.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return sent
+
+
+async def streaming_app(scope, receive, send):
+    received = []
+    while True:
+        message = await receive()
+        received.append(message["body"])
+        if not message.get("more_body"):
+            break
+    scope["state"]["received"] = received
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    for chunk in (b"one", b"two", b"three"):
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+@pytest.fixture
+def protected():
+    with patch("middlewares.storage_middleware.is_unprotected_path", return_value=False), \
+            patch("middlewares.storage_middleware.extract_token", return_value="token-1"):
+        yield
+
+
+def test_protected_request_gets_lazy_stores(protected):
+    """Test that protected requests carry unresolved stores in the scope state"""
+    scope = http_scope()
+
+    with patch("middlewares.storage_middleware.get_credential", AsyncMock()) as mock_get_credential:
+        run(StorageConnectionMiddleware(streaming_app), scope)
+
+    assert isinstance(scope["state"]["stores"], LazyBucketRepositories)
+    mock_get_credential.assert_not_called()
+
+
+def test_unprotected_path_is_skipped():
+    """Test that unprotected paths reach the app without stores"""
+    scope = http_scope("/storage/openapi.json")
+
+    with patch("middlewares.storage_middleware.is_unprotected_path", return_value=True):
+        run(StorageConnectionMiddleware(streaming_app), scope)
+
+    assert "stores" not in scope["state"]
+
+
+def test_http_exception_is_mapped_to_json():
+    """Test that a missing token is answered with the exception status and detail"""
+    with patch("middlewares.storage_middleware.is_unprotected_path", return_value=False), \
+            patch("middlewares.storage_middleware.extract_token",
+                  side_effect=HTTPException(status_code=401, detail="Token not found")):
+        sent = run(StorageConnectionMiddleware(streaming_app), http_scope())
+
+    assert sent[0]["status"] == 401
+    assert sent[1]["body"] == b'{"detail":"Token not found"}'
+
+
+def test_bodies_stream_through_unbuffered(protected):
+    """Test that request and response chunks pass through one message at a time"""
+    scope = http_scope()
+
+    sent = run(StorageConnectionMiddleware(streaming_app), scope, body_chunks=(b"a", b"b", b"c"))
+
+    assert scope["state"]["received"] == [b"a", b"b", b"c"]
+    assert [message.get("body") for message in sent[1:]] == [b"one", b"two", b"three", b""]
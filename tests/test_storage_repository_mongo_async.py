@@ -0,0 +1,66 @@
+"""
+Test to verify that the motor repository awaits its queries and serialises results.
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock, AsyncMock
+from repositories.storage_repository_mongo_async import StorageRepositoryMongoAsync
+
+
+def create_mock_repo():
+    """Create an async repository instance with a mocked motor collection"""
+    mock_collection = Mock()
+    mock_collection.create_indexes = AsyncMock()
+    mock_db = Mock()
+    mock_db.__getitem__ = Mock(return_value=mock_collection)
+
+    repo = StorageRepositoryMongoAsync.__new__(StorageRepositoryMongoAsync)
+    repo.uri = "mongodb://localhost:27017/test"
+    repo.client = Mock()
+    repo.db = mock_db
+    repo.collection = "objects"
+
+    return repo, mock_collection
+
+
+def test_get_object_returns_serialised_document():
+    """Test that get_object awaits find_one and serialises the document"""
+    repo, mock_collection = create_mock_repo()
+    mock_collection.find_one = AsyncMock(return_value={
+        "_id": "test-uuid",
+        "name": "Test Object",
+        "created_by": "user-uuid"
+    })
+
+    result = asyncio.run(repo.get_object("test-uuid"))
+
+    mock_collection.find_one.assert_awaited_once_with({"_id": "test-uuid"})
+    assert result["uuid"] == "test-uuid"
+    assert result["name"] == "Test Object"
+
+
+def test_get_object_missing_returns_none():
+    """Test that get_object returns None when the document does not exist"""
+    repo, mock_collection = create_mock_repo()
+    mock_collection.find_one = AsyncMock(return_value=None)
+
+    assert asyncio.run(repo.get_object("missing")) is None
+
+
+def test_list_objects_awaits_cursor():
+    """Test that list_objects drains the motor cursor without blocking"""
+    repo, mock_collection = create_mock_repo()
+    cursor = Mock()
+    cursor.sort.return_value = cursor
+    cursor.to_list = AsyncMock(return_value=[
+        {"_id": "a", "name": "A"},
+        {"_id": "b", "name": "B", "file_path": "s3://bucket/b.pdf"}
+    ])
+    mock_collection.find.return_value = cursor
+
+    result, next_cursor = asyncio.run(repo.list_objects())
+
+    cursor.to_list.assert_awaited_once()
+    assert [item["uuid"] for item in result] == ["a", "b"]
+    assert result[1]["file_path"] == "s3://bucket/b.pdf"
+    assert next_cursor is None
@@ -0,0 +1,104 @@
+"""
+Test to verify that uploads are streamed to S3 in bounded parts.
+"""
+import asyncio
+import pytest
+from unittest.mock import Mock
+import repositories.storage_repository_s3 as s3_module
+from repositories.storage_repository_s3 import StorageRepositoryS3, known_buckets
+
+
+def create_repo():
+    """Create an S3 repository with a mocked boto3 client"""
+    repo = StorageRepositoryS3.__new__(StorageRepositoryS3)
+    repo.credentials = {"endpoint": "http://minio:9000", "bucket_name": "stream-bucket"}
+    repo.bucket_name = "stream-bucket"
+    repo.tenant_key = "tenant"
+    repo.client = Mock()
+    repo.client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    repo.client.upload_part.side_effect = lambda **kwargs: {"ETag": f"etag-{kwargs['PartNumber']}"}
+    return repo
+
+
+async def chunks_of(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.fixture(autouse=True)
+def small_parts(monkeypatch):
+    monkeypatch.setattr(s3_module, "S3_MULTIPART_PART_SIZE", 10)
+    monkeypatch.setattr(s3_module, "S3_MULTIPART_CONCURRENCY", 2)
+    known_buckets.clear()
+    yield
+    known_buckets.clear()
+
+
+def test_small_body_uses_single_put_object():
+    """Test that a body smaller than one part is uploaded with one put_object"""
+    repo = create_repo()
+
+    file_path, size = asyncio.run(repo.upload_stream_to_bucket(
+        chunks_of(b"hello", 2), filename="a.txt", content_type="text/plain", custom_uuid="uuid-1"))
+
+    assert file_path == "s3://stream-bucket/uuid-1.txt"
+    assert size == 5
+    repo.client.put_object.assert_called_once_with(
+        Bucket="stream-bucket", Key="uuid-1.txt", Body=b"hello", ContentType="text/plain")
+    repo.client.create_multipart_upload.assert_not_called()
+
+
+def test_large_body_is_split_into_fixed_size_parts():
+    """Test that a large body becomes a multipart upload with parts of the configured size"""
+    repo = create_repo()
+    data = bytes(range(35))
+
+    file_path, size = asyncio.run(repo.upload_stream_to_bucket(
+        chunks_of(data, 3), filename="big.bin", custom_uuid="uuid-2"))
+
+    assert size == 35
+    bodies = {call.kwargs["PartNumber"]: call.kwargs["Body"] for call in repo.client.upload_part.call_args_list}
+    assert [len(bodies[n]) for n in sorted(bodies)] == [10, 10, 10, 5]
+    assert b"".join(bodies[n] for n in sorted(bodies)) == data
+
+    complete = repo.client.complete_multipart_upload.call_args.kwargs
+    assert complete["UploadId"] == "upload-1"
+    assert [part["PartNumber"] for part in complete["MultipartUpload"]["Parts"]] == [1, 2, 3, 4]
+    repo.client.put_object.assert_not_called()
+
+
+def test_failed_part_aborts_multipart_upload():
+    """Test that a failing part aborts the multipart upload and re-raises"""
+    repo = create_repo()
+    repo.client.upload_part.side_effect = Exception("part failed")
+
+    with pytest.raises(Exception, match="part failed"):
+        asyncio.run(repo.upload_stream_to_bucket(chunks_of(bytes(40), 10), filename="big.bin"))
+
+    repo.client.abort_multipart_upload.assert_called_once()
+    repo.client.complete_multipart_upload.assert_not_called()
+
+
+def test_upload_file_does_not_read_whole_file():
+    """Test that the UploadFile is consumed in chunks rather than with a single read()"""
+    repo = create_repo()
+    upload = Mock()
+    upload.filename = "doc.pdf"
+    upload.content_type = "application/pdf"
+    reads = []
+
+    async def read(size=-1):
+        reads.append(size)
+        return b"x" * 4 if len(reads) < 4 else b""
+
+    async def seek(offset):
+        return None
+
+    upload.read = read
+    upload.seek = seek
+
+    file_path, size = asyncio.run(repo.upload_file_to_bucket_async(upload, custom_uuid="uuid-3"))
+
+    assert file_path == "s3://stream-bucket/uuid-3.pdf"
+    assert size == 12
+    assert all(size > 0 for size in reads)
@@ -0,0 +1,81 @@
+"""
+Test to verify that blocking transfers run off the event loop with per-tenant caps.
+"""
+import asyncio
+import threading
+import time
+import pytest
+from utils.transfer_executor import TransferExecutor
+
+
+def test_run_executes_in_worker_thread():
+    """Test that the callable runs in a pool thread, not on the event loop thread"""
+    executor = TransferExecutor(max_workers=2, per_tenant_limit=2)
+
+    result = asyncio.run(executor.run("tenant", threading.get_ident))
+
+    assert result != threading.get_ident()
+    assert executor.stats()["completed"] == 1
+    executor.shutdown()
+
+
+def test_event_loop_stays_responsive_during_transfer():
+    """Test that a slow transfer does not block other coroutines"""
+    executor = TransferExecutor(max_workers=2, per_tenant_limit=2)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        await asyncio.gather(executor.run("tenant", time.sleep, 0.1), ticker())
+
+    asyncio.run(scenario())
+
+    assert len(ticks) == 5
+    assert ticks[-1] - ticks[0] < 0.1
+    executor.shutdown()
+
+
+def test_per_tenant_limit_caps_concurrency():
+    """Test that one tenant never runs more transfers at once than its limit"""
+    executor = TransferExecutor(max_workers=8, per_tenant_limit=2)
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def transfer():
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(0.02)
+        with lock:
+            running["now"] -= 1
+
+    async def scenario():
+        await asyncio.gather(*[executor.run("tenant", transfer) for _ in range(6)])
+
+    asyncio.run(scenario())
+
+    assert running["peak"] == 2
+    stats = executor.stats()
+    assert stats["completed"] == 6
+    assert stats["queued"] == 0
+    assert stats["wait_seconds_max"] > 0
+    executor.shutdown()
+
+
+def test_failures_are_counted_and_raised():
+    """Test that exceptions propagate to the caller and are reported in stats"""
+    executor = TransferExecutor(max_workers=1, per_tenant_limit=1)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        asyncio.run(executor.run("tenant", fail))
+
+    assert executor.stats()["failed"] == 1
+    assert executor.stats()["tenants"] == 0
+    executor.shutdown()
@@ -0,0 +1,42 @@
+from typing import List, Optional
+
+
+def format_etag(version: Optional[int]) -> str:
+    # Documents written before versioning count as version 0
+    return f'"{version or 0}"'
+
+
+def parse_etags(header: Optional[str]) -> Optional[List[str]]:
+    """Split an If-Match / If-None-Match header into its entity tags; ``*`` is kept as is."""
+    if not header:
+        return None
+    etags = []
+    for etag in header.split(","):
+        etag = etag.strip()
+        if etag.startswith("W/"):
+            etag = etag[2:]
+        if etag:
+            etags.append(etag)
+    return etags
+
+
+def etag_matches(header: Optional[str], version: Optional[int]) -> bool:
+    etags = parse_etags(header)
+    if not etags:
+        return False
+    return "*" in etags or format_etag(version) in etags
+
+
+def etag_versions(header: Optional[str]) -> Optional[List[int]]:
+    """Return the versions named by an If-Match header, or None when any version matches."""
+    etags = parse_etags(header)
+    if not etags or "*" in etags:
+        return None
+    versions = []
+    for etag in etags:
+        try:
+            versions.append(int(etag.strip('"')))
+        except ValueError:
+            # Not one of ours, so it cannot match any version
+            continue
+    return versions
@@ -0,0 +1,120 @@
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from config.config import METRICS_TENANT_CLASSES, METRICS_DEFAULT_TENANT_CLASS
+
+# Set per request by MetricsMiddleware; copied into transfer threads with the rest of the context
+tenant_class_var: ContextVar[str] = ContextVar("tenant_class", default=METRICS_DEFAULT_TENANT_CLASS)
+request_timings_var: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+STAGE_SECONDS = Histogram(
+    "storage_stage_seconds", "Time spent in each stage of a request",
+    ["stage", "tenant_class"]
+)
+S3_OPERATION_SECONDS = Histogram(
+    "storage_s3_operation_seconds", "Duration of S3 API calls by operation",
+    ["operation", "tenant_class"]
+)
+MONGO_OPERATION_SECONDS = Histogram(
+    "storage_mongo_operation_seconds", "Duration of storage repository calls by method, cache hits included",
+    ["method", "tenant_class"]
+)
+CREDENTIAL_LOOKUPS = Counter(
+    "storage_credential_lookups_total", "Storage credential lookups by cache outcome",
+    ["result"]
+)
+UPLOAD_BYTES = Counter(
+    "storage_upload_bytes_total", "Bytes uploaded to buckets",
+    ["tenant_class"]
+)
+UPLOAD_THROUGHPUT = Histogram(
+    "storage_upload_bytes_per_second", "Throughput of each upload to a bucket",
+    ["tenant_class"],
+    buckets=(64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6, 1e9, float("inf"))
+)
+
+
+def tenant_class(licence: Optional[str]) -> str:
+    return METRICS_TENANT_CLASSES.get(licence, METRICS_DEFAULT_TENANT_CLASS)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage, tenant_class_var.get()).observe(seconds)
+    timings = request_timings_var.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def observe_upload(size: int, seconds: float) -> None:
+    label = tenant_class_var.get()
+    UPLOAD_BYTES.labels(label).inc(size)
+    if seconds > 0:
+        UPLOAD_THROUGHPUT.labels(label).observe(size / seconds)
+    observe_stage("s3.upload", seconds)
+
+
+def time_repository_methods(cls):
+    """Class decorator timing every public coroutine method into MONGO_OPERATION_SECONDS."""
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(method):
+            continue
+        setattr(cls, name, _timed_method(name, method))
+    return cls
+
+
+def _timed_method(name: str, method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            MONGO_OPERATION_SECONDS.labels(name, tenant_class_var.get()).observe(seconds)
+            observe_stage(f"mongo.{name}", seconds)
+    return wrapper
+
+
+def register_s3_timing(client) -> None:
+    """Time every API call made by a boto3 S3 client, from botocore's call events."""
+    events = client.meta.events
+    events.register("before-parameter-build.s3", _before_s3_call)
+    events.register("after-call.s3", _after_s3_call)
+
+
+def _before_s3_call(context, **kwargs):
+    context["storage_started_at"] = time.perf_counter()
+
+
+def _after_s3_call(model, context, **kwargs):
+    started_at = context.get("storage_started_at")
+    if started_at is None:
+        return
+    seconds = time.perf_counter() - started_at
+    S3_OPERATION_SECONDS.labels(model.name, tenant_class_var.get()).observe(seconds)
+    observe_stage(f"s3.{model.name}", seconds)
+
+
+def format_server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    """Render the stages of a request as a Server-Timing value, summing repeated stages."""
+    durations = {}
+    for stage, seconds in timings:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    entries = [f"{stage};dur={seconds * 1e3:.2f}" for stage, seconds in durations.items()]
+    entries.append(f"total;dur={total * 1e3:.2f}")
+    return ", ".join(entries)
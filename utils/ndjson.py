@@ -0,0 +1,35 @@
+import zlib
+from typing import AsyncIterator, List, Optional
+
+import orjson
+
+from config.config import EXPORT_GZIP_LEVEL
+
+
+async def encode_ndjson(batches: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+    """Encode each batch of objects as one chunk of newline-delimited JSON."""
+    async for batch in batches:
+        yield b"".join(orjson.dumps(object, option=orjson.OPT_APPEND_NEWLINE) for object in batch)
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int = EXPORT_GZIP_LEVEL) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        # A sync flush per chunk lets the client decode every line received before a disconnect
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def accepts_gzip(header: Optional[str]) -> bool:
+    for coding in (header or "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() not in ("gzip", "x-gzip"):
+            continue
+        quality = params.strip().lower()
+        if not quality.startswith("q="):
+            return True
+        try:
+            return float(quality[2:]) > 0
+        except ValueError:
+            return False
+    return False
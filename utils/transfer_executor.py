@@ -0,0 +1,108 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class TransferExecutor:
+    """Bounded thread pool for blocking transfers with per-tenant concurrency caps.
+
+    ``run`` is awaited from the event loop; the call waits for a tenant slot,
+    then for a worker thread, and the time spent in both queues is recorded
+    so that pool saturation can be observed through ``stats``.
+    """
+
+    def __init__(self, max_workers: int, per_tenant_limit: int, thread_name_prefix: str = "transfer"):
+        self.max_workers = max_workers
+        self.per_tenant_limit = per_tenant_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._tenants: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def run(self, tenant: str, fn: Callable, *args, **kwargs) -> Any:
+        enqueued_at = time.monotonic()
+        with self._lock:
+            self._queued += 1
+        semaphore = self._acquire_tenant(tenant)
+        future = None
+        try:
+            async with semaphore:
+                # Run in the caller's context so request-scoped values (metrics labels) follow the job
+                context = contextvars.copy_context()
+                future = self._executor.submit(context.run, self._job, enqueued_at, fn, args, kwargs)
+                return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if future is not None and future.cancel():
+                future = None
+            raise
+        finally:
+            if future is None:
+                # The job never reached a worker thread, so it is no longer queued
+                with self._lock:
+                    self._queued -= 1
+            self._release_tenant(tenant)
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._completed + self._failed + self._active
+            return {
+                "max_workers": self.max_workers,
+                "per_tenant_limit": self.per_tenant_limit,
+                "queued": self._queued,
+                "active": self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+                "tenants": len(self._tenants),
+                "wait_seconds_total": round(self._wait_total, 6),
+                "wait_seconds_avg": round(self._wait_total / started, 6) if started else 0.0,
+                "wait_seconds_max": round(self._wait_max, 6),
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _job(self, enqueued_at: float, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        waited = time.monotonic() - enqueued_at
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        failed = True
+        try:
+            result = fn(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            with self._lock:
+                self._active -= 1
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+
+    def _acquire_tenant(self, tenant: str) -> asyncio.Semaphore:
+        with self._lock:
+            entry = self._tenants.get(tenant)
+            if entry is None:
+                entry = [asyncio.Semaphore(self.per_tenant_limit), 0]
+                self._tenants[tenant] = entry
+            entry[1] += 1
+            return entry[0]
+
+    def _release_tenant(self, tenant: str) -> None:
+        with self._lock:
+            entry = self._tenants.get(tenant)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._tenants[tenant]
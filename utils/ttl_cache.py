@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU map whose entries expire after a time-to-live.
+
+    With ``sliding=True`` every successful ``get`` pushes the expiry back,
+    which turns the TTL into an idle timeout.
+    """
+
+    def __init__(self, max_size: int, ttl: float, sliding: bool = False,
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        if max_size <= 0:
+            raise ValueError("max_size must be greater than 0")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sliding = sliding
+        self.on_evict = on_evict
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        evicted = None
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at, ttl = entry
+            now = time.monotonic()
+            if expires_at <= now:
+                del self._data[key]
+                evicted = (key, value)
+            else:
+                self._data.move_to_end(key)
+                if self.sliding:
+                    self._data[key] = (value, now + ttl, ttl)
+                return value
+        self._notify(*evicted)
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        evicted = []
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl, ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                old_key, (old_value, _, _) = self._data.popitem(last=False)
+                evicted.append((old_key, old_value))
+        for old_key, old_value in evicted:
+            self._notify(old_key, old_value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        return entry[0]
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [(key, entry[0]) for key, entry in self._data.items() if entry[1] <= now]
+            for key, _ in expired:
+                del self._data[key]
+        for key, value in expired:
+            self._notify(key, value)
+        return len(expired)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def _notify(self, key, value):
+        if self.on_evict is not None:
+            self.on_evict(key, value)